@@ -76,7 +76,10 @@ from .utils.general import (
     add_coordinates,
     get_spacings,
 )
-from .feature_detection import feature_detection_multithreshold
+from .feature_detection import (
+    feature_detection_multithreshold,
+    feature_detection_multithreshold_stream,
+)
 from .tracking import linking_trackpy
 from .wrapper import maketrack
 from .wrapper import tracking_wrapper
@@ -18,7 +18,10 @@ References
 """
 
 from __future__ import annotations
-from typing import Union, Callable
+from typing import Union, Callable, Iterable, Iterator
+import functools
+import itertools
+import os
 import warnings
 import logging
 
@@ -27,11 +30,9 @@ from typing_extensions import Literal
 import numpy as np
 import pandas as pd
 from scipy.spatial import KDTree
-from sklearn.neighbors import BallTree
 import iris
 import xarray as xr
 
-from tobac.tracking import build_distance_function
 from tobac.utils import internal as internal_utils
 from tobac.utils import decorators
 
@@ -248,6 +249,217 @@ def feature_position(
         return hdim1_index, hdim2_index
 
 
+def feature_positions(
+    labels: np.ndarray,
+    track_data: np.ndarray,
+    index: Union[np.ndarray, None] = None,
+    threshold_i: float = None,
+    position_threshold: Literal[
+        "center", "extreme", "weighted_diff", "weighted abs"
+    ] = "center",
+    target: Literal["maximum", "minimum"] = None,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+    hdim1_min: int = 0,
+    hdim1_max: int = 0,
+    hdim2_min: int = 0,
+    hdim2_max: int = 0,
+    label_index: Union[internal_utils.LabelIndex, None] = None,
+) -> np.ndarray:
+    """Determine the positions of all labelled regions at once, with regard
+    to the horizontal (and vertical) dimensions in pixels. For each region,
+    the position is identical to that given by `feature_position`.
+
+    Parameters
+    ----------
+    labels : 2D or 3D array-like
+        Array of labelled regions, with the dimensions ordered as
+        (hdim_1, hdim_2) or (vdim, hdim_1, hdim_2). 0 is background.
+
+    track_data : 2D or 3D array-like
+        2D or 3D array containing the data, with the same shape as labels
+
+    index : array-like of ints, optional
+        Labels of the regions to determine the positions of. If None, all
+        labels in `labels` are used. Default is None.
+
+    threshold_i : float
+        The threshold value that we are testing against
+
+    position_threshold : {'center', 'extreme', 'weighted_diff', '
+                          weighted abs'}
+        How to select the single point position from our data. See
+        `feature_position`.
+
+    target : {'maximum', 'minimum'}
+        Used only when position_threshold is set to 'extreme',
+        this sets whether it is looking for maxima or minima.
+
+    PBC_flag : {'none', 'hdim_1', 'hdim_2', 'both'}
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    hdim1_min : int
+        Minimum real array index of the first horizontal dimension (for PBCs)
+
+    hdim1_max: int
+        Maximum real array index of the first horizontal dimension (for PBCs)
+        Note that this coordinate is INCLUSIVE, meaning that this is
+        the maximum coordinate value, and it is not a length.
+
+    hdim2_min : int
+        Minimum real array index of the first horizontal dimension (for PBCs)
+
+    hdim2_max : int
+        Maximum real array index of the first horizontal dimension (for PBCs)
+        Note that this coordinate is INCLUSIVE, meaning that this is
+        the maximum coordinate value, and it is not a length.
+
+    label_index : tobac.utils.internal.LabelIndex, optional
+        Index of the points of each label, if already created for labels.
+        Default is None.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (len(index), 2) for 2D input, with the positions along
+        hdim_1 and hdim_2 of each region, or (len(index), 3) for 3D input,
+        with the positions along vdim, hdim_1 and hdim_2.
+    """
+    if label_index is None:
+        label_index = internal_utils.LabelIndex(labels)
+    if index is None:
+        index = label_index.labels
+
+    # points of all regions, in the same (raster) order as the points of each
+    # region in feature_position
+    return _feature_positions_points(
+        label_index.point_labels,
+        np.asarray(track_data).ravel()[label_index.points],
+        label_index.coords,
+        index,
+        threshold_i=threshold_i,
+        position_threshold=position_threshold,
+        target=target,
+        PBC_flag=PBC_flag,
+        hdim1_min=hdim1_min,
+        hdim1_max=hdim1_max,
+        hdim2_min=hdim2_min,
+        hdim2_max=hdim2_max,
+    )
+
+
+def _feature_positions_points(
+    point_labels: np.ndarray,
+    point_values: np.ndarray,
+    point_indices: tuple[np.ndarray],
+    index: np.ndarray,
+    threshold_i: float = None,
+    position_threshold: Literal[
+        "center", "extreme", "weighted_diff", "weighted abs"
+    ] = "center",
+    target: Literal["maximum", "minimum"] = None,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+    hdim1_min: int = 0,
+    hdim1_max: int = 0,
+    hdim2_min: int = 0,
+    hdim2_max: int = 0,
+) -> np.ndarray:
+    """Determine the positions of labelled regions from the label, value and
+    coordinates of each of their points, with the points of each region in
+    raster order. See `feature_positions` for the other parameters.
+
+    Parameters
+    ----------
+    point_labels : np.ndarray
+        Label of each point.
+
+    point_values : np.ndarray
+        Value of the field at each point.
+
+    point_indices : tuple of np.ndarray
+        Coordinates of each point along (hdim_1, hdim_2) or
+        (vdim, hdim_1, hdim_2).
+
+    index : array-like of ints
+        Labels of the regions to determine the positions of.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (len(index), len(point_indices)) with the position of
+        each region.
+    """
+    is_3D = len(point_indices) == 3
+    if position_threshold not in ["center", "extreme", "weighted_diff", "weighted_abs"]:
+        raise ValueError(
+            "position_threshold must be center,extreme,weighted_diff or weighted_abs"
+        )
+
+    n_labels = np.max(point_labels, initial=0) + 1
+    index = np.asarray(index, dtype=int)
+
+    if position_threshold == "extreme":
+        # get position as the first max/min position inside each region:
+        if target == "maximum":
+            extreme_values = np.full(n_labels, -np.inf)
+            np.maximum.at(extreme_values, point_labels, point_values)
+        elif target == "minimum":
+            extreme_values = np.full(n_labels, np.inf)
+            np.minimum.at(extreme_values, point_labels, point_values)
+        is_extreme = np.flatnonzero(point_values == extreme_values[point_labels])
+        extreme_labels, first_extreme = np.unique(
+            point_labels[is_extreme], return_index=True
+        )
+        extreme_points = np.zeros(n_labels, dtype=int)
+        extreme_points[extreme_labels] = is_extreme[first_extreme]
+        return np.stack(
+            [indices[extreme_points[index]] for indices in point_indices], axis=-1
+        )
+
+    if position_threshold == "center":
+        weights = np.ones(point_labels.size)
+    elif position_threshold == "weighted_diff":
+        # weighted by difference from the threshold:
+        weights = np.abs(point_values - threshold_i)
+    elif position_threshold == "weighted_abs":
+        # weighted by absolute values if the field:
+        weights = np.abs(point_values)
+    sum_weights = np.bincount(point_labels, weights=weights, minlength=n_labels)
+    # regions where all weights are zero are not weighted
+    unweighted = sum_weights == 0
+    if np.any(unweighted):
+        weights = np.where(unweighted[point_labels], 1, weights)
+        sum_weights = np.bincount(point_labels, weights=weights, minlength=n_labels)
+
+    positions = []
+    for i_dim, indices in enumerate(point_indices):
+        hdim = i_dim - is_3D + 1
+        if hdim == 1 and PBC_flag in ("hdim_1", "both"):
+            positions.append(
+                pbc_utils.weighted_circmean_labels(
+                    indices, weights, point_labels, n_labels, hdim1_max + 1, hdim1_min
+                )[index]
+            )
+        elif hdim == 2 and PBC_flag in ("hdim_2", "both"):
+            positions.append(
+                pbc_utils.weighted_circmean_labels(
+                    indices, weights, point_labels, n_labels, hdim2_max + 1, hdim2_min
+                )[index]
+            )
+        else:
+            positions.append(
+                np.bincount(
+                    point_labels, weights=weights * indices, minlength=n_labels
+                )[index]
+                / sum_weights[index]
+            )
+
+    return np.stack(positions, axis=-1)
+
+
 def test_overlap(
     region_inner: list[tuple[int]], region_outer: list[tuple[int]]
 ) -> bool:
@@ -276,8 +488,8 @@ def test_overlap(
 
 def remove_parents(
     features_thresholds: pd.DataFrame,
-    regions_i: dict,
-    regions_old: dict,
+    regions_i: Union[dict, np.array],
+    regions_old: Union[dict, np.array],
     strict_thresholding: bool = False,
 ) -> pd.DataFrame:
     """Remove parents of newly detected feature regions.
@@ -290,37 +502,44 @@ def remove_parents(
     features_thresholds : pandas.DataFrame
         Dataframe containing detected features.
 
-    regions_i : dict
+    regions_i : dict or np.array
         Dictionary containing the regions greater/lower than and equal to
         threshold for the newly detected feature
-        (feature ids as keys).
+        (feature ids as keys), or an array labelled with the feature ids of
+        these regions (0 elsewhere).
 
-    regions_old : dict
+    regions_old : dict or np.array
         Dictionary containing the regions greater/lower than and equal to
         threshold from previous threshold
-        (feature ids as keys).
+        (feature ids as keys), or an array labelled with the feature ids of
+        these regions (0 elsewhere). Must be of the same type as regions_i.
 
     strict_thresholding: Bool, optional
         If True, a feature can only be detected if all previous thresholds have been met.
         Default is False.
+
     Returns
     -------
     features_thresholds : pandas.DataFrame
         Dataframe containing detected features excluding those
         that are superseded by newly detected ones.
+
+    regions_old : dict or np.array
+        The regions of the remaining features, of the same type as regions_i.
     """
 
-    try:
-        all_curr_pts = np.concatenate([vals for idx, vals in regions_i.items()])
-    except ValueError:
+    if isinstance(regions_i, np.ndarray):
+        return _remove_parents_labels(
+            features_thresholds, regions_i, regions_old, strict_thresholding
+        )
+
+    if len(regions_i) == 0:
         # the case where there are no new regions
         if strict_thresholding:
             return features_thresholds, {}
         else:
             return features_thresholds, regions_old
-    try:
-        all_old_pts = np.concatenate([vals for idx, vals in regions_old.items()])
-    except ValueError:
+    if len(regions_old) == 0:
         # the case where there are no old regions
         if strict_thresholding:
             return (
@@ -332,6 +551,9 @@ def remove_parents(
         else:
             return features_thresholds, regions_i
 
+    all_curr_pts = np.concatenate([vals for idx, vals in regions_i.items()])
+    all_old_pts = np.concatenate([vals for idx, vals in regions_old.items()])
+
     old_feat_arr = np.empty((len(all_old_pts)))
     curr_loc = 0
     for idx_old in regions_old:
@@ -380,6 +602,363 @@ def remove_parents(
     return features_thresholds, regions_old
 
 
+def _remove_parents_labels(
+    features_thresholds: pd.DataFrame,
+    labels_i: np.array,
+    labels_old: np.array,
+    strict_thresholding: bool = False,
+) -> tuple[pd.DataFrame, np.array]:
+    """Remove parents of newly detected feature regions given as labelled
+    arrays. Equivalent to `remove_parents` with regions dictionaries, but the
+    overlapping regions are found point-wise in O(number of points), and only
+    a single labelled array is kept for the regions of all remaining features.
+
+    Parameters
+    ----------
+    features_thresholds : pandas.DataFrame
+        Dataframe containing detected features.
+
+    labels_i : np.array
+        Array labelled with the feature ids of the newly detected regions.
+
+    labels_old : np.array
+        Array labelled with the feature ids of the regions from previous
+        thresholds.
+
+    strict_thresholding: Bool, optional
+        If True, a feature can only be detected if all previous thresholds have been met.
+        Default is False.
+
+    Returns
+    -------
+    features_thresholds : pandas.DataFrame
+        Dataframe containing detected features excluding those
+        that are superseded by newly detected ones.
+
+    labels_old : np.array
+        Array labelled with the feature ids of the regions of the remaining
+        features.
+    """
+    is_new = labels_i > 0
+    if not np.any(is_new):
+        # the case where there are no new regions
+        if strict_thresholding:
+            return features_thresholds, np.zeros_like(labels_i)
+        else:
+            return features_thresholds, labels_old
+
+    n_ids = max(np.max(labels_i), np.max(labels_old)) + 1
+    # the new feature ids at all points of the new regions
+    new_at_new = labels_i[is_new]
+    if strict_thresholding:
+        new_ids = np.flatnonzero(np.bincount(new_at_new, minlength=n_ids))
+    if not np.any(labels_old):
+        # the case where there are no old regions
+        if strict_thresholding:
+            return (
+                features_thresholds[~features_thresholds["idx"].isin(new_ids)],
+                np.zeros_like(labels_i),
+            )
+        else:
+            return features_thresholds, labels_i
+
+    # the old feature ids at all points of the new regions
+    old_at_new = labels_old[is_new]
+    list_remove = np.flatnonzero(np.bincount(old_at_new, minlength=n_ids)[1:]) + 1
+
+    if strict_thresholding:
+        regions_i_overlap = np.unique(new_at_new[old_at_new > 0])
+        no_prev_feature = new_ids[np.logical_not(np.isin(new_ids, regions_i_overlap))]
+        list_remove = np.concatenate([list_remove, no_prev_feature])
+
+    # remove parent regions:
+    if features_thresholds is not None:
+        features_thresholds = features_thresholds[
+            ~features_thresholds["idx"].isin(list_remove)
+        ]
+
+        # map the ids of removed features to 0
+        remaining_ids = features_thresholds["idx"].to_numpy()
+        remaining_ids = remaining_ids[(remaining_ids > 0) & (remaining_ids < n_ids)]
+        id_lookup = np.zeros(n_ids, dtype=np.result_type(labels_i, labels_old))
+        id_lookup[remaining_ids] = remaining_ids
+        if strict_thresholding:
+            labels_old = id_lookup[labels_i]
+        else:
+            # the remaining old regions do not overlap with any new region
+            labels_old = id_lookup[labels_old]
+            labels_old[is_new] = new_at_new
+    else:
+        labels_old = labels_i
+
+    return features_thresholds, labels_old
+
+
+def label_threshold_hierarchy(
+    track_data: np.array,
+    thresholds: list[float],
+    target: Literal["maximum", "minimum"] = "maximum",
+    n_erosion_threshold: int = 0,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+    vertical_axis: int = 0,
+) -> tuple[np.array, list[np.array]]:
+    """Label the regions of all thresholds at once from a single component tree.
+
+    The field is quantised into the number of thresholds met at each point.
+    The connected flat zones of this level field are labelled once, and the
+    adjacency graph between zones is built once. As the regions of all
+    thresholds are nested, the connected regions of each threshold are the
+    connected components of the subgraph of zones that meet this threshold,
+    which makes the labels of every threshold (and their parents at the less
+    extreme thresholds) lookups into the same zone image.
+
+    Parameters
+    ----------
+    track_data : np.array
+        2D or 3D field to perform the feature detection (single timestep) on.
+
+    thresholds : list of floats
+        Threshold values, sorted from least extreme to most extreme.
+
+    target : {'maximum', 'minimum'}, optional
+        Flag to determine if tracking is targetting minima or maxima
+        in the data. Default is 'maximum'.
+
+    n_erosion_threshold: int, optional
+        Number of pixels by which to erode the identified features.
+        Default is 0.
+
+    PBC_flag : {'none', 'hdim_1', 'hdim_2', 'both'}
+         Sets whether to use periodic boundaries, and if so in which directions.
+         Regions that are connected across a periodic boundary share the
+         label of the lowest labelled region.
+
+    vertical_axis: int
+        The vertical axis number of the data.
+
+    Returns
+    -------
+    zones : np.array
+        Zone labels, with the same shape as track_data.
+
+    zone_labels : list of np.array
+        Lookup from zone number to region label for each threshold. The
+        labels of the i-th threshold are ``zone_labels[i][zones]``, which
+        are numbered in the same way as labelling the thresholded field with
+        `skimage.measure.label` and merging the regions across periodic
+        boundaries in `feature_detection_threshold`.
+    """
+    from skimage.measure import label
+
+    pbc_options = ["hdim_1", "hdim_2", "both"]
+    if PBC_flag not in pbc_options and PBC_flag != "none":
+        raise ValueError(
+            "Options for periodic are currently: none, " + ", ".join(pbc_options)
+        )
+
+    # label in the same axis order as feature_detection_threshold, so that the
+    # numbering of the regions is identical
+    is_3D = len(track_data.shape) == 3
+    axes = tuple(range(track_data.ndim))
+    if is_3D:
+        if vertical_axis == 1:
+            axes = (1, 0, 2)
+        elif vertical_axis == 2:
+            axes = (2, 0, 1)
+    track_data = np.transpose(track_data, axes=axes)
+
+    # quantise the field into the number of thresholds met by each point.
+    # The (eroded) regions of each threshold are nested, so the region of the
+    # i-th threshold is where the level is greater than i.
+    levels = _threshold_levels(track_data, thresholds, target, n_erosion_threshold)
+
+    # connected points with the same level are flat zones. These are numbered
+    # in the order of their first point, as are the labels of each threshold.
+    zones, n_zones = label(levels, background=0, return_num=True)
+    zones = zones.astype(np.int32, copy=False)
+    zone_levels = np.zeros(n_zones + 1, dtype=levels.dtype)
+    zone_levels[zones.ravel()] = levels.ravel()
+
+    edges = _zone_edges(zones, levels, n_zones)
+
+    # Regions touching opposite periodic boundaries are joined
+    if PBC_flag in pbc_options:
+        zones_a, zones_b = pbc_utils.get_pbc_label_pairs(zones, PBC_flag)
+        is_edge = zones_a != zones_b
+        wall_edges = _decode_zone_edges(
+            np.unique(_encode_zone_edges(zones_a[is_edge], zones_b[is_edge], n_zones)),
+            n_zones,
+        )
+    else:
+        wall_edges = None
+
+    zone_labels = _label_zone_graph(
+        zone_levels, np.arange(n_zones + 1), edges, len(thresholds), wall_edges
+    )
+
+    zones = np.transpose(zones, axes=np.argsort(axes))
+
+    return zones, zone_labels
+
+
+def _threshold_levels(
+    track_data: np.array,
+    thresholds: list[float],
+    target: Literal["maximum", "minimum"] = "maximum",
+    n_erosion_threshold: int = 0,
+) -> np.array:
+    """Number of (eroded) thresholds met at each point of the field, with the
+    thresholds sorted from least extreme to most extreme."""
+    from skimage.morphology import binary_erosion
+
+    levels = np.zeros(track_data.shape, dtype=np.min_scalar_type(len(thresholds)))
+    for threshold_i in thresholds:
+        if target == "maximum":
+            mask = track_data >= threshold_i
+        elif target == "minimum":
+            mask = track_data <= threshold_i
+        if n_erosion_threshold > 0:
+            mask = binary_erosion(
+                mask, np.ones((n_erosion_threshold,) * track_data.ndim)
+            )
+        levels += mask
+    return levels
+
+
+def _zone_edges(
+    zones: np.array, levels: np.array, n_zones: int
+) -> tuple[np.array, np.array]:
+    """Pairs of adjacent zones with different levels, each pair listed once."""
+    from itertools import product
+
+    # Find adjacent zones by comparing each point to half of its neighbours.
+    # Neighbouring points with the same level are always in the same zone.
+    edges = []
+    for offset in product((-1, 0, 1), repeat=zones.ndim):
+        if offset <= (0,) * zones.ndim:
+            continue
+        slice_a = tuple(
+            slice(max(0, -o), s - max(0, o)) for o, s in zip(offset, levels.shape)
+        )
+        slice_b = tuple(
+            slice(max(0, o), s - max(0, -o)) for o, s in zip(offset, levels.shape)
+        )
+        levels_a, levels_b = levels[slice_a], levels[slice_b]
+        is_edge = (levels_a != levels_b) & (levels_a > 0) & (levels_b > 0)
+        edges.append(
+            _encode_zone_edges(
+                zones[slice_a][is_edge], zones[slice_b][is_edge], n_zones
+            )
+        )
+
+    return _decode_zone_edges(np.unique(np.concatenate(edges)), n_zones)
+
+
+def _label_zone_graph(
+    zone_levels: np.array,
+    zone_first: np.array,
+    edges: tuple[np.array, np.array],
+    n_thresholds: int,
+    wall_edges: Union[tuple[np.array, np.array], None] = None,
+) -> list[np.array]:
+    """Label the regions of each threshold as the connected components of the
+    graph of adjacent zones that meet the threshold.
+
+    Parameters
+    ----------
+    zone_levels : np.array
+        Number of thresholds met by each zone. Zone 0 is background.
+
+    zone_first : np.array
+        Ravelled index of the first point of each zone. The regions of each
+        threshold are numbered in the order of their first point.
+
+    edges : tuple of np.array
+        Pairs of adjacent zones.
+
+    n_thresholds : int
+        Number of thresholds.
+
+    wall_edges : tuple of np.array, optional
+        Pairs of zones that are adjacent across periodic boundaries. Regions
+        joined by these take the lowest label of the joined regions. Default
+        is None.
+
+    Returns
+    -------
+    list of np.array
+        Lookup from zone number to region label for each threshold.
+    """
+    n_zones = zone_levels.size - 1
+    edge_levels = np.minimum(zone_levels[edges[0]], zone_levels[edges[1]])
+    if wall_edges is not None:
+        wall_edge_levels = np.minimum(
+            zone_levels[wall_edges[0]], zone_levels[wall_edges[1]]
+        )
+
+    zone_labels = []
+    for i_threshold in range(1, n_thresholds + 1):
+        zones_in = np.flatnonzero(zone_levels >= i_threshold)
+        is_in = edge_levels >= i_threshold
+        components = _zone_components(edges[0][is_in], edges[1][is_in], n_zones)
+        # number the regions by their first point
+        no_point = np.iinfo(np.int64).max
+        first_point = np.full(components.max() + 1, no_point)
+        np.minimum.at(first_point, components[zones_in], zone_first[zones_in])
+        is_region = first_point < no_point
+        region_labels = np.zeros(first_point.size, dtype=np.int32)
+        region_labels[is_region] = np.argsort(np.argsort(first_point[is_region])) + 1
+        zone_labels_i = np.zeros(n_zones + 1, dtype=np.int32)
+        zone_labels_i[zones_in] = region_labels[components[zones_in]]
+
+        if wall_edges is not None:
+            is_wall_in = wall_edge_levels >= i_threshold
+            merged = _zone_components(
+                np.concatenate([edges[0][is_in], wall_edges[0][is_wall_in]]),
+                np.concatenate([edges[1][is_in], wall_edges[1][is_wall_in]]),
+                n_zones,
+            )
+            merged_labels = np.full(merged.max() + 1, np.iinfo(np.int32).max)
+            np.minimum.at(merged_labels, merged[zones_in], zone_labels_i[zones_in])
+            zone_labels_i[zones_in] = merged_labels[merged[zones_in]]
+
+        zone_labels.append(zone_labels_i)
+
+    return zone_labels
+
+
+def _encode_zone_edges(zones_a: np.array, zones_b: np.array, n_zones: int) -> np.array:
+    """Encode pairs of zones as single integers, independent of their order."""
+    encoded = np.minimum(zones_a, zones_b).astype(np.int64) * (
+        n_zones + 1
+    ) + np.maximum(zones_a, zones_b)
+    # remove repeats along the shared boundary of two zones before sorting
+    if encoded.size:
+        encoded = encoded[np.concatenate([[True], encoded[1:] != encoded[:-1]])]
+    return encoded
+
+
+def _decode_zone_edges(encoded: np.array, n_zones: int) -> tuple[np.array, np.array]:
+    """Inverse of _encode_zone_edges"""
+    return (
+        (encoded // (n_zones + 1)).astype(np.int32),
+        (encoded % (n_zones + 1)).astype(np.int32),
+    )
+
+
+def _zone_components(zones_a: np.array, zones_b: np.array, n_zones: int) -> np.array:
+    """Connected component of each zone given the edges between zones"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    graph = coo_matrix(
+        (np.ones(zones_a.size, dtype=np.int8), (zones_a, zones_b)),
+        shape=(n_zones + 1, n_zones + 1),
+    )
+    _, components = connected_components(graph, directed=False)
+    return components
+
+
 def feature_detection_threshold(
     data_i: np.array,
     i_time: int,
@@ -396,7 +975,9 @@ def feature_detection_threshold(
     idx_start: int = 0,
     PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
     vertical_axis: int = 0,
-) -> tuple[pd.DataFrame, dict]:
+    labels: Union[np.array, None] = None,
+    return_labels: bool = False,
+) -> tuple[pd.DataFrame, Union[dict, np.array]]:
     """Find features based on individual threshold value.
 
     Parameters
@@ -447,20 +1028,30 @@ def feature_detection_threshold(
     vertical_axis: int
         The vertical axis number of the data.
 
+    labels: np.array, optional
+        Labelled regions of the field for this threshold, with the same shape
+        as data_i and including the merging of regions across periodic
+        boundaries (e.g. from `label_threshold_hierarchy`). If given, the
+        thresholding, erosion and labelling steps are skipped. Default is None.
+
+    return_labels: bool, optional
+        If True, return the regions of the features as a labelled array
+        instead of a dictionary. Default is False.
 
     Returns
     -------
     features_threshold : pandas DataFrame
         Detected features for individual threshold.
 
-    regions : dict
+    regions : dict or np.array
         Dictionary containing the regions above/below threshold used
-        for each feature (feature ids as keys).
+        for each feature (feature ids as keys). If return_labels is True,
+        an array with the same shape as data_i instead, containing the
+        feature id of each point in a region and 0 elsewhere.
     """
 
     from skimage.measure import label
     from skimage.morphology import binary_erosion
-    from copy import deepcopy
 
     if min_num != 0:
         warnings.warn(
@@ -476,27 +1067,37 @@ def feature_detection_threshold(
     if is_3D:
         if vertical_axis == 1:
             data_i = np.transpose(data_i, axes=(1, 0, 2))
+            if labels is not None:
+                labels = np.transpose(labels, axes=(1, 0, 2))
         elif vertical_axis == 2:
             data_i = np.transpose(data_i, axes=(2, 0, 1))
+            if labels is not None:
+                labels = np.transpose(labels, axes=(2, 0, 1))
 
-    # if looking for minima, set values above threshold to 0 and scale by data minimum:
-    if target == "maximum":
-        mask = data_i >= threshold
+    if labels is None:
         # if looking for minima, set values above threshold to 0 and scale by data minimum:
-    elif target == "minimum":
-        mask = data_i <= threshold
-    # only include values greater than threshold
-    # erode selected regions by n pixels
-    if n_erosion_threshold > 0:
-        if is_3D:
-            selem = np.ones(
-                (n_erosion_threshold, n_erosion_threshold, n_erosion_threshold)
-            )
-        else:
-            selem = np.ones((n_erosion_threshold, n_erosion_threshold))
-        mask = binary_erosion(mask, selem)
-        # detect individual regions, label  and count the number of pixels included:
-    labels, num_labels = label(mask, background=0, return_num=True)
+        if target == "maximum":
+            mask = data_i >= threshold
+            # if looking for minima, set values above threshold to 0 and scale by data minimum:
+        elif target == "minimum":
+            mask = data_i <= threshold
+        # only include values greater than threshold
+        # erode selected regions by n pixels
+        if n_erosion_threshold > 0:
+            if is_3D:
+                selem = np.ones(
+                    (n_erosion_threshold, n_erosion_threshold, n_erosion_threshold)
+                )
+            else:
+                selem = np.ones((n_erosion_threshold, n_erosion_threshold))
+            mask = binary_erosion(mask, selem)
+            # detect individual regions, label  and count the number of pixels included:
+        labels, num_labels = label(mask, background=0, return_num=True)
+        merge_pbc = True
+    else:
+        num_labels = np.max(labels, initial=0)
+        # regions across periodic boundaries have already been merged
+        merge_pbc = False
     if not is_3D:
         # let's transpose labels to a 1,y,x array to make calculations etc easier.
         labels = labels[np.newaxis, :, :]
@@ -518,220 +1119,15 @@ def feature_detection_threshold(
         )
 
     # we need to deal with PBCs in some way.
-    if PBC_flag in pbc_options and num_labels > 0:
-        #
-        # create our copy of `labels` to edit
-        labels_2 = deepcopy(labels)
-        # points we've already edited
-        skip_list = np.array([])
-        # labels that touch the PBC walls
-        wall_labels = np.array([], dtype=np.int32)
-
-        all_label_props = internal_utils.get_label_props_in_dict(labels)
-        [
-            all_labels_max_size,
-            all_label_locs_v,
-            all_label_locs_h1,
-            all_label_locs_h2,
-        ] = internal_utils.get_indices_of_labels_from_reg_prop_dict(all_label_props)
-
-        # find the points along the boundaries
-
-        # along hdim_1 or both horizontal boundaries
-        if PBC_flag == "hdim_1" or PBC_flag == "both":
-            # north and south wall
-            ns_wall = np.unique(labels[:, (y_min, y_max), :])
-            wall_labels = np.append(wall_labels, ns_wall)
-
-        # along hdim_2 or both horizontal boundaries
-        if PBC_flag == "hdim_2" or PBC_flag == "both":
-            # east/west wall
-            ew_wall = np.unique(labels[:, :, (x_min, x_max)])
-            wall_labels = np.append(wall_labels, ew_wall)
-
-        wall_labels = np.unique(wall_labels)
-
-        for label_ind in wall_labels:
-            new_label_ind = label_ind
-            # 0 isn't a real index
-            if label_ind == 0:
-                continue
-            # skip this label if we have already dealt with it.
-            if np.any(label_ind == skip_list):
-                continue
-
-            # create list for skip labels for this wall label only
-            skip_list_thisind = list()
-
-            # get all locations of this label.
-            # TODO: harmonize x/y/z vs hdim1/hdim2/vdim.
-            label_locs_v = all_label_locs_v[label_ind]
-            label_locs_h1 = all_label_locs_h1[label_ind]
-            label_locs_h2 = all_label_locs_h2[label_ind]
-
-            # loop through every point in the label
-            for label_z, label_y, label_x in zip(
-                label_locs_v, label_locs_h1, label_locs_h2
-            ):
-                # check if this is the special case of being a corner point.
-                # if it's doubly periodic AND on both x and y boundaries, it's a corner point
-                # and we have to look at the other corner.
-                # here, we will only look at the corner point and let the below deal with x/y only.
-                if PBC_flag == "both" and (
-                    np.any(label_y == [y_min, y_max])
-                    and np.any(label_x == [x_min, x_max])
-                ):
-                    # adjust x and y points to the other side
-                    y_val_alt = pbc_utils.adjust_pbc_point(label_y, y_min, y_max)
-                    x_val_alt = pbc_utils.adjust_pbc_point(label_x, x_min, x_max)
-
-                    label_on_corner = labels[label_z, y_val_alt, x_val_alt]
-
-                    if (label_on_corner != 0) and (
-                        ~np.any(label_on_corner == skip_list)
-                    ):
-                        # alt_inds = np.where(labels==alt_label_3)
-                        # get a list of indices where the label on the corner is so we can switch
-                        # them in the new list.
-
-                        labels_2[
-                            all_label_locs_v[label_on_corner],
-                            all_label_locs_h1[label_on_corner],
-                            all_label_locs_h2[label_on_corner],
-                        ] = label_ind
-                        skip_list = np.append(skip_list, label_on_corner)
-                        skip_list_thisind = np.append(
-                            skip_list_thisind, label_on_corner
-                        )
-
-                    # if it's labeled and has already been dealt with for this label
-                    elif (
-                        (label_on_corner != 0)
-                        and (np.any(label_on_corner == skip_list))
-                        and (np.any(label_on_corner == skip_list_thisind))
-                    ):
-                        # print("skip_list_thisind label - has already been treated this index")
-                        continue
-
-                    # if it's labeled and has already been dealt with via a previous label
-                    elif (
-                        (label_on_corner != 0)
-                        and (np.any(label_on_corner == skip_list))
-                        and (~np.any(label_on_corner == skip_list_thisind))
-                    ):
-                        # find the updated label, and overwrite all of label_ind indices with
-                        # updated label
-                        labels_2_alt = labels_2[label_z, y_val_alt, x_val_alt]
-                        labels_2[
-                            label_locs_v, label_locs_h1, label_locs_h2
-                        ] = labels_2_alt
-                        skip_list = np.append(skip_list, label_ind)
-                        break
-
-                # on the hdim1 boundary and periodic on hdim1
-                if (PBC_flag == "hdim_1" or PBC_flag == "both") and np.any(
-                    label_y == [y_min, y_max]
-                ):
-                    y_val_alt = pbc_utils.adjust_pbc_point(label_y, y_min, y_max)
-
-                    # get the label value on the opposite side
-                    label_alt = labels[label_z, y_val_alt, label_x]
-
-                    # if it's labeled and not already been dealt with
-                    if (label_alt != 0) and (~np.any(label_alt == skip_list)):
-                        # find the indices where it has the label value on opposite side and change
-                        # their value to original side
-                        # print(all_label_locs_v[label_alt], alt_inds[0])
-                        labels_2[
-                            all_label_locs_v[label_alt],
-                            all_label_locs_h1[label_alt],
-                            all_label_locs_h2[label_alt],
-                        ] = new_label_ind
-                        # we have already dealt with this label.
-                        skip_list = np.append(skip_list, label_alt)
-                        skip_list_thisind = np.append(skip_list_thisind, label_alt)
-
-                    # if it's labeled and has already been dealt with for this label
-                    elif (
-                        (label_alt != 0)
-                        and (np.any(label_alt == skip_list))
-                        and (np.any(label_alt == skip_list_thisind))
-                    ):
-                        continue
-
-                    # if it's labeled and has already been dealt with
-                    elif (
-                        (label_alt != 0)
-                        and (np.any(label_alt == skip_list))
-                        and (~np.any(label_alt == skip_list_thisind))
-                    ):
-                        # find the updated label, and overwrite all of label_ind indices with
-                        # updated label
-                        labels_2_alt = labels_2[label_z, y_val_alt, label_x]
-                        labels_2[
-                            label_locs_v, label_locs_h1, label_locs_h2
-                        ] = labels_2_alt
-                        new_label_ind = labels_2_alt
-                        skip_list = np.append(skip_list, label_ind)
-
-                if (PBC_flag == "hdim_2" or PBC_flag == "both") and np.any(
-                    label_x == [x_min, x_max]
-                ):
-                    x_val_alt = pbc_utils.adjust_pbc_point(label_x, x_min, x_max)
-
-                    # get the label value on the opposite side
-                    label_alt = labels[label_z, label_y, x_val_alt]
-
-                    # if it's labeled and not already been dealt with
-                    if (label_alt != 0) and (~np.any(label_alt == skip_list)):
-                        # find the indices where it has the label value on opposite side and change
-                        # their value to original side
-                        labels_2[
-                            all_label_locs_v[label_alt],
-                            all_label_locs_h1[label_alt],
-                            all_label_locs_h2[label_alt],
-                        ] = new_label_ind
-                        # we have already dealt with this label.
-                        skip_list = np.append(skip_list, label_alt)
-                        skip_list_thisind = np.append(skip_list_thisind, label_alt)
-
-                    # if it's labeled and has already been dealt with for this label
-                    elif (
-                        (label_alt != 0)
-                        and (np.any(label_alt == skip_list))
-                        and (np.any(label_alt == skip_list_thisind))
-                    ):
-                        continue
-
-                    # if it's labeled and has already been dealt with
-                    elif (
-                        (label_alt != 0)
-                        and (np.any(label_alt == skip_list))
-                        and (~np.any(label_alt == skip_list_thisind))
-                    ):
-                        # find the updated label, and overwrite all of label_ind indices with
-                        # updated label
-                        labels_2_alt = labels_2[label_z, label_y, x_val_alt]
-                        labels_2[
-                            label_locs_v, label_locs_h1, label_locs_h2
-                        ] = labels_2_alt
-                        new_label_ind = labels_2_alt
-                        skip_list = np.append(skip_list, label_ind)
-
-        # copy over new labels after we have adjusted everything
-        labels = labels_2
+    if PBC_flag in pbc_options and num_labels > 0 and merge_pbc:
+        # join regions that are adjacent across the periodic boundaries,
+        # keeping the lowest label of each set of joined regions
+        labels = pbc_utils.merge_labels_pbc(labels, PBC_flag)
 
     # END PBC treatment
     # we need to get label properties again after we handle PBCs.
 
-    label_props = internal_utils.get_label_props_in_dict(labels)
-    if len(label_props) > 0:
-        (
-            total_indices_all,
-            vdim_indices_all,
-            hdim1_indices_all,
-            hdim2_indices_all,
-        ) = internal_utils.get_indices_of_labels_from_reg_prop_dict(label_props)
+    label_index = internal_utils.LabelIndex(labels if is_3D else labels[0])
 
     # values, count = np.unique(labels[:,:].ravel(), return_counts=True)
     # values_counts=dict(zip(values, count))
@@ -739,150 +1135,92 @@ def feature_detection_threshold(
     # values_counts={k:v for k, v in values_counts.items() if v>n_min_threshold}
 
     # check if not entire domain filled as one feature
-    if num_labels > 0:
-        # create empty list to store individual features for this threshold
-        list_features_threshold = list()
-        # create empty dict to store regions for individual features for this threshold
+    features_threshold = pd.DataFrame()
+    if return_labels:
+        regions = np.zeros(labels.shape, dtype=np.int32)
+    else:
         regions = dict()
-        # create empty list of features to remove from parent threshold value
-
-        region = np.empty(mask.shape, dtype=bool)
-        # loop over individual regions:
-        for cur_idx in total_indices_all:
-            # skip this if there aren't enough points to be considered a real feature
-            # as defined above by n_min_threshold
-            curr_count = total_indices_all[cur_idx]
-            if curr_count <= n_min_threshold:
-                continue
-            if is_3D:
-                vdim_indices = vdim_indices_all[cur_idx]
-            else:
-                vdim_indices = None
-            hdim1_indices = hdim1_indices_all[cur_idx]
-            hdim2_indices = hdim2_indices_all[cur_idx]
-
-            label_bbox = label_props[cur_idx].bbox
-            (
-                bbox_zstart,
-                bbox_ystart,
-                bbox_xstart,
-                bbox_zend,
-                bbox_yend,
-                bbox_xend,
-            ) = label_bbox
-            bbox_zsize = bbox_zend - bbox_zstart
-            bbox_xsize = bbox_xend - bbox_xstart
-            bbox_ysize = bbox_yend - bbox_ystart
-            # build small region box
-            if is_3D:
-                region_small = np.full((bbox_zsize, bbox_ysize, bbox_xsize), False)
-                region_small[
-                    vdim_indices - bbox_zstart,
-                    hdim1_indices - bbox_ystart,
-                    hdim2_indices - bbox_xstart,
-                ] = True
-
-            else:
-                region_small = np.full((bbox_ysize, bbox_xsize), False)
-                region_small[
-                    hdim1_indices - bbox_ystart, hdim2_indices - bbox_xstart
-                ] = True
-                # we are 2D and need to remove the dummy 3D coordinate.
-                label_bbox = (
-                    label_bbox[1],
-                    label_bbox[2],
-                    label_bbox[4],
-                    label_bbox[5],
-                )
-
-            # [hdim1_indices,hdim2_indices]= np.nonzero(region)
-            # write region for individual threshold and feature to dict
+    if num_labels > 0:
+        # skip regions if there aren't enough points to be considered a real feature
+        # as defined above by n_min_threshold
+        is_feature = label_index.counts > n_min_threshold
+        feature_labels = label_index.labels[is_feature]
+        feature_counts = label_index.counts[is_feature]
+
+    # after finding proto-features, check if any exceed num threshold
+    # if they do not, provide a blank pandas df and regions
+    if num_labels > 0 and feature_labels.size > 0:
+        # Determine feature position for all regions by one of the following methods:
+        positions = feature_positions(
+            labels if is_3D else labels[0],
+            data_i,
+            index=feature_labels,
+            label_index=label_index,
+            threshold_i=threshold,
+            position_threshold=position_threshold,
+            target=target,
+            PBC_flag=PBC_flag,
+            hdim2_min=x_min,
+            hdim2_max=x_max,
+            hdim1_min=y_min,
+            hdim1_max=y_max,
+        )
+        feature_idx = feature_labels + idx_start
 
+        # create DataFrame in trackpy format for identified features
+        features_threshold = pd.DataFrame(
+            {"frame": int(i_time), "idx": feature_idx},
+            columns=["frame", "idx"],
+        )
+        if is_3D:
+            features_threshold["vdim"] = positions[:, 0]
+        features_threshold["hdim_1"] = positions[:, -2]
+        features_threshold["hdim_2"] = positions[:, -1]
+        features_threshold["num"] = feature_counts
+        features_threshold["threshold_value"] = threshold
+
+        if return_labels:
+            # label the points of each feature with its feature id
+            label_lookup = np.zeros(
+                label_index.offsets.size - 1,
+                dtype=np.promote_types(np.int32, np.min_scalar_type(feature_idx.max())),
+            )
+            label_lookup[feature_labels] = feature_idx
+            regions = label_lookup[labels]
+        else:
             """
-            This block of code creates 1D coordinates from the input 
+            This block of code creates 1D coordinates from the input
             2D or 3D coordinates. Dealing with 1D coordinates is substantially
-            faster than having to carry around (x, y, z) or (x, y) as 
+            faster than having to carry around (x, y, z) or (x, y) as
             separate arrays. This also makes comparisons in remove_parents
-            substantially faster. 
+            substantially faster.
             """
             if is_3D:
-                region_i = np.ravel_multi_index(
+                vdim_indices, hdim1_indices, hdim2_indices = label_index.coords
+                all_points = np.ravel_multi_index(
                     (hdim1_indices, hdim2_indices, vdim_indices),
                     (y_max + 1, x_max + 1, z_max + 1),
                 )
             else:
-                region_i = np.ravel_multi_index(
-                    (hdim1_indices, hdim2_indices), (y_max + 1, x_max + 1)
+                all_points = np.ravel_multi_index(
+                    label_index.coords, (y_max + 1, x_max + 1)
                 )
-
-            regions[cur_idx + idx_start] = region_i
-            # Determine feature position for region by one of the following methods:
-            single_indices = feature_position(
-                hdim1_indices,
-                hdim2_indices,
-                vdim_indices=vdim_indices,
-                region_small=region_small,
-                region_bbox=label_bbox,
-                track_data=data_i,
-                threshold_i=threshold,
-                position_threshold=position_threshold,
-                target=target,
-                PBC_flag=PBC_flag,
-                hdim2_min=x_min,
-                hdim2_max=x_max,
-                hdim1_min=y_min,
-                hdim1_max=y_max,
-            )
-            if is_3D:
-                vdim_index, hdim1_index, hdim2_index = single_indices
-            else:
-                hdim1_index, hdim2_index = single_indices
-            # create individual DataFrame row in tracky format for identified feature
-            appending_dict = {
-                "frame": int(i_time),
-                "idx": cur_idx + idx_start,
-                "hdim_1": hdim1_index,
-                "hdim_2": hdim2_index,
-                "num": curr_count,
-                "threshold_value": threshold,
-            }
-            column_names = [
-                "frame",
-                "idx",
-                "hdim_1",
-                "hdim_2",
-                "num",
-                "threshold_value",
-            ]
-            if is_3D:
-                appending_dict["vdim"] = vdim_index
-                column_names = [
-                    "frame",
-                    "idx",
-                    "vdim",
-                    "hdim_1",
-                    "hdim_2",
-                    "num",
-                    "threshold_value",
+            # write region for individual threshold and feature to dict
+            regions = {
+                cur_idx: all_points[
+                    label_index.offsets[cur_label] : label_index.offsets[cur_label + 1]
                 ]
-            list_features_threshold.append(appending_dict)
-        # after looping thru proto-features, check if any exceed num threshold
-        # if they do not, provide a blank pandas df and regions dict
-        if list_features_threshold == []:
-            # print("no features above num value at threshold: ",threshold)
-            features_threshold = pd.DataFrame()
-            regions = dict()
-        # if they do, provide a dataframe with features organized with 2D and 3D metadata
-        else:
-            # print("at least one feature above num value at threshold: ",threshold)
-            # print("column_names, after cur_idx loop: ",column_names)
-            features_threshold = pd.DataFrame(
-                list_features_threshold, columns=column_names
-            )
-        # features_threshold=pd.DataFrame(list_features_threshold, columns = column_names)
-    else:
-        features_threshold = pd.DataFrame()
-        regions = dict()
+                for cur_idx, cur_label in zip(feature_idx, feature_labels)
+            }
+
+    if return_labels:
+        # return the labelled regions in the same layout as the input data
+        if not is_3D:
+            regions = regions[0]
+        elif vertical_axis == 1:
+            regions = np.transpose(regions, axes=(1, 0, 2))
+        elif vertical_axis == 2:
+            regions = np.transpose(regions, axes=(1, 2, 0))
 
     return features_threshold, regions
 
@@ -907,6 +1245,10 @@ def feature_detection_multithreshold_timestep(
     wavelength_filtering: tuple[float] = None,
     strict_thresholding: bool = False,
     statistic: Union[dict[str, Union[Callable, tuple[Callable, dict]]], None] = None,
+    threshold_hierarchy: bool = False,
+    tile_size: Union[int, tuple[int, int], None] = None,
+    n_tile_workers: int = 1,
+    preserve_dtype: bool = False,
 ) -> pd.DataFrame:
     """Find features in each timestep.
 
@@ -961,101 +1303,742 @@ def feature_detection_multithreshold_timestep(
         'hdim_2' means that we are periodic along hdim2
         'both' means that we are periodic along both horizontal dimensions
 
-    vertical_axis: int
-        The vertical axis number of the data.
-    dxy : float
-        Grid spacing in meters.
+    vertical_axis: int
+        The vertical axis number of the data.
+    dxy : float
+        Grid spacing in meters.
+
+    wavelength_filtering: tuple, optional
+       Minimum and maximum wavelength for spectral filtering in meters. Default is None.
+
+    strict_thresholding: Bool, optional
+        If True, a feature can only be detected if all previous thresholds have been met.
+        Default is False.
+
+    statistic : dict, optional
+            Default is None. Optional parameter to calculate bulk statistics within feature detection.
+            Dictionary with callable function(s) to apply over the region of each detected feature and the name of the statistics to appear in the feature ou            tput dataframe. The functions should be the values and the names of the metric the keys (e.g. {'mean': np.mean})
+
+    threshold_hierarchy: bool, optional
+        If True, the regions of all thresholds are labelled at once with
+        `label_threshold_hierarchy`, rather than labelling the field for each
+        threshold separately. Default is False.
+
+    tile_size: int or tuple of ints, optional
+        If given, the field is processed in horizontal tiles of this size
+        along (hdim_1, hdim_2), so that the full field is never held in memory
+        at once. The output is identical to that of untiled feature detection.
+        Cannot be combined with wavelength_filtering. Default is None.
+
+    n_tile_workers: int, optional
+        Number of worker processes to process the tiles in, if tile_size is
+        given. Default is 1.
+
+    preserve_dtype: bool, optional
+        If True, the smoothed field is written into a buffer that is reused
+        across timesteps, and the spectral filtering of single precision
+        (float32) input is computed in single precision instead of float64.
+        Default is False.
+
+    Returns
+    -------
+    features_threshold : pandas DataFrame
+        Detected features for individual timestep.
+    """
+    # Handle scipy depreciation gracefully
+    try:
+        from scipy.ndimage import gaussian_filter
+    except ImportError:
+        from scipy.ndimage.filters import gaussian_filter
+
+    if min_num != 0:
+        warnings.warn(
+            "min_num parameter has no effect and will be deprecated in a future version of tobac. "
+            "Please use n_min_threshold instead",
+            FutureWarning,
+        )
+
+    if tile_size is not None and wavelength_filtering is not None:
+        raise ValueError(
+            "Wavelength filtering cannot be combined with tiled feature detection."
+        )
+
+    if tile_size is None:
+        # get actual numpy array, loading it if the data are lazy. The data in the
+        # iris cube are not changed, as the smoothing returns a new array
+        track_data = np.asarray(data_i.core_data())
+
+        if preserve_dtype:
+            # the smoothed field is not referenced after this timestep, so
+            # the same array can be used for all timesteps
+            smoothed = internal_utils.reusable_buffer(
+                "smoothed", track_data.shape, track_data.dtype
+            )
+        else:
+            smoothed = None
+        track_data = gaussian_filter(
+            track_data, sigma=sigma_threshold, output=smoothed
+        )  # smooth data slightly to create rounded, continuous field
+
+        # spectrally filter the input data, if desired
+        if wavelength_filtering is not None:
+            track_data = spectral_filtering(
+                dxy,
+                track_data,
+                wavelength_filtering[0],
+                wavelength_filtering[1],
+                preserve_dtype=preserve_dtype,
+            )
+
+    # sort thresholds from least extreme to most extreme
+    threshold_sorted = sorted(threshold, reverse=target == "minimum")
+
+    # check if each threshold has a n_min_threshold (minimum nr. of grid cells associated with
+    # thresholds), if multiple n_min_threshold are given
+    if isinstance(n_min_threshold, list) or isinstance(n_min_threshold, dict):
+        if len(n_min_threshold) is not len(threshold):
+            raise ValueError(
+                "Number of elements in n_min_threshold needs to be the same as thresholds, if "
+                "n_min_threshold is given as dict or list."
+            )
+
+        # check if thresholds in dict correspond to given thresholds
+        if isinstance(n_min_threshold, dict):
+            if threshold_sorted != sorted(
+                n_min_threshold.keys(), reverse=(target == "minimum")
+            ):
+                raise ValueError(
+                    "Ambiguous input for threshold values. If n_min_threshold is given as a dict,"
+                    " the keys not to correspond to the values in threshold."
+                )
+            # sort dictionary by keys (threshold values) so that they match sorted thresholds and
+            # get values for n_min_threshold
+            n_min_threshold = [
+                n_min_threshold[threshold] for threshold in threshold_sorted
+            ]
+
+        elif isinstance(n_min_threshold, list):
+            # if n_min_threshold is a list, sort it such that it still matches with the sorted
+            # threshold values
+            n_min_threshold = [
+                x
+                for _, x in sorted(
+                    zip(threshold, n_min_threshold), reverse=(target == "minimum")
+                )
+            ]
+    elif (
+        not isinstance(n_min_threshold, list)
+        and not isinstance(n_min_threshold, dict)
+        and not isinstance(n_min_threshold, int)
+    ):
+        raise ValueError(
+            "N_min_threshold must be an integer. If multiple values for n_min_threshold are given,"
+            " please provide a dictionary or list."
+        )
+
+    if tile_size is not None:
+        return _feature_detection_multithreshold_timestep_tiled(
+            data_i,
+            i_time,
+            threshold_sorted,
+            n_min_threshold=n_min_threshold,
+            target=target,
+            position_threshold=position_threshold,
+            sigma_threshold=sigma_threshold,
+            n_erosion_threshold=n_erosion_threshold,
+            feature_number_start=feature_number_start,
+            PBC_flag=PBC_flag,
+            vertical_axis=vertical_axis,
+            strict_thresholding=strict_thresholding,
+            statistic=statistic,
+            tile_size=tile_size,
+            n_tile_workers=n_tile_workers,
+        )
+
+    if threshold_hierarchy:
+        zones, zone_labels = label_threshold_hierarchy(
+            track_data,
+            threshold_sorted,
+            target=target,
+            n_erosion_threshold=n_erosion_threshold,
+            PBC_flag=PBC_flag,
+            vertical_axis=vertical_axis,
+        )
+
+    # create empty lists to store regions and features for individual timestep
+    features_thresholds = pd.DataFrame()
+    for i_threshold, threshold_i in enumerate(threshold_sorted):
+        if i_threshold > 0 and not features_thresholds.empty:
+            idx_start = features_thresholds["idx"].max() + feature_number_start
+        else:
+            idx_start = feature_number_start - 1
+
+        if threshold_hierarchy:
+            labels_i = zone_labels[i_threshold][zones]
+        else:
+            labels_i = None
+
+        # select n_min_threshold for respective threshold, if multiple values are given
+        if isinstance(n_min_threshold, list):
+            n_min_threshold_i = n_min_threshold[i_threshold]
+        else:
+            n_min_threshold_i = n_min_threshold
+
+        features_threshold_i, regions_i = feature_detection_threshold(
+            track_data,
+            i_time,
+            threshold=threshold_i,
+            sigma_threshold=sigma_threshold,
+            min_num=min_num,
+            target=target,
+            position_threshold=position_threshold,
+            n_erosion_threshold=n_erosion_threshold,
+            n_min_threshold=n_min_threshold_i,
+            min_distance=min_distance,
+            idx_start=idx_start,
+            PBC_flag=PBC_flag,
+            vertical_axis=vertical_axis,
+            labels=labels_i,
+            return_labels=True,
+        )
+        if any([x is not None for x in features_threshold_i]):
+            features_thresholds = pd.concat(
+                [features_thresholds, features_threshold_i], ignore_index=True
+            )
+
+        if i_threshold > 0 and not features_thresholds.empty:
+            # For multiple threshold, and features found both in the current and previous step, remove
+            # "parent" features from Dataframe
+            features_thresholds, regions_old = remove_parents(
+                features_thresholds,
+                regions_i,
+                regions_old,
+                strict_thresholding=strict_thresholding,
+            )
+        elif i_threshold == 0:
+            regions_old = regions_i
+
+        if statistic and strict_thresholding:
+            # with strict thresholding, remaining features without a region
+            # at this threshold are dropped from regions_old, so their regions
+            # are kept separately for the statistics. The regions of remaining
+            # features are never overlapped by those of later features.
+            if i_threshold == 0:
+                stats_labels = regions_old.copy()
+            else:
+                stats_labels = np.where(regions_old > 0, regions_old, stats_labels)
+
+        logging.debug(
+            "Finished feature detection for threshold "
+            + str(i_threshold)
+            + " : "
+            + str(threshold_i)
+        )
+
+    if statistic:
+        # apply function to get statistics based on labeled regions and functions provided by the user
+        # the feature dataframe is updated by appending a column for each metric. The
+        # statistics of each feature are those of its region at the threshold it was
+        # detected at, so they are only calculated once for the remaining features.
+        labels = stats_labels if strict_thresholding else regions_old
+        features_thresholds = get_statistics(
+            features_thresholds,
+            labels,
+            track_data,
+            statistic=statistic,
+            index=np.unique(labels[labels > 0]),
+            id_column="idx",
+        )
+
+    return features_thresholds
+
+
+def _tile_slices(
+    shape: tuple[int, int], tile_size: tuple[int, int], halo: int
+) -> list[tuple[tuple[slice, slice], tuple[slice, slice]]]:
+    """Split the horizontal dimensions of a field into tiles.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Size of the (hdim_1, hdim_2) dimensions.
+
+    tile_size : tuple of int
+        Size of each tile along (hdim_1, hdim_2), excluding the halo.
+
+    halo : int
+        Number of points by which each tile is extended on every side, within
+        the bounds of the field.
+
+    Returns
+    -------
+    list of tuple
+        For each tile, in row-major order, the slices of the tile and of the
+        tile extended by the halo along (hdim_1, hdim_2).
+    """
+    dim_slices = [
+        [
+            (
+                slice(start, min(start + size, dim_size)),
+                slice(max(start - halo, 0), min(start + size + halo, dim_size)),
+            )
+            for start in range(0, dim_size, size)
+        ]
+        for dim_size, size in zip(shape, tile_size)
+    ]
+    return [
+        ((tile_1, tile_2), (window_1, window_2))
+        for (tile_1, window_1), (tile_2, window_2) in itertools.product(*dim_slices)
+    ]
+
+
+def _read_tiles(
+    data_i: iris.cube.Cube,
+    tiles: list[tuple[tuple[slice, slice], tuple[slice, slice]]],
+    vertical_axis: Union[int, None] = None,
+):
+    """Read the halo-extended window of each tile of the field of a single
+    timestep. If the data are lazy, only the window is loaded.
+
+    Parameters
+    ----------
+    data_i : iris.cube.Cube
+        2D or 3D field of a single timestep.
+
+    tiles : list of tuple
+        Slices of each tile and its window, from `_tile_slices`.
+
+    vertical_axis : int, optional
+        The vertical axis number of 3D data.
+
+    Yields
+    ------
+    tuple
+        The number, slices and window data of each tile.
+    """
+    core_data = data_i.core_data()
+    if core_data.ndim == 3:
+        hdim_axes = [axis for axis in range(3) if axis != vertical_axis]
+    else:
+        hdim_axes = [0, 1]
+    for tile_number, (tile, window) in enumerate(tiles):
+        window_slices = [slice(None)] * core_data.ndim
+        window_slices[hdim_axes[0]], window_slices[hdim_axes[1]] = window
+        yield tile_number, tile, window, np.asarray(core_data[tuple(window_slices)])
+
+
+def _label_tile_zones(
+    tile: tuple,
+    thresholds: list[float] = None,
+    target: Literal["maximum", "minimum"] = "maximum",
+    sigma_threshold: float = 0.5,
+    n_erosion_threshold: int = 0,
+    vertical_axis: Union[int, None] = None,
+) -> tuple[np.array, np.array, np.array]:
+    """Smooth the window of a tile and label the flat zones of the number of
+    thresholds met inside the tile, as in `label_threshold_hierarchy`.
+
+    Parameters
+    ----------
+    tile : tuple
+        The number, slices and window data of the tile, from `_read_tiles`.
+
+    thresholds : list of floats
+        Threshold values, sorted from least extreme to most extreme.
+
+    See `feature_detection_multithreshold_timestep` for the other parameters.
+
+    Returns
+    -------
+    zones : np.array
+        Zone labels inside the tile, numbered from 1.
+
+    levels : np.array
+        Number of thresholds met at each point inside the tile.
+
+    smoothed : np.array
+        Smoothed field inside the tile.
+    """
+    from scipy.ndimage import gaussian_filter
+    from skimage.measure import label
+
+    _, tile_slices, window_slices, window_data = tile
+    # the halo is wide enough that the smoothing and erosion inside the tile
+    # are identical to those of the full field
+    inside = (Ellipsis,) + tuple(
+        slice(
+            tile_slice.start - window_slice.start, tile_slice.stop - window_slice.start
+        )
+        for tile_slice, window_slice in zip(tile_slices, window_slices)
+    )
+    # smooth in the original axis order of the data, as for the full field,
+    # then order 3D data as (vdim, hdim_1, hdim_2)
+    smoothed = gaussian_filter(window_data, sigma=sigma_threshold)
+    if smoothed.ndim == 3:
+        smoothed = np.moveaxis(smoothed, vertical_axis, 0)
+    levels = _threshold_levels(smoothed, thresholds, target, n_erosion_threshold)[
+        inside
+    ]
+    zones = label(levels, background=0).astype(np.int32, copy=False)
+    return zones, levels, smoothed[inside]
+
+
+def _tile_zone_graph(
+    tile: tuple, shape: tuple[int], **kwargs
+) -> tuple[np.array, np.array, np.array, tuple[np.array, np.array], tuple[np.array]]:
+    """Label the flat zones of a single tile and find their properties and
+    the adjacency between them. This is defined at module level so that it
+    can be sent to worker processes.
+
+    Parameters
+    ----------
+    tile : tuple
+        The number, slices and window data of the tile, from `_read_tiles`.
+
+    shape : tuple of int
+        Shape of the full field, as (hdim_1, hdim_2) or (vdim, hdim_1, hdim_2).
+
+    **kwargs
+        Keyword arguments to pass to `_label_tile_zones`.
+
+    Returns
+    -------
+    zone_levels : np.array
+        Number of thresholds met by each zone. Zone 0 is background.
+
+    zone_counts : np.array
+        Number of points of each zone.
+
+    zone_first : np.array
+        Ravelled index of the first point of each zone in the full field.
+
+    edges : tuple of np.array
+        Pairs of adjacent zones within the tile.
+
+    walls : tuple of np.array
+        Zones along the first and last row and column of the tile.
+    """
+    zones, levels, _ = _label_tile_zones(tile, **kwargs)
+    n_zones = np.max(zones, initial=0)
+    zone_levels = np.zeros(n_zones + 1, dtype=levels.dtype)
+    zone_levels[zones.ravel()] = levels.ravel()
+    zone_counts = np.bincount(zones.ravel(), minlength=n_zones + 1)
+
+    # skimage does not number the zones in raster order for all shapes (e.g.
+    # tiles with a trailing axis of size 1), so find the first point of each
+    # zone explicitly
+    zone_numbers, first_points = np.unique(zones.ravel(), return_index=True)
+    is_zone = zone_numbers > 0
+    first_coords = np.unravel_index(first_points[is_zone], zones.shape)
+    tile_slices = tile[1]
+    first_coords = first_coords[:-2] + tuple(
+        coord + tile_slice.start
+        for coord, tile_slice in zip(first_coords[-2:], tile_slices)
+    )
+    zone_first = np.full(n_zones + 1, -1, dtype=np.intp)
+    zone_first[zone_numbers[is_zone]] = np.ravel_multi_index(first_coords, shape)
+
+    walls = (zones[..., 0, :], zones[..., -1, :], zones[..., :, 0], zones[..., :, -1])
+    return (
+        zone_levels,
+        zone_counts,
+        zone_first,
+        _zone_edges(zones, levels, n_zones),
+        walls,
+    )
+
+
+def _wall_edges(walls_a: np.array, walls_b: np.array) -> tuple[np.array, np.array]:
+    """Pairs of labelled points that are adjacent across the seam between two
+    walls of points, with full connectivity along the walls."""
+    edges_a, edges_b = [], []
+    for offset in itertools.product((-1, 0, 1), repeat=walls_a.ndim):
+        slice_a = tuple(
+            slice(max(0, -o), s - max(0, o)) for o, s in zip(offset, walls_a.shape)
+        )
+        slice_b = tuple(
+            slice(max(0, o), s - max(0, -o)) for o, s in zip(offset, walls_b.shape)
+        )
+        wall_a, wall_b = walls_a[slice_a], walls_b[slice_b]
+        is_edge = (wall_a > 0) & (wall_b > 0)
+        edges_a.append(wall_a[is_edge])
+        edges_b.append(wall_b[is_edge])
+    return np.concatenate(edges_a), np.concatenate(edges_b)
+
 
-    wavelength_filtering: tuple, optional
-       Minimum and maximum wavelength for spectral filtering in meters. Default is None.
+def _tile_feature_points(
+    tile: tuple,
+    shape: tuple[int] = None,
+    statistic: Union[dict[str, Union[Callable, tuple[Callable, dict]]], None] = None,
+    vertical_axis: Union[int, None] = None,
+    position_kwargs: dict = None,
+    **kwargs,
+) -> list[tuple]:
+    """Find the positions and statistics of the features that lie entirely
+    inside a tile, and the points of the features that extend beyond it. This
+    is defined at module level so that it can be sent to worker processes.
 
-    strict_thresholding: Bool, optional
-        If True, a feature can only be detected if all previous thresholds have been met.
-        Default is False.
+    Parameters
+    ----------
+    tile : tuple
+        The number, slices and window data of the tile, from `_read_tiles`,
+        and for each threshold with features the threshold value, the lookup
+        from the zones of the tile to feature ids and the ids of the features
+        that extend beyond the tile.
+
+    shape : tuple of int
+        Shape of the full field, as (hdim_1, hdim_2) or (vdim, hdim_1, hdim_2).
 
     statistic : dict, optional
-            Default is None. Optional parameter to calculate bulk statistics within feature detection.
-            Dictionary with callable function(s) to apply over the region of each detected feature and the name of the statistics to appear in the feature ou            tput dataframe. The functions should be the values and the names of the metric the keys (e.g. {'mean': np.mean})
+        Statistics to calculate for each feature, see `get_statistics`.
+
+    vertical_axis : int, optional
+        The vertical axis number of 3D data.
+
+    position_kwargs : dict
+        Keyword arguments to pass to `_feature_positions_points`.
+
+    **kwargs
+        Keyword arguments to pass to `_label_tile_zones`.
 
     Returns
     -------
-    features_threshold : pandas DataFrame
-        Detected features for individual timestep.
+    list of tuple
+        For each threshold in feature_lookups, the ids, positions and (if
+        statistic is given) statistics of the features inside the tile, and
+        the feature id, ravelled index in the full field and value of each
+        point of the features that extend beyond the tile.
     """
-    # Handle scipy depreciation gracefully
-    try:
-        from scipy.ndimage import gaussian_filter
-    except ImportError:
-        from scipy.ndimage.filters import gaussian_filter
+    *tile, feature_lookups = tile
+    zones, _, smoothed = _label_tile_zones(tile, vertical_axis=vertical_axis, **kwargs)
+    tile_slices = tile[1]
+    offsets = (0,) * (zones.ndim - 2) + tuple(
+        tile_slice.start for tile_slice in tile_slices
+    )
 
-    if min_num != 0:
-        warnings.warn(
-            "min_num parameter has no effect and will be deprecated in a future version of tobac. "
-            "Please use n_min_threshold instead",
-            FutureWarning,
+    results = []
+    for threshold_i, zone_features, split_features in feature_lookups:
+        features = zone_features[zones]
+        is_split = np.isin(features, split_features)
+
+        # features inside the tile
+        inside = np.where(is_split, 0, features)
+        label_index = internal_utils.LabelIndex(inside)
+        positions = _feature_positions_points(
+            label_index.point_labels,
+            smoothed.ravel()[label_index.points],
+            tuple(
+                coords + offset for coords, offset in zip(label_index.coords, offsets)
+            ),
+            label_index.labels,
+            threshold_i=threshold_i,
+            **position_kwargs,
         )
+        if statistic and len(label_index):
+            statistics = _get_transposed_statistics(
+                label_index.labels, inside, smoothed, statistic, vertical_axis
+            )
+        else:
+            statistics = None
 
-    # get actual numpy array and make a copy so as not to change the data in the iris cube
-    track_data = data_i.core_data().copy()
-
-    track_data = gaussian_filter(
-        track_data, sigma=sigma_threshold
-    )  # smooth data slightly to create rounded, continuous field
-
-    # spectrally filter the input data, if desired
-    if wavelength_filtering is not None:
-        track_data = spectral_filtering(
-            dxy, track_data, wavelength_filtering[0], wavelength_filtering[1]
+        # points of features that extend beyond the tile
+        split_points = np.flatnonzero(is_split)
+        split_coords = np.unravel_index(split_points, zones.shape)
+        results.append(
+            (
+                label_index.labels,
+                positions,
+                statistics,
+                features.ravel()[split_points],
+                np.ravel_multi_index(
+                    tuple(
+                        coords + offset for coords, offset in zip(split_coords, offsets)
+                    ),
+                    shape,
+                ),
+                smoothed.ravel()[split_points],
+            )
         )
+    return results
 
-    # sort thresholds from least extreme to most extreme
-    threshold_sorted = sorted(threshold, reverse=target == "minimum")
 
-    # check if each threshold has a n_min_threshold (minimum nr. of grid cells associated with
-    # thresholds), if multiple n_min_threshold are given
-    if isinstance(n_min_threshold, list) or isinstance(n_min_threshold, dict):
-        if len(n_min_threshold) is not len(threshold):
-            raise ValueError(
-                "Number of elements in n_min_threshold needs to be the same as thresholds, if "
-                "n_min_threshold is given as dict or list."
-            )
+def _get_transposed_statistics(
+    feature_ids: np.array,
+    labels: np.array,
+    track_data: np.array,
+    statistic: dict[str, Union[Callable, tuple[Callable, dict]]],
+    vertical_axis: Union[int, None] = None,
+) -> pd.DataFrame:
+    """Calculate the statistics of the given features from labels and data
+    ordered as (vdim, hdim_1, hdim_2) for 3D data, in the original axis order
+    of the data.
 
-        # check if thresholds in dict correspond to given thresholds
-        if isinstance(n_min_threshold, dict):
-            if threshold_sorted != sorted(
-                n_min_threshold.keys(), reverse=(target == "minimum")
-            ):
-                raise ValueError(
-                    "Ambiguous input for threshold values. If n_min_threshold is given as a dict,"
-                    " the keys not to correspond to the values in threshold."
-                )
-            # sort dictionary by keys (threshold values) so that they match sorted thresholds and
-            # get values for n_min_threshold
-            n_min_threshold = [
-                n_min_threshold[threshold] for threshold in threshold_sorted
-            ]
+    Returns
+    -------
+    pandas.DataFrame
+        The statistics of each feature, indexed by feature id.
+    """
+    if labels.ndim == 3 and vertical_axis:
+        axes = (1, 0, 2) if vertical_axis == 1 else (1, 2, 0)
+        labels = np.transpose(labels, axes=axes)
+        track_data = np.transpose(track_data, axes=axes)
+    return get_statistics(
+        pd.DataFrame({"idx": feature_ids}),
+        labels,
+        track_data,
+        statistic=statistic,
+        index=feature_ids,
+        id_column="idx",
+    ).set_index("idx")
+
+
+def _feature_detection_multithreshold_timestep_tiled(
+    data_i: iris.cube.Cube,
+    i_time: int,
+    threshold_sorted: list[float],
+    n_min_threshold: Union[int, list[int]] = 0,
+    target: Literal["maximum", "minimum"] = "maximum",
+    position_threshold: Literal[
+        "center", "extreme", "weighted_diff", "weighted abs"
+    ] = "center",
+    sigma_threshold: float = 0.5,
+    n_erosion_threshold: int = 0,
+    feature_number_start: int = 1,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+    vertical_axis: int = None,
+    strict_thresholding: bool = False,
+    statistic: Union[dict[str, Union[Callable, tuple[Callable, dict]]], None] = None,
+    tile_size: Union[int, tuple[int, int]] = None,
+    n_tile_workers: int = 1,
+) -> pd.DataFrame:
+    """Find features in a single timestep by processing the field in
+    horizontal tiles. See `feature_detection_multithreshold_timestep` for
+    the parameters.
+
+    Each tile is smoothed and thresholded with a halo that is wide enough for
+    the smoothing and erosion to be identical to those of the full field, and
+    the flat zones of the number of thresholds met are labelled within the
+    tile as in `label_threshold_hierarchy`. The zones of all tiles are joined
+    across the seams between tiles into a single graph of adjacent zones,
+    from which the regions of each threshold are labelled in the same way as
+    for the full field. The positions and statistics of the remaining
+    features are then found in a second pass over the tiles. Only the points
+    of features that extend over more than one tile are collected, so that
+    the full field is never held in memory. The output is identical to that
+    of untiled feature detection.
+    """
+    pbc_options = ["hdim_1", "hdim_2", "both"]
+    if PBC_flag not in pbc_options and PBC_flag != "none":
+        raise ValueError(
+            "Options for periodic are currently: none, " + ", ".join(pbc_options)
+        )
 
-        elif isinstance(n_min_threshold, list):
-            # if n_min_threshold is a list, sort it such that it still matches with the sorted
-            # threshold values
-            n_min_threshold = [
-                x
-                for _, x in sorted(
-                    zip(threshold, n_min_threshold), reverse=(target == "minimum")
-                )
-            ]
-    elif (
-        not isinstance(n_min_threshold, list)
-        and not isinstance(n_min_threshold, dict)
-        and not isinstance(n_min_threshold, int)
+    is_3D = data_i.ndim == 3
+    if is_3D:
+        shape = (data_i.shape[vertical_axis],) + tuple(
+            size for axis, size in enumerate(data_i.shape) if axis != vertical_axis
+        )
+    else:
+        shape = data_i.shape
+    tile_size = tuple(np.broadcast_to(tile_size, 2))
+    # the extent of the gaussian filter (see scipy.ndimage.gaussian_filter)
+    # and of the erosion
+    halo = int(4.0 * float(sigma_threshold) + 0.5) + n_erosion_threshold
+    tiles = _tile_slices(shape[-2:], tile_size, halo)
+    n_tiles = [len(range(0, size, tile)) for size, tile in zip(shape[-2:], tile_size)]
+
+    tile_kwargs = dict(
+        thresholds=threshold_sorted,
+        target=target,
+        sigma_threshold=sigma_threshold,
+        n_erosion_threshold=n_erosion_threshold,
+        vertical_axis=vertical_axis,
+    )
+
+    # label the zones of each tile, numbering the zones of all tiles
+    # consecutively
+    tile_offsets = [0]
+    zone_levels, zone_counts, zone_first, zone_tiles = [[0]], [[0]], [[-1]], [[-1]]
+    edges_a, edges_b = [], []
+    tile_walls = []
+    for tile_number, (levels, counts, first, edges, walls) in enumerate(
+        internal_utils.ordered_parallel_map(
+            functools.partial(_tile_zone_graph, shape=shape, **tile_kwargs),
+            _read_tiles(data_i, tiles, vertical_axis),
+            n_workers=n_tile_workers,
+        )
     ):
-        raise ValueError(
-            "N_min_threshold must be an integer. If multiple values for n_min_threshold are given,"
-            " please provide a dictionary or list."
+        offset = tile_offsets[-1]
+        zone_levels.append(levels[1:])
+        zone_counts.append(counts[1:])
+        zone_first.append(first[1:])
+        zone_tiles.append(np.full(levels.size - 1, tile_number))
+        edges_a.append(edges[0] + offset)
+        edges_b.append(edges[1] + offset)
+        tile_walls.append([np.where(wall > 0, wall + offset, 0) for wall in walls])
+        tile_offsets.append(offset + levels.size - 1)
+    zone_levels = np.concatenate(zone_levels)
+    zone_counts = np.concatenate(zone_counts)
+    zone_first = np.concatenate(zone_first)
+    zone_tiles = np.concatenate(zone_tiles)
+    n_zones = zone_levels.size - 1
+
+    # join the zones that are adjacent across the seams between tiles
+    def join_walls(tile_numbers, wall):
+        return np.concatenate([tile_walls[i][wall] for i in tile_numbers], axis=-1)
+
+    tile_grid = np.arange(len(tiles)).reshape(n_tiles)
+    for i_row in range(n_tiles[0] - 1):
+        seam_edges = _wall_edges(
+            join_walls(tile_grid[i_row], 1), join_walls(tile_grid[i_row + 1], 0)
+        )
+        edges_a.append(seam_edges[0])
+        edges_b.append(seam_edges[1])
+    for i_column in range(n_tiles[1] - 1):
+        seam_edges = _wall_edges(
+            join_walls(tile_grid[:, i_column], 3),
+            join_walls(tile_grid[:, i_column + 1], 2),
         )
+        edges_a.append(seam_edges[0])
+        edges_b.append(seam_edges[1])
+    edges = (
+        np.concatenate(edges_a).astype(np.int32),
+        np.concatenate(edges_b).astype(np.int32),
+    )
 
-    # create empty lists to store regions and features for individual timestep
+    # zones that are adjacent across periodic boundaries, in the same way as
+    # `pbc_utils.get_pbc_label_pairs`
+    if PBC_flag in pbc_options:
+        first_row = join_walls(tile_grid[0], 0)
+        last_row = join_walls(tile_grid[-1], 1)
+        first_column = join_walls(tile_grid[:, 0], 2)
+        last_column = join_walls(tile_grid[:, -1], 3)
+        walls = []
+        if PBC_flag == "hdim_1" or PBC_flag == "both":
+            walls.append((first_row, last_row))
+        if PBC_flag == "hdim_2" or PBC_flag == "both":
+            walls.append((first_column, last_column))
+        if PBC_flag == "both":
+            walls.append((first_row[..., 0], last_row[..., -1]))
+            walls.append((first_row[..., -1], last_row[..., 0]))
+        zones_a = np.concatenate([wall_a.ravel() for wall_a, _ in walls])
+        zones_b = np.concatenate([wall_b.ravel() for _, wall_b in walls])
+        is_edge = (zones_a > 0) & (zones_b > 0) & (zones_a != zones_b)
+        wall_edges = _decode_zone_edges(
+            np.unique(_encode_zone_edges(zones_a[is_edge], zones_b[is_edge], n_zones)),
+            n_zones,
+        )
+    else:
+        wall_edges = None
+
+    zone_labels = _label_zone_graph(
+        zone_levels, zone_first, edges, len(threshold_sorted), wall_edges
+    )
+
+    # detect the features of each threshold and remove their parents, with
+    # the regions of the features given by their zones
     features_thresholds = pd.DataFrame()
+    zone_features = []
     for i_threshold, threshold_i in enumerate(threshold_sorted):
         if i_threshold > 0 and not features_thresholds.empty:
             idx_start = features_thresholds["idx"].max() + feature_number_start
@@ -1068,31 +2051,33 @@ def feature_detection_multithreshold_timestep(
         else:
             n_min_threshold_i = n_min_threshold
 
-        features_threshold_i, regions_i = feature_detection_threshold(
-            track_data,
-            i_time,
-            threshold=threshold_i,
-            sigma_threshold=sigma_threshold,
-            min_num=min_num,
-            target=target,
-            position_threshold=position_threshold,
-            n_erosion_threshold=n_erosion_threshold,
-            n_min_threshold=n_min_threshold_i,
-            min_distance=min_distance,
-            idx_start=idx_start,
-            PBC_flag=PBC_flag,
-            vertical_axis=vertical_axis,
-        )
-        if any([x is not None for x in features_threshold_i]):
+        label_counts = np.bincount(
+            zone_labels[i_threshold], weights=zone_counts
+        ).astype(np.int64)
+        label_counts[0] = 0
+        feature_labels = np.flatnonzero(label_counts > n_min_threshold_i)
+        zone_features_i = np.zeros(n_zones + 1, dtype=np.int64)
+        if feature_labels.size > 0:
+            feature_idx = feature_labels + idx_start
+            features_threshold_i = pd.DataFrame(
+                {"frame": int(i_time), "idx": feature_idx},
+                columns=["frame", "idx"],
+            )
+            # positions are found once the remaining features are known
+            for dim in ["vdim", "hdim_1", "hdim_2"][-len(shape) :]:
+                features_threshold_i[dim] = np.nan
+            features_threshold_i["num"] = label_counts[feature_labels]
+            features_threshold_i["threshold_value"] = threshold_i
             features_thresholds = pd.concat(
                 [features_thresholds, features_threshold_i], ignore_index=True
             )
+            label_lookup = np.zeros(label_counts.size, dtype=np.int64)
+            label_lookup[feature_labels] = feature_idx
+            zone_features_i = label_lookup[zone_labels[i_threshold]]
+        zone_features.append(zone_features_i)
 
-        # For multiple threshold, and features found both in the current and previous step, remove
-        # "parent" features from Dataframe
+        regions_i = zone_features_i
         if i_threshold > 0 and not features_thresholds.empty:
-            # For multiple threshold, and features found both in the current and previous step, remove
-            # "parent" features from Dataframe
             features_thresholds, regions_old = remove_parents(
                 features_thresholds,
                 regions_i,
@@ -1102,29 +2087,135 @@ def feature_detection_multithreshold_timestep(
         elif i_threshold == 0:
             regions_old = regions_i
 
+    if features_thresholds.empty:
+        if statistic and len(features_thresholds.columns):
+            for stats_name in statistic:
+                features_thresholds[stats_name] = np.full(0, None, object)
+        return features_thresholds
+
+    # find which remaining features are split over several tiles
+    remaining = features_thresholds["idx"].to_numpy()
+    feature_lookups = []
+    for threshold_i, zone_features_i in zip(threshold_sorted, zone_features):
+        zone_features_i = np.where(
+            np.isin(zone_features_i, remaining), zone_features_i, 0
+        )
+        is_feature = zone_features_i > 0
+        if not np.any(is_feature):
+            continue
+        feature_tiles = np.unique(
+            np.stack([zone_features_i[is_feature], zone_tiles[is_feature]]), axis=1
+        )
+        feature_ids, n_feature_tiles = np.unique(feature_tiles[0], return_counts=True)
+        feature_lookups.append(
+            (threshold_i, zone_features_i, feature_ids[n_feature_tiles > 1])
+        )
+
+    # find the positions and statistics of the remaining features, collecting
+    # the points of the features that are split over several tiles
+    def tile_feature_lookups(tile_number):
+        start, end = tile_offsets[tile_number], tile_offsets[tile_number + 1]
+        lookups = []
+        for threshold_i, zone_features_i, split_ids in feature_lookups:
+            tile_features = zone_features_i[start : end + 1].copy()
+            tile_features[0] = 0
+            lookups.append((threshold_i, tile_features, split_ids))
+        return lookups
+
+    position_kwargs = dict(
+        position_threshold=position_threshold,
+        target=target,
+        PBC_flag=PBC_flag,
+        hdim1_min=0,
+        hdim1_max=shape[-2] - 1,
+        hdim2_min=0,
+        hdim2_max=shape[-1] - 1,
+    )
+    feature_ids, positions, statistics = [], [], []
+    split_points = [[] for _ in feature_lookups]
+    for tile_results in internal_utils.ordered_parallel_map(
+        functools.partial(
+            _tile_feature_points,
+            shape=shape,
+            statistic=statistic,
+            position_kwargs=position_kwargs,
+            **tile_kwargs,
+        ),
+        (
+            tile + (tile_feature_lookups(tile[0]),)
+            for tile in _read_tiles(data_i, tiles, vertical_axis)
+        ),
+        n_workers=n_tile_workers,
+    ):
+        for i_lookup, (ids, positions_i, statistics_i, *points) in enumerate(
+            tile_results
+        ):
+            if ids.size > 0:
+                feature_ids.append(ids)
+                positions.append(positions_i)
+            if statistics_i is not None:
+                statistics.append(statistics_i)
+            split_points[i_lookup].append(points)
+
+    for (threshold_i, _, split_ids), points in zip(feature_lookups, split_points):
+        if split_ids.size == 0:
+            continue
+        point_ids, point_index, point_values = (
+            np.concatenate(point_arrays) for point_arrays in zip(*points)
+        )
+        # points of each feature in the same (raster) order as in the full field
+        order = np.lexsort((point_index, point_ids))
+        point_ids, point_index, point_values = (
+            point_ids[order],
+            point_index[order],
+            point_values[order],
+        )
+        point_coords = np.unravel_index(point_index, shape)
+        feature_ids.append(split_ids)
+        positions.append(
+            _feature_positions_points(
+                point_ids,
+                point_values,
+                point_coords,
+                split_ids,
+                threshold_i=threshold_i,
+                **position_kwargs,
+            )
+        )
         if statistic:
-            # reconstruct the labeled regions based on the regions dict
-            labels = np.zeros(track_data.shape)
-            labels = labels.astype(int)
-            for key in regions_old.keys():
-                labels.ravel()[regions_old[key]] = key
-                # apply function to get statistics based on labeled regions and functions provided by the user
-                # the feature dataframe is updated by appending a column for each metric
-            features_thresholds = get_statistics(
-                features_thresholds,
-                labels,
-                track_data,
-                statistic=statistic,
-                index=np.unique(labels[labels > 0]),
-                id_column="idx",
+            # order the points as in the original axis order of the data
+            if is_3D and vertical_axis:
+                data_coords = list(point_coords[1:])
+                data_coords.insert(vertical_axis, point_coords[0])
+                data_shape = list(shape[1:])
+                data_shape.insert(vertical_axis, shape[0])
+                order = np.argsort(np.ravel_multi_index(data_coords, data_shape))
+            else:
+                order = np.argsort(point_index)
+            statistics.append(
+                _get_transposed_statistics(
+                    split_ids,
+                    point_ids[order],
+                    point_values[order],
+                    statistic,
+                )
             )
 
-        logging.debug(
-            "Finished feature detection for threshold "
-            + str(i_threshold)
-            + " : "
-            + str(threshold_i)
-        )
+    rows = pd.Index(np.concatenate(feature_ids)).get_indexer(remaining)
+    positions = np.concatenate(positions)[rows]
+    features_thresholds = features_thresholds.assign(
+        **{
+            dim: positions[:, i_dim]
+            for i_dim, dim in enumerate(["vdim", "hdim_1", "hdim_2"][-len(shape) :])
+        }
+    )
+    if statistic:
+        statistics = pd.concat(statistics)
+        for stats_name in statistic:
+            features_thresholds[stats_name] = statistics.loc[
+                remaining, stats_name
+            ].to_numpy()
+
     return features_thresholds
 
 
@@ -1151,6 +2242,14 @@ def feature_detection_multithreshold(
     dz: Union[float, None] = None,
     strict_thresholding: bool = False,
     statistic: Union[dict[str, Union[Callable, tuple[Callable, dict]]], None] = None,
+    n_workers: int = 1,
+    threshold_hierarchy: bool = False,
+    n_prefetch: int = 1,
+    tile_size: Union[int, tuple[int, int], None] = None,
+    n_tile_workers: int = 1,
+    preserve_dtype: bool = False,
+    checkpoint_dir: Union[str, None] = None,
+    compact_dtypes: bool = False,
 ) -> pd.DataFrame:
     """Perform feature detection based on contiguous regions.
 
@@ -1215,7 +2314,10 @@ def feature_detection_multithreshold(
         start is inclusive, and end is exclusive.
         For example, if your data are oriented as (time, z, y, x) and you want to
         only detect on values between z levels 10 and 29, you would set:
-        {1: (10, 30)}.
+        {1: (10, 30)}. Only the subset is loaded and processed, but the positions
+        of the features (vdim, hdim_1, hdim_2) and their coordinates refer to
+        the full field. Subsetting along the time axis or along a periodic
+        dimension is not supported.
     wavelength_filtering: tuple, optional
        Minimum and maximum wavelength for horizontal spectral filtering in meter.
        Default is None.
@@ -1231,13 +2333,78 @@ def feature_detection_multithreshold(
         If True, a feature can only be detected if all previous thresholds have been met.
         Default is False.
 
+    statistic : dict, optional
+        Default is None. Optional parameter to calculate bulk statistics within feature detection.
+        Dictionary with callable function(s) to apply over the region of each detected feature and
+        the name of the statistics to appear in the feature output dataframe. The functions should
+        be the values and the names of the metric the keys (e.g. {'mean': np.mean})
+
+    n_workers: int, optional
+        Number of worker processes to run the feature detection of individual timesteps
+        in. If 1 (default), all timesteps are processed serially. As each timestep is
+        independent, the output is identical to the serial case. Note that when
+        n_workers > 1, any functions given in `statistic` must be picklable (e.g. no
+        lambda functions).
+
+    threshold_hierarchy: bool, optional
+        If True, the regions of all thresholds are labelled at once from a single
+        hierarchy of nested regions for each timestep, rather than labelling the
+        field for each threshold separately. This is faster for many thresholds and
+        large fields. Default is False.
+
+    n_prefetch: int, optional
+        If the input data are lazy (e.g. dask-backed), the number of timesteps to
+        load in the background ahead of the timestep that is being processed, so
+        that reading the input overlaps with the feature detection. Only single
+        timesteps are ever loaded, never the full dataset. If 0, each timestep is
+        loaded when it is processed. Default is 1.
+
+    tile_size: int or tuple of ints, optional
+        If given, each timestep is processed in horizontal tiles of this size
+        along (hdim_1, hdim_2), which are extended by a halo wide enough for the
+        smoothing and erosion, rather than as a whole. Features that extend over
+        several tiles are joined across the seams between tiles, so the output
+        is identical to that of untiled feature detection (including the
+        min_distance filtering), while the memory use scales with the tile
+        size. If the input data are lazy, only the tiles are loaded, and
+        n_prefetch is ignored. Cannot be combined with wavelength_filtering.
+        Default is None.
+
+    n_tile_workers: int, optional
+        Number of worker processes to process the tiles of each timestep in, if
+        tile_size is given. Default is 1.
+
+    preserve_dtype: bool, optional
+        If True, the smoothing of each timestep writes into a buffer that is
+        reused across timesteps (in each worker process), rather than
+        allocating a new array every timestep, and the spectral filtering (see
+        wavelength_filtering) of single precision (float32) input is computed
+        in single precision rather than float64. This reduces the memory
+        traffic and peak memory use for large float32 fields. The smoothing
+        itself always keeps the dtype of the input. Default is False.
+
+    checkpoint_dir: str, optional
+        If given, the features of each timestep are written to a file in this
+        directory as soon as they have been detected. If the feature detection
+        is interrupted and run again with the same directory, the timesteps
+        that have already been written are read from the directory rather than
+        processed again. The directory must only be reused for the same input
+        data and parameters. Default is None.
+
+    compact_dtypes: bool, optional
+        If True, the features are returned with the compact schema of
+        tobac.utils.compact_dataframe (int32 ids, float32 positions, datetime64
+        times and categorical time strings), which needs much less memory for
+        large numbers of features. Segmentation, linking and bulk statistics
+        keep the schema of compact features. Default is False.
+
     Returns
     -------
     features : pandas.DataFrame
         Detected features. The structure of this dataframe is explained
         `here <https://tobac.readthedocs.io/en/latest/data_input.html>`__
     """
-    from .utils import add_coordinates, add_coordinates_3D
+    from .utils import add_coordinates, add_coordinates_3D, compact_dataframe
 
     logging.debug("start feature detection based on thresholds")
 
@@ -1258,9 +2425,6 @@ def feature_detection_multithreshold(
 
     ndim_time = field_in.coord_dims("time")[0]
 
-    if detect_subset is not None:
-        raise NotImplementedError("Subsetting feature detection not yet supported.")
-
     if detect_subset is not None and ndim_time in detect_subset:
         raise NotImplementedError("Cannot subset on time")
 
@@ -1296,6 +2460,36 @@ def feature_detection_multithreshold(
 
             vertical_axis = vertical_axis - 1
 
+    if detect_subset is not None:
+        # Run the feature detection on the subset of the field only, and move
+        # the features back to the coordinates of the full field afterwards.
+        spatial_axes = [axis for axis in range(field_in.ndim) if axis != ndim_time]
+        subset_dim_axes = dict()
+        if is_3D:
+            subset_dim_axes["vdim"] = spatial_axes.pop(vertical_axis)
+        subset_dim_axes["hdim_1"], subset_dim_axes["hdim_2"] = spatial_axes
+        subset_slices = [slice(None)] * field_in.ndim
+        for axis, (start, end) in detect_subset.items():
+            subset_slices[axis] = slice(start, end)
+        subset_ranges = {
+            dim: subset_slices[axis].indices(field_in.shape[axis])
+            for dim, axis in subset_dim_axes.items()
+        }
+        for dim, periodic_flags in [
+            ("hdim_1", ["hdim_1", "both"]),
+            ("hdim_2", ["hdim_2", "both"]),
+        ]:
+            if PBC_flag in periodic_flags and subset_ranges[dim] != (
+                0,
+                field_in.shape[subset_dim_axes[dim]],
+                1,
+            ):
+                raise ValueError(
+                    "Cannot subset feature detection along a periodic dimension."
+                )
+        field_full = field_in
+        field_in = field_in[tuple(subset_slices)]
+
     # create empty list to store features for all timesteps
     list_features_timesteps = []
 
@@ -1340,52 +2534,97 @@ def feature_detection_multithreshold(
                 "given in meter."
             )
 
-    for i_time, data_i in enumerate(data_time):
-        time_i = data_i.coord("time").units.num2date(data_i.coord("time").points[0])
+    timestep_kwargs = dict(
+        threshold=threshold,
+        sigma_threshold=sigma_threshold,
+        min_num=min_num,
+        target=target,
+        position_threshold=position_threshold,
+        n_erosion_threshold=n_erosion_threshold,
+        n_min_threshold=n_min_threshold,
+        min_distance=min_distance,
+        feature_number_start=feature_number_start,
+        PBC_flag=PBC_flag,
+        vertical_axis=vertical_axis,
+        dxy=dxy,
+        wavelength_filtering=wavelength_filtering,
+        strict_thresholding=strict_thresholding,
+        statistic=statistic,
+        threshold_hierarchy=threshold_hierarchy,
+        tile_size=tile_size,
+        n_tile_workers=n_tile_workers,
+        preserve_dtype=preserve_dtype,
+    )
 
-        features_thresholds = feature_detection_multithreshold_timestep(
-            data_i,
-            i_time,
-            threshold=threshold,
-            sigma_threshold=sigma_threshold,
-            min_num=min_num,
-            target=target,
-            position_threshold=position_threshold,
-            n_erosion_threshold=n_erosion_threshold,
-            n_min_threshold=n_min_threshold,
+    # settings to remove features that are closer than min_distance to each other:
+    if min_distance > 0:
+        hdim1_ax, hdim2_ax = internal_utils.find_hdim_axes_3D(
+            field_in, vertical_coord=vertical_coord
+        )
+        min_distance_kwargs = dict(
+            dxy=dxy,
+            dz=dz,
             min_distance=min_distance,
-            feature_number_start=feature_number_start,
+            z_coordinate_name=vertical_coord,
+            target=target,
             PBC_flag=PBC_flag,
-            vertical_axis=vertical_axis,
-            dxy=dxy,
-            wavelength_filtering=wavelength_filtering,
-            strict_thresholding=strict_thresholding,
-            statistic=statistic,
+            min_h1=0,
+            max_h1=field_in.shape[hdim1_ax] - 1,
+            min_h2=0,
+            max_h2=field_in.shape[hdim2_ax] - 1,
         )
-        # check if list of features is not empty, then merge features from different threshold
-        # values into one DataFrame and append to list for individual timesteps:
-        if not features_thresholds.empty:
-            hdim1_ax, hdim2_ax = internal_utils.find_hdim_axes_3D(
-                field_in, vertical_coord=vertical_coord
+    else:
+        min_distance_kwargs = None
+
+    time_coord = field_in.coord("time")
+    times = time_coord.units.num2date(time_coord.points)
+
+    # Skip the timesteps that have already been written to the checkpoint
+    # directory, without loading them
+    time_slices = enumerate(data_time)
+    if checkpoint_dir is not None:
+        is_done = [
+            os.path.exists(
+                internal_utils.checkpoint_path(checkpoint_dir, "features", i_time)
             )
-            hdim1_max = field_in.shape[hdim1_ax] - 1
-            hdim2_max = field_in.shape[hdim2_ax] - 1
-            # Loop over DataFrame to remove features that are closer than distance_min to each
-            # other:
-            if min_distance > 0:
-                features_thresholds = filter_min_distance(
-                    features_thresholds,
-                    dxy=dxy,
-                    dz=dz,
-                    min_distance=min_distance,
-                    z_coordinate_name=vertical_coord,
-                    target=target,
-                    PBC_flag=PBC_flag,
-                    min_h1=0,
-                    max_h1=hdim1_max,
-                    min_h2=0,
-                    max_h2=hdim2_max,
-                )
+            for i_time in range(len(times))
+        ]
+        remaining_times = [i_time for i_time, done in enumerate(is_done) if not done]
+        time_slices = (
+            time_slice for time_slice in time_slices if not is_done[time_slice[0]]
+        )
+
+    # Load the next timesteps of lazy data in the background while the current
+    # timestep is processed. In tiled detection, only the tiles are loaded.
+    if field_in.has_lazy_data() and tile_size is None:
+        time_slices = internal_utils.ordered_prefetch(
+            _load_time_slice, time_slices, n_prefetch=n_prefetch
+        )
+
+    # Each timestep is independent, so they can be run in worker processes if
+    # requested. Results are always returned in time order.
+    features_timesteps = internal_utils.ordered_parallel_map(
+        functools.partial(
+            _feature_detection_multithreshold_timestep_filtered,
+            min_distance_kwargs=min_distance_kwargs,
+            **timestep_kwargs,
+        ),
+        time_slices,
+        n_workers=n_workers,
+    )
+
+    if checkpoint_dir is not None:
+        for i_time, features_thresholds in zip(remaining_times, features_timesteps):
+            internal_utils.write_checkpoint(
+                features_thresholds, checkpoint_dir, "features", i_time
+            )
+        # assemble the features of all timesteps from the checkpoint directory
+        features_timesteps = (
+            internal_utils.read_checkpoint(checkpoint_dir, "features", i_time)
+            for i_time in range(len(times))
+        )
+
+    for time_i, features_thresholds in zip(times, features_timesteps):
         list_features_timesteps.append(features_thresholds)
 
         logging.debug(
@@ -1401,12 +2640,19 @@ def feature_detection_multithreshold(
         features["feature"] = features.index + feature_number_start
         #    features_filtered = features.drop(features[features['num'] < min_num].index)
         #    features_filtered.drop(columns=['idx','num','threshold_value'],inplace=True)
+        if detect_subset is not None:
+            # add the start of the subset to get positions in the full field
+            for dim, (start, _, _) in subset_ranges.items():
+                features[dim] += start
+            field_in = field_full
         if "vdim" in features:
             features = add_coordinates_3D(
                 features, field_in, vertical_coord=vertical_coord
             )
         else:
             features = add_coordinates(features, field_in)
+        if compact_dtypes:
+            features = compact_dataframe(features)
     else:
         features = None
         logging.debug("No features detected")
@@ -1414,6 +2660,157 @@ def feature_detection_multithreshold(
     return features
 
 
+def feature_detection_multithreshold_stream(
+    fields: Iterable[Union[iris.cube.Cube, xr.DataArray]],
+    feature_number_start: int = 1,
+    **kwargs,
+) -> Iterator[Union[pd.DataFrame, None]]:
+    """Perform feature detection on a stream of fields, e.g. the scans of a
+    live radar feed, yielding the features of each field as soon as it has
+    been processed rather than once all timesteps are done.
+
+    The features are numbered consecutively over the whole stream, and the
+    frame numbers count the timesteps of all fields so far, so that the
+    concatenated output is identical to that of feature_detection_multithreshold
+    for all fields joined along time.
+
+    Parameters
+    ----------
+    fields : iterable of iris.cube.Cube or xarray.DataArray
+        2D or 3D fields of one or more timesteps each. The time can be given as
+        a dimension or, for a single timestep, as a scalar coordinate named
+        'time'. The fields are only read from the iterable when the features
+        of the previous field have been yielded.
+
+    feature_number_start : int, optional
+        Feature id to start with. Default is 1.
+
+    **kwargs
+        Keyword arguments to pass to feature_detection_multithreshold (e.g.
+        dxy, threshold, target). checkpoint_dir is not supported, as the
+        checkpoint files are named by the index of the timestep within each
+        field, which repeats over the fields of the stream.
+
+    Yields
+    ------
+    features : pandas.DataFrame or None
+        Detected features of each field, with the coordinates added, or None
+        if no features were detected in the field.
+
+    Raises
+    ------
+    ValueError
+        If checkpoint_dir is given.
+    """
+    if kwargs.get("checkpoint_dir") is not None:
+        raise ValueError(
+            "checkpoint_dir is not supported for streaming feature detection,"
+            " as the features of each field are yielded once it is processed"
+        )
+    frame_start = 0
+    next_feature_number = feature_number_start
+    for field in fields:
+        field = _add_time_dimension(field)
+        features = feature_detection_multithreshold(
+            field, feature_number_start=feature_number_start, **kwargs
+        )
+        if isinstance(field, iris.cube.Cube):
+            n_times = field.shape[field.coord_dims("time")[0]]
+        else:
+            n_times = field.sizes["time"]
+
+        if features is not None:
+            # number the features and frames over the whole stream. The idx of
+            # features restarts at feature_number_start in every timestep.
+            features["frame"] += frame_start
+            features["feature"] += next_feature_number - feature_number_start
+            next_feature_number += len(features)
+        frame_start += n_times
+        yield features
+
+
+def _add_time_dimension(
+    field: Union[iris.cube.Cube, xr.DataArray]
+) -> Union[iris.cube.Cube, xr.DataArray]:
+    """Promote a scalar time coordinate of a field to a dimension of size 1.
+
+    Parameters
+    ----------
+    field : iris.cube.Cube or xarray.DataArray
+        Field with a time coordinate.
+
+    Returns
+    -------
+    iris.cube.Cube or xarray.DataArray
+        The field with time as a dimension.
+    """
+    if isinstance(field, iris.cube.Cube):
+        if field.coords("time") and not field.coord_dims("time"):
+            return iris.util.new_axis(field, "time")
+        return field
+    if "time" in field.coords and "time" not in field.dims:
+        return field.expand_dims("time")
+    return field
+
+
+def _load_time_slice(
+    time_slice: tuple[int, iris.cube.Cube]
+) -> tuple[int, iris.cube.Cube]:
+    """Load the (lazy) data of the field of a single timestep.
+
+    Parameters
+    ----------
+    time_slice : tuple of (int, iris.cube.Cube)
+        The number of the timestep and the field at that timestep.
+
+    Returns
+    -------
+    tuple of (int, iris.cube.Cube)
+        The number of the timestep and the field with its data loaded.
+    """
+    i_time, data_i = time_slice
+    # accessing the data of an iris cube loads them into memory
+    data_i.data
+    return i_time, data_i
+
+
+def _feature_detection_multithreshold_timestep_filtered(
+    time_slice: tuple[int, iris.cube.Cube],
+    min_distance_kwargs: Union[dict, None] = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """Run feature detection and, optionally, the minimum distance filter on a
+    single timestep. This is defined at module level so that it can be sent to
+    worker processes by feature_detection_multithreshold.
+
+    Parameters
+    ----------
+    time_slice : tuple of (int, iris.cube.Cube)
+        The number of the timestep and the field at that timestep.
+    min_distance_kwargs : dict or None, optional
+        Keyword arguments to pass to filter_min_distance. If None, no filtering
+        is performed. Default is None.
+    **kwargs
+        Keyword arguments to pass to feature_detection_multithreshold_timestep.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Detected features for the timestep.
+    """
+    i_time, data_i = time_slice
+    features_thresholds = feature_detection_multithreshold_timestep(
+        data_i, i_time, **kwargs
+    )
+    # check if list of features is not empty, then remove features that are
+    # closer than min_distance to each other:
+    if min_distance_kwargs is not None and not features_thresholds.empty:
+        features_thresholds = filter_min_distance(
+            features_thresholds, **min_distance_kwargs
+        )
+    return features_thresholds
+
+
 def filter_min_distance(
     features: pd.DataFrame,
     dxy: float = None,
@@ -1545,57 +2942,57 @@ def filter_min_distance(
     # Check if we have PBCs.
     if PBC_flag in ["hdim_1", "hdim_2", "both"]:
         # Note that we multiply by dxy to get the distances in spatial coordinates
-        dist_func = build_distance_function(
-            min_h1 * dxy, max_h1 * dxy, min_h2 * dxy, max_h2 * dxy, PBC_flag
+        features_tree = pbc_utils.PeriodicKDTree(
+            feature_locations,
+            min_h1 * dxy,
+            max_h1 * dxy,
+            min_h2 * dxy,
+            max_h2 * dxy,
+            PBC_flag,
         )
-        features_tree = BallTree(feature_locations, metric="pyfunc", func=dist_func)
-        neighbours = features_tree.query_radius(feature_locations, r=min_distance)
+        neighbours = features_tree.query_ball_point(feature_locations, r=min_distance)
 
     else:
         features_tree = KDTree(feature_locations)
         # Find neighbours for each point
         neighbours = features_tree.query_ball_tree(features_tree, r=min_distance)
 
-    # Iterate over list of neighbours to find which features to remove
-    for i, neighbour_list in enumerate(neighbours):
-        if len(neighbour_list) > 1:
-            # Remove the feature we're interested in as it's always included
-            neighbour_list = list(neighbour_list)
-            neighbour_list.remove(i)
-            # If maximum target check if any neighbours have a larger threshold value
-            if target == "maximum" and np.any(
-                features["threshold_value"].iloc[neighbour_list]
-                > features["threshold_value"].iloc[i]
-            ):
-                removal_flag[i] = True
-            # If minimum target check if any neighbours have a smaller threshold value
-            elif target == "minimum" and np.any(
-                features["threshold_value"].iloc[neighbour_list]
-                < features["threshold_value"].iloc[i]
-            ):
-                removal_flag[i] = True
-            # Else check if any neighbours have an equal threshold value
-            else:
-                wh_equal_threshold = (
-                    features["threshold_value"].iloc[neighbour_list]
-                    == features["threshold_value"].iloc[i]
-                )
-                if np.any(wh_equal_threshold):
-                    # Check if any have a larger number of points
-                    if np.any(
-                        features["num"].iloc[neighbour_list][wh_equal_threshold]
-                        > features["num"].iloc[i]
-                    ):
-                        removal_flag[i] = True
-                    # Check if any have the same number of points and a lower index value
-                    else:
-                        wh_equal_area = (
-                            features["num"].iloc[neighbour_list][wh_equal_threshold]
-                            == features["num"].iloc[i]
-                        )
-                        if np.any(wh_equal_area):
-                            if np.any(wh_equal_area.index[wh_equal_area] < i):
-                                removal_flag[i] = True
+    # Create arrays of all pairs of neighbouring features (excluding each
+    # feature itself), i.e. the edges of the graph of conflicting features
+    n_neighbours = np.array([len(n) for n in neighbours], dtype=int)
+    feature_i = np.repeat(np.arange(len(features)), n_neighbours)
+    feature_j = np.fromiter(
+        itertools.chain.from_iterable(neighbours),
+        dtype=int,
+        count=np.sum(n_neighbours),
+    )
+    is_pair = feature_i != feature_j
+    feature_i = feature_i[is_pair]
+    feature_j = feature_j[is_pair]
+
+    threshold_values = features["threshold_value"].to_numpy()
+    threshold_i = threshold_values[feature_i]
+    threshold_j = threshold_values[feature_j]
+    num = features["num"].to_numpy()
+    num_i = num[feature_i]
+    num_j = num[feature_j]
+
+    # A feature is removed if any neighbour has a larger (smaller for a minimum
+    # target) threshold value, ...
+    if target == "maximum":
+        is_removed = threshold_j > threshold_i
+    else:
+        is_removed = threshold_j < threshold_i
+    # ... or the same threshold value and a larger number of points, ...
+    wh_equal_threshold = threshold_j == threshold_i
+    is_removed |= wh_equal_threshold & (num_j > num_i)
+    # ... or the same threshold value, number of points and a lower index value
+    is_removed |= (
+        wh_equal_threshold
+        & (num_j == num_i)
+        & (features.index.to_numpy()[feature_j] < feature_i)
+    )
+    removal_flag[feature_i[is_removed]] = True
 
     # Return the features that are not flagged for removal
     return features.iloc[~removal_flag]
@@ -30,12 +30,14 @@ References
    12(11), 4551-4570.
 """
 
-import copy
+import functools
 import logging
+import os
 
 import iris.cube
 import numpy as np
 import pandas as pd
+import xarray as xr
 from typing_extensions import Literal
 from typing import Union, Callable
 
@@ -117,14 +119,21 @@ def add_markers(
         # transpose to 3D array to make things easier.
         marker_arr = marker_arr[np.newaxis, :, :]
 
-    if seed_3D_flag == "column":
-        for _, row in features.iterrows():
-            # Offset marker locations by 0.5 to find nearest pixel
-            marker_arr[
-                level,
-                int(row["hdim_1"] + 0.5) % h1_len,
-                int(row["hdim_2"] + 0.5) % h2_len,
-            ] = row["feature"]
+    if len(features) == 0:
+        # nothing to seed
+        pass
+
+    elif seed_3D_flag == "column":
+        # Offset marker locations by 0.5 to find nearest pixel
+        hdim_1_idx = (features["hdim_1"].to_numpy() + 0.5).astype(int) % h1_len
+        hdim_2_idx = (features["hdim_2"].to_numpy() + 0.5).astype(int) % h2_len
+        # where several features fall into the same column, the last one is seeded
+        column_idx = hdim_1_idx * h2_len + hdim_2_idx
+        _, last_in_column = np.unique(column_idx[::-1], return_index=True)
+        last_in_column = len(column_idx) - 1 - last_in_column
+        marker_arr[
+            level, hdim_1_idx[last_in_column], hdim_2_idx[last_in_column]
+        ] = features["feature"].to_numpy()[last_in_column]
 
     elif seed_3D_flag == "box":
         # Get the size of the seed box from the input parameter
@@ -142,128 +151,100 @@ def add_markers(
             seed_h1 = seed_3D_size
             seed_h2 = seed_3D_size
 
-        for _, row in features.iterrows():
-            if is_3D:
-                # If we have a 3D input and we need to do box seeding
-                # we need to have 3D features.
-                try:
-                    row["vdim"]
-                except KeyError:
-                    raise ValueError(
-                        "For Box seeding on 3D segmentation,"
-                        " you must have a 3D input source."
-                    )
-
-            # Because we don't support PBCs on the vertical axis,
-            # this is simple- just go in the seed_z/2 points around the
-            # vdim of the feature, up to the limits of the array.
-            if is_3D:
-                z_seed_start = int(np.max([0, np.ceil(row["vdim"] - seed_z / 2)]))
-                z_seed_end = int(np.min([z_len, np.ceil(row["vdim"] + seed_z / 2)]))
-            else:
-                z_seed_start = 0
-                z_seed_end = 1
-            # For the horizontal dimensions, it's more complicated if we have
-            # PBCs.
-            hdim_1_min = int(np.ceil(row["hdim_1"] - seed_h1 / 2))
-            hdim_1_max = int(np.ceil(row["hdim_1"] + seed_h1 / 2))
-            hdim_2_min = int(np.ceil(row["hdim_2"] - seed_h2 / 2))
-            hdim_2_max = int(np.ceil(row["hdim_2"] + seed_h2 / 2))
-
-            all_seed_boxes = pbc_utils.get_pbc_coordinates(
-                h1_min=0,
-                h1_max=h1_len,
-                h2_min=0,
-                h2_max=h2_len,
-                h1_start_coord=hdim_1_min,
-                h1_end_coord=hdim_1_max,
-                h2_start_coord=hdim_2_min,
-                h2_end_coord=hdim_2_max,
-                PBC_flag=PBC_flag,
+        if is_3D:
+            # If we have a 3D input and we need to do box seeding
+            # we need to have 3D features.
+            if "vdim" not in features:
+                raise ValueError(
+                    "For Box seeding on 3D segmentation,"
+                    " you must have a 3D input source."
+                )
+            feat_vdim = features["vdim"].to_numpy(dtype=float)
+        else:
+            feat_vdim = np.zeros(len(features))
+        feat_hdim_1 = features["hdim_1"].to_numpy(dtype=float)
+        feat_hdim_2 = features["hdim_2"].to_numpy(dtype=float)
+        feat_ids = features["feature"].to_numpy()
+
+        # Because we don't support PBCs on the vertical axis,
+        # this is simple- just go in the seed_z/2 points around the
+        # vdim of the feature, up to the limits of the array.
+        if is_3D:
+            z_start = np.maximum(0, np.ceil(feat_vdim - seed_z / 2)).astype(int)
+            z_end = np.minimum(z_len, np.ceil(feat_vdim + seed_z / 2)).astype(int)
+        else:
+            z_start = np.zeros(len(features), dtype=int)
+            z_end = np.ones(len(features), dtype=int)
+        h1_periodic = PBC_flag in ["hdim_1", "both"]
+        h2_periodic = PBC_flag in ["hdim_2", "both"]
+        h1_start, h1_end = _seed_box_bounds(feat_hdim_1, seed_h1, h1_len, h1_periodic)
+        h2_start, h2_end = _seed_box_bounds(feat_hdim_2, seed_h2, h2_len, h2_periodic)
+
+        # All (feature, z, hdim_1, hdim_2) points covered by the seed boxes,
+        # as offsets from the start of each box up to the largest box size
+        feat_idx, z_off, h1_off, h2_off = np.meshgrid(
+            np.arange(len(features)),
+            np.arange(max(np.max(z_end - z_start), 0)),
+            np.arange(max(np.max(h1_end - h1_start), 0)),
+            np.arange(max(np.max(h2_end - h2_start), 0)),
+            indexing="ij",
+        )
+        in_box = (
+            (z_off < (z_end - z_start)[feat_idx])
+            & (h1_off < (h1_end - h1_start)[feat_idx])
+            & (h2_off < (h2_end - h2_start)[feat_idx])
+        )
+        feat_idx = feat_idx[in_box]
+        z_idx = z_start[feat_idx] + z_off[in_box]
+        h1_idx = (h1_start[feat_idx] + h1_off[in_box]) % h1_len
+        h2_idx = (h2_start[feat_idx] + h2_off[in_box]) % h2_len
+        point_idx = np.ravel_multi_index((z_idx, h1_idx, h2_idx), marker_arr.shape)
+        seed_ids = feat_ids[feat_idx]
+        seed_order = feat_idx
+
+        # Points that have been seeded before this function was called compete
+        # with the seed boxes as well, at the position of their feature
+        prev_markers = marker_arr[z_idx, h1_idx, h2_idx]
+        prev_seeded = np.unique(point_idx[prev_markers != bg_marker])
+        if len(prev_seeded):
+            prev_ids = marker_arr.reshape(-1)[prev_seeded]
+            # the first row of each feature in the dataframe
+            unique_ids, first_row = np.unique(feat_ids, return_index=True)
+            prev_row = np.minimum(
+                np.searchsorted(unique_ids, prev_ids), len(unique_ids) - 1
             )
-            for seed_box in all_seed_boxes:
-                # Need to see if there are any other points seeded
-                # in this seed box first.
-                curr_box_markers = marker_arr[
-                    z_seed_start:z_seed_end,
-                    seed_box[0] : seed_box[1],
-                    seed_box[2] : seed_box[3],
-                ]
-                all_feats_in_box = np.unique(curr_box_markers)
-                if np.any(curr_box_markers != bg_marker):
-                    # If we have non-background points already seeded,
-                    # we need to find the best way to seed them.
-                    # Currently seeding with the closest point.
-                    # Loop through all points in the box
-                    with np.nditer(curr_box_markers, flags=["multi_index"]) as it:
-                        for curr_box_pt in it:
-                            # Get its global index so that we can calculate
-                            # distance and set the array.
-                            local_index = it.multi_index
-                            global_index = (
-                                local_index[0] + z_seed_start,
-                                local_index[1] + seed_box[0],
-                                local_index[2] + seed_box[2],
-                            )
-                            # If it's a background marker, we can just set it
-                            # with the feature we're working on.
-                            if curr_box_pt == bg_marker:
-                                marker_arr[global_index] = row["feature"]
-                                continue
-                            # it has another feature in it. Calculate the distance
-                            # from its current set feature and the new feature.
-                            if is_3D:
-                                curr_coord = (row["vdim"], row["hdim_1"], row["hdim_2"])
-                            else:
-                                curr_coord = (0, row["hdim_1"], row["hdim_2"])
-
-                            dist_from_curr_pt = pbc_utils.calc_distance_coords_pbc(
-                                np.array(global_index),
-                                np.array(curr_coord),
-                                min_h1=0,
-                                max_h1=h1_len,
-                                min_h2=0,
-                                max_h2=h2_len,
-                                PBC_flag=PBC_flag,
-                            )
-
-                            # This is technically an O(N^2) operation, but
-                            # hopefully performance isn't too bad as this should
-                            # be rare.
-                            orig_row = features[
-                                features["feature"] == curr_box_pt
-                            ].iloc[0]
-                            if is_3D:
-                                orig_coord = (
-                                    orig_row["vdim"],
-                                    orig_row["hdim_1"],
-                                    orig_row["hdim_2"],
-                                )
-                            else:
-                                orig_coord = (0, orig_row["hdim_1"], orig_row["hdim_2"])
-                            dist_from_orig_pt = pbc_utils.calc_distance_coords_pbc(
-                                np.array(global_index),
-                                np.array(orig_coord),
-                                min_h1=0,
-                                max_h1=h1_len,
-                                min_h2=0,
-                                max_h2=h2_len,
-                                PBC_flag=PBC_flag,
-                            )
-                            # The current point center is further away
-                            # than the original point center, so do nothing
-                            if dist_from_curr_pt > dist_from_orig_pt:
-                                continue
-                            else:
-                                # the current point center is closer.
-                                marker_arr[global_index] = row["feature"]
-                # completely unseeded region so far.
-                else:
-                    marker_arr[
-                        z_seed_start:z_seed_end,
-                        seed_box[0] : seed_box[1],
-                        seed_box[2] : seed_box[3],
-                    ] = row["feature"]
+            prev_is_feature = unique_ids[prev_row] == prev_ids
+            prev_feat_idx = first_row[prev_row]
+            prev_z, prev_h1, prev_h2 = np.unravel_index(prev_seeded, marker_arr.shape)
+            feat_idx = np.concatenate([feat_idx, prev_feat_idx])
+            z_idx = np.concatenate([z_idx, prev_z])
+            h1_idx = np.concatenate([h1_idx, prev_h1])
+            h2_idx = np.concatenate([h2_idx, prev_h2])
+            point_idx = np.concatenate([point_idx, prev_seeded])
+            seed_ids = np.concatenate([seed_ids, prev_ids])
+            seed_order = np.concatenate([seed_order, np.full(len(prev_seeded), -1)])
+
+        # Distance of each point from the feature it would be seeded with
+        max_dims = (0, h1_len if h1_periodic else 0, h2_len if h2_periodic else 0)
+        deltas = []
+        for idx, coord, max_dim in zip(
+            (z_idx, h1_idx, h2_idx), (feat_vdim, feat_hdim_1, feat_hdim_2), max_dims
+        ):
+            delta = np.abs(idx - coord[feat_idx])
+            deltas.append(np.where(delta > 0.5 * max_dim, delta - max_dim, delta))
+        seed_dist = np.sqrt(deltas[0] ** 2 + deltas[1] ** 2 + deltas[2] ** 2)
+        if len(prev_seeded):
+            seed_dist[len(seed_dist) - len(prev_seeded) :][~prev_is_feature] = np.inf
+
+        # If a point is in several seed boxes, it is seeded with the closest
+        # feature. Of equally close features, the one that comes last in the
+        # dataframe is seeded.
+        seed_sort = np.lexsort((-seed_order, seed_dist, point_idx))
+        _, closest_seed = np.unique(point_idx[seed_sort], return_index=True)
+        closest_seed = seed_sort[closest_seed]
+        marker_arr[
+            z_idx[closest_seed], h1_idx[closest_seed], h2_idx[closest_seed]
+        ] = seed_ids[closest_seed]
 
     # If we aren't 3D, transpose back.
     if not is_3D:
@@ -272,6 +253,392 @@ def add_markers(
     return marker_arr
 
 
+def _seed_box_bounds(
+    feat_coord: np.ndarray, seed_size: float, dim_len: int, periodic: bool
+) -> tuple[np.ndarray, np.ndarray]:
+    """Get the start and (exclusive) end of the seed boxes of features along a
+    horizontal dimension. Along a periodic dimension, the bounds can extend past
+    the edges of the domain and are to be wrapped around it, but a box never
+    covers a point more than once. Along other dimensions, they are truncated
+    at the edges of the domain.
+
+    Parameters
+    ----------
+    feat_coord: np.ndarray
+        Positions of the features along the dimension.
+    seed_size: float
+        Size of the seed boxes along the dimension in grid points.
+    dim_len: int
+        Length of the dimension.
+    periodic: bool
+        Whether the dimension is periodic.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The start and end of the seed box of each feature.
+    """
+    box_start = np.ceil(feat_coord - seed_size / 2).astype(int)
+    box_end = np.ceil(feat_coord + seed_size / 2).astype(int)
+    if periodic:
+        full_dim = (box_end - box_start) >= dim_len
+        box_start = np.where(full_dim, 0, box_start)
+        box_end = np.where(full_dim, dim_len, box_end)
+    else:
+        box_start = np.maximum(0, box_start)
+        box_end = np.minimum(dim_len, box_end)
+    return box_start, box_end
+
+
+def watershed_pbc(
+    image: np.ndarray,
+    markers: np.ndarray,
+    mask: np.ndarray,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+) -> np.ndarray:
+    """Watershed segmentation on a domain with periodic boundaries.
+
+    Along each periodic dimension that has a plane without any points in
+    ``mask``, the domain is rolled so that the boundary falls on that plane
+    and no region crosses it. Along the other periodic dimensions, the domain
+    is extended across its boundaries by a halo of wrapped-around points. The
+    halo is grown until every region of ``mask`` that reaches into the
+    original domain is entirely contained in the extended domain. If this is
+    not the case with a halo of half the size of the domain (e.g. for regions
+    that wrap around the whole domain), the domain is extended by its full
+    size on each side, which is the same as watershedding the domain tiled
+    three times along each of these dimensions. The watershedding is then
+    performed once, and the segmentation of the original domain is cut out
+    of the result and rolled back. Regions that cross the boundaries are
+    thereby segmented as if the domain were continuous.
+
+    Parameters
+    ----------
+    image: np.ndarray
+        Array of (z, hdim_1, hdim_2) to perform the watershedding on, with the
+        lowest values at the centre of the segmented regions.
+    markers: np.ndarray
+        Array of the same shape as ``image`` with the markers (labels) at
+        which the watershedding starts, 0 elsewhere.
+    mask: np.ndarray
+        Boolean array of the same shape as ``image`` of the points that can
+        be segmented.
+    PBC_flag : {'none', 'hdim_1', 'hdim_2', 'both'}
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Returns
+    -------
+    np.ndarray
+        Array of the same shape as ``image`` with the label of the marker
+        that each point in ``mask`` is segmented to, 0 elsewhere.
+    """
+    from scipy.ndimage import find_objects
+
+    try:
+        from skimage.segmentation import watershed
+    except ImportError:
+        from skimage.morphology import watershed
+
+    image = np.asarray(image)
+    markers = np.asarray(markers, dtype=np.int32)
+    mask = np.asarray(mask, dtype=bool)
+
+    # Roll the boundaries onto the longest run of planes without any points to
+    # segment, where possible
+    shifts = [0, 0, 0]
+    periodic_axes = []
+    for axis, is_periodic in (
+        (1, PBC_flag in ["hdim_1", "both"]),
+        (2, PBC_flag in ["hdim_2", "both"]),
+    ):
+        if not is_periodic:
+            continue
+        other_axes = tuple(other for other in range(3) if other != axis)
+        is_empty = ~np.any(mask, axis=other_axes)
+        if np.any(is_empty):
+            shifts[axis] = -_longest_circular_run_start(is_empty)
+        else:
+            periodic_axes.append(axis)
+    if any(shifts):
+        image = np.roll(image, shifts, axis=(0, 1, 2))
+        markers = np.roll(markers, shifts, axis=(0, 1, 2))
+        mask = np.roll(mask, shifts, axis=(0, 1, 2))
+
+    # Start with a halo large enough for regions that cross each boundary
+    # once, i.e. twice the extent of the largest region on the boundary
+    labels = skimage.measure.label(mask, connectivity=1)
+    region_slices = find_objects(labels)
+    max_halo = [(axis_len + 1) // 2 for axis_len in mask.shape]
+    halo = [0, 0, 0]
+    for axis in periodic_axes:
+        boundary_labels = np.union1d(
+            np.take(labels, 0, axis=axis), np.take(labels, -1, axis=axis)
+        )
+        extents = [
+            region_slices[label - 1][axis].stop - region_slices[label - 1][axis].start
+            for label in boundary_labels[boundary_labels > 0]
+        ]
+        halo[axis] = min(2 * max(extents, default=0), max_halo[axis])
+
+    while True:
+        pad_width = [(axis_halo, axis_halo) for axis_halo in halo]
+        mask_padded = np.pad(mask, pad_width, mode="wrap")
+        center = tuple(
+            slice(axis_halo, axis_halo + axis_len)
+            for axis_halo, axis_len in zip(halo, mask.shape)
+        )
+        if all(halo[axis] == mask.shape[axis] for axis in periodic_axes):
+            break
+        # Check whether any region in the original domain is cut off at the
+        # edge of the halo
+        labels = skimage.measure.label(mask_padded, connectivity=1)
+        is_cut_off = np.zeros(labels.max() + 1, dtype=bool)
+        for axis in periodic_axes:
+            is_cut_off[np.take(labels, 0, axis=axis)] = True
+            is_cut_off[np.take(labels, -1, axis=axis)] = True
+        is_cut_off[0] = False
+        if not np.any(is_cut_off[labels[center]]):
+            break
+        if all(halo[axis] == max_halo[axis] for axis in periodic_axes):
+            # Regions that wrap around the domain can be flooded along paths
+            # longer than half of it, so extend the domain by all of it
+            for axis in periodic_axes:
+                halo[axis] = mask.shape[axis]
+        else:
+            for axis in periodic_axes:
+                halo[axis] = min(max(2 * halo[axis], 1), max_halo[axis])
+
+    segmentation_padded = watershed(
+        np.pad(image, pad_width, mode="wrap"),
+        np.pad(markers, pad_width, mode="wrap"),
+        mask=mask_padded,
+    )
+    segmentation = segmentation_padded[center]
+    if any(shifts):
+        segmentation = np.roll(
+            segmentation, [-shift for shift in shifts], axis=(0, 1, 2)
+        )
+    return segmentation
+
+
+def seeded_regions(
+    mask: np.ndarray,
+    markers: np.ndarray,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+) -> np.ndarray:
+    """Reduce a mask to the connected regions that contain at least one marker.
+
+    Parameters
+    ----------
+    mask: np.ndarray
+        Boolean array of the points that can be segmented. If `PBC_flag` is
+        not 'none', the horizontal dimensions (hdim_1, hdim_2) must be the
+        last two dimensions.
+    markers: np.ndarray
+        Array of the same shape as ``mask`` with the markers (labels) at
+        which the watershedding starts, 0 elsewhere.
+    PBC_flag : {'none', 'hdim_1', 'hdim_2', 'both'}
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array of the points of ``mask`` in regions with a marker.
+    """
+    # regions are connected in the same way as by the watershedding
+    labels = skimage.measure.label(mask, connectivity=1)
+    labels = pbc_utils.merge_labels_pbc(labels, PBC_flag)
+    is_seeded = np.zeros(labels.max() + 1, dtype=bool)
+    is_seeded[labels[(markers > 0) & mask]] = True
+    is_seeded[0] = False
+    return is_seeded[labels]
+
+
+def watershed_seeded_regions(
+    image: np.ndarray,
+    markers: np.ndarray,
+    mask: np.ndarray,
+    n_threads: int = 1,
+) -> np.ndarray:
+    """Watershed segmentation of only the connected regions of a mask that
+    contain at least one marker, each within its bounding box. This gives the
+    same segmentation as watershedding the whole domain, as no region can be
+    reached from another region, but takes a time that depends on the size
+    of the seeded regions rather than of the domain.
+
+    Parameters
+    ----------
+    image: np.ndarray
+        Array to perform the watershedding on, with the lowest values at the
+        centre of the segmented regions.
+    markers: np.ndarray
+        Array of the same shape as ``image`` with the markers (labels) at
+        which the watershedding starts, 0 elsewhere.
+    mask: np.ndarray
+        Boolean array of the same shape as ``image`` of the points that can
+        be segmented.
+    n_threads: int, optional (default: 1)
+        Number of threads to watershed the regions with.
+
+    Returns
+    -------
+    np.ndarray
+        Array of the same shape as ``image`` with the label of the marker
+        that each point in ``mask`` is segmented to, 0 elsewhere.
+    """
+    import concurrent.futures
+    from scipy.ndimage import find_objects
+
+    try:
+        from skimage.segmentation import watershed
+    except ImportError:
+        from skimage.morphology import watershed
+
+    image = np.asarray(image)
+    markers = np.asarray(markers, dtype=np.int32)
+    mask = np.asarray(mask, dtype=bool)
+
+    # regions are connected in the same way as by the watershedding
+    labels = skimage.measure.label(mask, connectivity=1)
+    seeded_labels = np.unique(labels[(markers > 0) & mask])
+    seeded_labels = seeded_labels[seeded_labels > 0]
+    region_slices = find_objects(labels)
+
+    def segment_region(label):
+        region = region_slices[label - 1]
+        region_mask = labels[region] == label
+        region_segmentation = watershed(
+            image[region], markers[region], mask=region_mask
+        )
+        return region, region_mask, region_segmentation
+
+    segmentation = np.zeros(markers.shape, dtype=np.int32)
+    use_threads = n_threads is not None and n_threads > 1
+    # threads are only started once regions are submitted to the executor
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=n_threads if use_threads else 1
+    ) as executor:
+        segmented_regions = (executor.map if use_threads else map)(
+            segment_region, seeded_labels
+        )
+        for region, region_mask, region_segmentation in segmented_regions:
+            segmentation[region][region_mask] = region_segmentation[region_mask]
+    return segmentation
+
+
+def constrain_max_distance(
+    segmentation: np.ndarray,
+    markers: np.ndarray,
+    max_distance_pixel: float,
+    PBC_flag: Literal["none", "hdim_1", "hdim_2", "both"] = "none",
+) -> np.ndarray:
+    """Remove all points from a segmentation that are more than a maximum
+    distance away from the nearest marker. The distances are only calculated
+    within the bounding box of each segmented region extended by the maximum
+    distance, which contains all markers within reach of the region.
+
+    Parameters
+    ----------
+    segmentation: np.ndarray
+        Array with the label of the segmented region of each point, with
+        values <= 0 for points not belonging to a region. If `PBC_flag` is
+        not 'none', the horizontal dimensions (hdim_1, hdim_2) must be the
+        last two dimensions. Modified in place.
+    markers: np.ndarray
+        Array of the same shape as ``segmentation`` with the markers (labels)
+        from which the distance is measured, 0 elsewhere.
+    max_distance_pixel: float
+        Maximum distance from the nearest marker in number of grid points.
+    PBC_flag : {'none', 'hdim_1', 'hdim_2', 'both'}
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Returns
+    -------
+    np.ndarray
+        ``segmentation`` with points further than ``max_distance_pixel`` from
+        the nearest marker set to 0.
+    """
+    from scipy.ndimage import distance_transform_edt, find_objects
+
+    reach = int(np.ceil(max_distance_pixel))
+    # Extend the markers across periodic boundaries by the maximum distance,
+    # or by half the domain, beyond which the nearest image is on the other
+    # side
+    halo = [0] * segmentation.ndim
+    if PBC_flag in ["hdim_1", "both"]:
+        halo[-2] = min(reach, (segmentation.shape[-2] + 1) // 2)
+    if PBC_flag in ["hdim_2", "both"]:
+        halo[-1] = min(reach, (segmentation.shape[-1] + 1) // 2)
+    is_background = np.pad(
+        np.asarray(markers) == 0,
+        [(axis_halo, axis_halo) for axis_halo in halo],
+        mode="wrap",
+    )
+
+    region_slices = find_objects(np.maximum(segmentation, 0))
+    for label, region in enumerate(region_slices, start=1):
+        if region is None:
+            continue
+        window = tuple(
+            slice(
+                max(axis_slice.start + axis_halo - reach, 0),
+                min(axis_slice.stop + axis_halo + reach, padded_len),
+            )
+            for axis_slice, axis_halo, padded_len in zip(
+                region, halo, is_background.shape
+            )
+        )
+        window_background = is_background[window]
+        if np.all(window_background):
+            segmentation[region][segmentation[region] == label] = 0
+            continue
+        distance = distance_transform_edt(window_background)
+        # the region's bounding box within the window
+        region_in_window = tuple(
+            slice(
+                axis_slice.start + axis_halo - axis_window.start,
+                axis_slice.stop + axis_halo - axis_window.start,
+            )
+            for axis_slice, axis_halo, axis_window in zip(region, halo, window)
+        )
+        region_segmentation = segmentation[region]
+        region_segmentation[
+            (region_segmentation == label)
+            & (distance[region_in_window] > max_distance_pixel)
+        ] = 0
+    return segmentation
+
+
+def _longest_circular_run_start(is_true: np.ndarray) -> int:
+    """Get the index of the first element of the longest run of True values
+    in a 1D boolean array that wraps around at its ends. The array must
+    contain at least one True value. If all values are True, 0 is returned.
+    """
+    if np.all(is_true):
+        return 0
+    # rotate the array to start just after a False value, so that no run
+    # wraps around the ends
+    first_false = int(np.argmin(is_true))
+    rotated = np.roll(is_true, -first_false)
+    edges = np.diff(np.concatenate([[0], rotated.astype(np.int8), [0]]))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    longest_run = np.argmax(run_ends - run_starts)
+    return int((run_starts[longest_run] + first_false) % len(is_true))
+
+
 def segmentation_3D(
     features,
     field,
@@ -348,6 +715,8 @@ def segmentation_timestep(
     segment_number_below_threshold: int = 0,
     segment_number_unassigned: int = 0,
     statistic: Union[dict[str, Union[Callable, tuple[Callable, dict]]], None] = None,
+    seeded_regions_only: bool = False,
+    n_region_threads: int = 1,
 ) -> tuple[iris.cube.Cube, pd.DataFrame]:
     """Perform watershedding for an individual time step of the data. Works
     for both 2D and 3D data
@@ -383,7 +752,8 @@ def segmentation_timestep(
 
     max_distance : float, optional
         Maximum distance from a marker allowed to be classified as
-        belonging to that cell in meters. Default is None.
+        belonging to that cell in meters, measured across periodic
+        boundaries if `PBC_flag` is set. Default is None.
 
     vertical_coord : str, optional
         Vertical coordinate in 3D input data. If None, input is checked for
@@ -415,6 +785,14 @@ def segmentation_timestep(
         This can be the same as `segment_number_below_threshold`, but can also be set separately.
     statistics: boolean, optional
         Default is None. If True, bulk statistics for the data points assigned to each feature are saved in output.
+    seeded_regions_only: bool, optional
+        If True, only the connected regions beyond the threshold that contain a feature
+        are watershedded, each within its bounding box, so that the time taken depends
+        on the size of the features rather than of the domain. The output is the same.
+        Default is False.
+    n_region_threads: int, optional
+        Number of threads to watershed the regions with if `seeded_regions_only` is
+        True. Default is 1.
 
 
     Returns
@@ -449,12 +827,8 @@ def segmentation_timestep(
     except ImportError:
         from skimage.morphology import watershed
     # from skimage.segmentation import random_walker
-    from scipy.ndimage import distance_transform_edt
     from copy import deepcopy
 
-    if max_distance is not None and PBC_flag in ["hdim_1", "hdim_2", "both"]:
-        raise NotImplementedError("max_distance not yet implemented for PBCs")
-
     # How many dimensions are we using?
     if field_in.ndim == 2:
         hdim_1_axis = 0
@@ -539,18 +913,39 @@ def segmentation_timestep(
 
     # perform segmentation:
     if method == "watershed":
-        segmentation_mask = watershed(
-            np.array(data_segmentation), markers.astype(np.int32), mask=unmasked
-        )
+        if PBC_flag in ["hdim_1", "hdim_2", "both"]:
+            # periodic watershedding works on (z, hdim_1, hdim_2) arrays
+            unmasked_pbc = unmasked if is_3D_seg else unmasked[np.newaxis]
+            if seeded_regions_only:
+                unmasked_pbc = seeded_regions(
+                    unmasked_pbc,
+                    markers if is_3D_seg else markers[np.newaxis],
+                    PBC_flag=PBC_flag,
+                )
+            segmentation_mask = watershed_pbc(
+                data_segmentation if is_3D_seg else data_segmentation[np.newaxis],
+                markers if is_3D_seg else markers[np.newaxis],
+                unmasked_pbc,
+                PBC_flag,
+            )
+            if not is_3D_seg:
+                segmentation_mask = segmentation_mask[0]
+        elif seeded_regions_only:
+            segmentation_mask = watershed_seeded_regions(
+                data_segmentation, markers, unmasked, n_threads=n_region_threads
+            )
+        else:
+            segmentation_mask = watershed(
+                np.array(data_segmentation), markers.astype(np.int32), mask=unmasked
+            )
     else:
         raise ValueError("unknown method, must be watershed")
 
     # remove everything from the individual masks that is more than max_distance_pixel away from the markers
     if max_distance is not None:
-        D = distance_transform_edt((markers == 0))
-        segmentation_mask[
-            np.bitwise_and(segmentation_mask > 0, D > max_distance_pixel)
-        ] = 0
+        segmentation_mask = constrain_max_distance(
+            segmentation_mask, markers, max_distance_pixel, PBC_flag
+        )
 
     # mask all segmentation_mask points below threshold as -1
     # to differentiate from those unmasked points NOT filled by watershedding
@@ -558,467 +953,6 @@ def segmentation_timestep(
     points_below_threshold_val = -1
     segmentation_mask[~unmasked] = points_below_threshold_val
 
-    hdim1_min = 0
-    hdim1_max = segmentation_mask.shape[hdim_1_axis] - 1
-    hdim2_min = 0
-    hdim2_max = segmentation_mask.shape[hdim_2_axis] - 1
-
-    # all options that involve dealing with periodic boundaries
-    pbc_options = ["hdim_1", "hdim_2", "both"]
-    # Only run this if we need to deal with PBCs
-    if PBC_flag in pbc_options:
-        if not is_3D_seg:
-            # let's transpose segmentation_mask to a 1,y,x array to make calculations etc easier.
-            segmentation_mask = segmentation_mask[np.newaxis, :, :]
-            unmasked = unmasked[np.newaxis, :, :]
-            data_segmentation = data_segmentation[np.newaxis, :, :]
-            vertical_coord_axis = 0
-            hdim_1_axis = 1
-            hdim_2_axis = 2
-
-        seg_mask_unseeded = np.zeros(segmentation_mask.shape)
-
-        # Return all indices where segmentation field == 0
-        # meaning unfilled but above threshold
-        # TODO: is there a way to do this without np.where?
-        vdim_unf, hdim1_unf, hdim2_unf = np.where(segmentation_mask == 0)
-        seg_mask_unseeded[vdim_unf, hdim1_unf, hdim2_unf] = 1
-
-        # create labeled field of unfilled, unseeded features
-        labels_unseeded, label_num = skimage.measure.label(
-            seg_mask_unseeded, return_num=True
-        )
-
-        markers_2 = np.zeros(data_segmentation.shape, dtype=np.int32)
-
-        # PBC marker seeding approach
-        # loop thru LB points, then check if fillable region (labels_unseeded > 0) and seed
-        # then check if point on other side of boundary is > 0 in segmentation_mask and
-        # adjust where needed
-        """
-        "First pass" at seeding features across the boundaries. This first pass will bring in
-        eligible (meaning values that are higher than threshold) but not previously watershedded 
-        points across the boundary by seeding them with the appropriate feature across the boundary.
-
-        Later, we will run the second pass or "buddy box" approach that handles cases where points across the boundary
-        have been watershedded already. 
-        """
-        if PBC_flag == "hdim_1" or PBC_flag == "both":
-            check_add_unseeded_across_bdrys(
-                "hdim_1",
-                segmentation_mask,
-                labels_unseeded,
-                hdim1_min,
-                hdim1_max,
-                markers_2,
-            )
-        if PBC_flag == "hdim_2" or PBC_flag == "both":
-            check_add_unseeded_across_bdrys(
-                "hdim_2",
-                segmentation_mask,
-                labels_unseeded,
-                hdim2_min,
-                hdim2_max,
-                markers_2,
-            )
-
-        # Deal with the opposite corner only
-        if PBC_flag == "both":
-            # TODO: This seems quite slow, is there scope for further speedup?
-            for vdim_ind in range(0, segmentation_mask.shape[0]):
-                for hdim1_ind in [hdim1_min, hdim1_max]:
-                    for hdim2_ind in [hdim2_min, hdim2_max]:
-                        # If this point is unseeded and unlabeled
-                        if labels_unseeded[vdim_ind, hdim1_ind, hdim2_ind] == 0:
-                            continue
-
-                        # Find the opposite point in hdim1 space
-                        hdim1_opposite_corner = (
-                            hdim1_min if hdim1_ind == hdim1_max else hdim1_max
-                        )
-                        hdim2_opposite_corner = (
-                            hdim2_min if hdim2_ind == hdim2_max else hdim2_max
-                        )
-                        if (
-                            segmentation_mask[
-                                vdim_ind, hdim1_opposite_corner, hdim2_opposite_corner
-                            ]
-                            <= 0
-                        ):
-                            continue
-
-                        markers_2[vdim_ind, hdim1_ind, hdim2_ind] = segmentation_mask[
-                            vdim_ind, hdim1_opposite_corner, hdim2_opposite_corner
-                        ]
-
-        markers_2[~unmasked] = 0
-
-        if method == "watershed":
-            segmentation_mask_2 = watershed(
-                data_segmentation, markers_2.astype(np.int32), mask=unmasked
-            )
-        else:
-            raise ValueError("unknown method, must be watershed")
-
-        # Sum up original mask and secondary PBC-mask for full PBC segmentation
-        segmentation_mask_3 = segmentation_mask + segmentation_mask_2
-
-        # Secondary seeding complete, now blending periodic boundaries
-        # keep segmentation mask fields for now so we can save these all later
-        # for demos of changes, otherwise, could add deletion for memory efficiency, e.g.
-
-        # del segmentation_mask
-        # del segmentation_mask_2
-        # gc.collect()
-
-        # update mask coord regions
-
-        """
-        Now, start the second round of watershedding- the "buddy box" approach.
-        'buddies' array contains features of interest and any neighbors that are across the boundary or 
-        otherwise have lateral and/or diagonal physical contact with that label.
-        The "buddy box" is also used for multiple crossings of the boundaries with segmented features.
-        """
-
-        # TODO: this is a very inelegant way of handling this problem. We should wrap up the pure
-        # segmentation routines and simply call them again here with the same parameters.
-        reg_props_dict = internal_utils.get_label_props_in_dict(segmentation_mask_3)
-
-        if len(reg_props_dict) != 0:
-            (
-                curr_reg_inds,
-                z_reg_inds,
-                y_reg_inds,
-                x_reg_inds,
-            ) = internal_utils.get_indices_of_labels_from_reg_prop_dict(reg_props_dict)
-
-        wall_labels = np.array([])
-
-        w_wall = np.unique(segmentation_mask_3[:, :, 0])
-        wall_labels = np.append(wall_labels, w_wall)
-
-        s_wall = np.unique(segmentation_mask_3[:, 0, :])
-        wall_labels = np.append(wall_labels, s_wall)
-
-        wall_labels = np.unique(wall_labels)
-        wall_labels = wall_labels[(wall_labels) > 0].astype(int)
-
-        # Loop through all segmentation mask labels on the wall
-        for cur_idx in wall_labels:
-            vdim_indices = z_reg_inds[cur_idx]
-            hdim1_indices = y_reg_inds[cur_idx]
-            hdim2_indices = x_reg_inds[cur_idx]
-
-            # start buddies array with feature of interest
-            buddies = np.array([cur_idx], dtype=int)
-            # Loop through all points in the segmentation mask that we're intertested in
-            for label_z, label_y, label_x in zip(
-                vdim_indices, hdim1_indices, hdim2_indices
-            ):
-                # check if this is the special case of being a corner point.
-                # if it's doubly periodic AND on both x and y boundaries, it's a corner point
-                # and we have to look at the other corner.
-                # here, we will only look at the corner point and let the below deal with x/y only.
-                if PBC_flag == "both" and (
-                    np.any(label_y == [hdim1_min, hdim1_max])
-                    and np.any(label_x == [hdim2_min, hdim2_max])
-                ):
-                    # adjust x and y points to the other side
-                    y_val_alt = pbc_utils.adjust_pbc_point(
-                        label_y, hdim1_min, hdim1_max
-                    )
-                    x_val_alt = pbc_utils.adjust_pbc_point(
-                        label_x, hdim2_min, hdim2_max
-                    )
-                    label_on_corner = segmentation_mask_3[label_z, y_val_alt, x_val_alt]
-
-                    if label_on_corner >= 0:
-                        # add opposite-corner buddy if it exists
-                        buddies = np.append(buddies, label_on_corner)
-
-                # on the hdim1 boundary and periodic on hdim1
-                if (PBC_flag == "hdim_1" or PBC_flag == "both") and np.any(
-                    label_y == [hdim1_min, hdim1_max]
-                ):
-                    y_val_alt = pbc_utils.adjust_pbc_point(
-                        label_y, hdim1_min, hdim1_max
-                    )
-
-                    # get the label value on the opposite side
-                    label_alt = segmentation_mask_3[label_z, y_val_alt, label_x]
-
-                    # if it's labeled and not already been dealt with
-                    if label_alt >= 0:
-                        # add above/below buddy if it exists
-                        buddies = np.append(buddies, label_alt)
-
-                if (PBC_flag == "hdim_2" or PBC_flag == "both") and np.any(
-                    label_x == [hdim2_min, hdim2_max]
-                ):
-                    x_val_alt = pbc_utils.adjust_pbc_point(
-                        label_x, hdim2_min, hdim2_max
-                    )
-
-                    # get the seg value on the opposite side
-                    label_alt = segmentation_mask_3[label_z, label_y, x_val_alt]
-
-                    # if it's labeled and not already been dealt with
-                    if label_alt >= 0:
-                        # add left/right buddy if it exists
-                        buddies = np.append(buddies, label_alt)
-
-            buddies = np.unique(buddies)
-
-            if np.all(buddies == cur_idx):
-                continue
-            else:
-                inter_buddies, feat_inds, buddy_inds = np.intersect1d(
-                    features_in.feature.values[:], buddies, return_indices=True
-                )
-
-            # Get features that are needed for the buddy box
-            buddy_features = deepcopy(features_in.iloc[feat_inds])
-
-            # create arrays to contain points of all buddies
-            # and their transpositions/transformations
-            # for use in Buddy Box space
-
-            # z,y,x points in the grid domain with no transformations
-            # NOTE: when I think about it, not sure if these are really needed
-            # as we use the y_a1/x_a1 points for the data transposition
-            # to the buddy box rather than these and their z2/y2/x2 counterparts
-            buddy_z = np.array([], dtype=int)
-            buddy_y = np.array([], dtype=int)
-            buddy_x = np.array([], dtype=int)
-
-            # z,y,x points from the grid domain WHICH MAY OR MAY NOT BE TRANSFORMED
-            # so as to be continuous/contiguous across a grid boundary for that dimension
-            # (e.g., instead of [1496,1497,0,1,2,3] it would be [1496,1497,1498,1499,1500,1501])
-            buddy_z2 = np.array([], dtype=int)
-            buddy_y2 = np.array([], dtype=int)
-            buddy_x2 = np.array([], dtype=int)
-
-            # These are just for feature positions and are in z2/y2/x2 space
-            # (may or may not be within real grid domain)
-            # so that when the buddy box is constructed, seeding is done properly
-            # in the buddy box space
-
-            # NOTE: We may not need this, as we already do this editing the buddy_features df
-            # and an iterrows call through this is what's used to actually seed the buddy box
-
-            buddy_looper = 0
-
-            # loop thru buddies
-            for buddy in buddies:
-                if buddy == 0:
-                    continue
-                # isolate feature from set of buddies
-                buddy_feat = features_in[features_in["feature"] == buddy].iloc[0]
-
-                # transform buddy feature position if needed for positioning in z2/y2/x2 space
-                # MAY be redundant with what is done just below here
-                yf2 = pbc_utils.transfm_pbc_point(
-                    int(buddy_feat.hdim_1), hdim1_min, hdim1_max
-                )
-                xf2 = pbc_utils.transfm_pbc_point(
-                    int(buddy_feat.hdim_2), hdim2_min, hdim2_max
-                )
-
-                # edit value in buddy_features dataframe
-                buddy_features.hdim_1.values[
-                    buddy_looper
-                ] = pbc_utils.transfm_pbc_point(
-                    float(buddy_feat.hdim_1), hdim1_min, hdim1_max
-                )
-                buddy_features.hdim_2.values[
-                    buddy_looper
-                ] = pbc_utils.transfm_pbc_point(
-                    float(buddy_feat.hdim_2), hdim2_min, hdim2_max
-                )
-
-                buddy_looper = buddy_looper + 1
-                # Create 1:1 map through actual domain points and continuous/contiguous points
-                # used to identify buddy box dimension lengths for its construction
-                for z, y, x in zip(
-                    z_reg_inds[buddy], y_reg_inds[buddy], x_reg_inds[buddy]
-                ):
-                    buddy_z = np.append(buddy_z, z)
-                    buddy_y = np.append(buddy_y, y)
-                    buddy_x = np.append(buddy_x, x)
-
-                    y2 = pbc_utils.transfm_pbc_point(y, hdim1_min, hdim1_max)
-                    x2 = pbc_utils.transfm_pbc_point(x, hdim2_min, hdim2_max)
-
-                    buddy_z2 = np.append(buddy_z2, z)
-                    buddy_y2 = np.append(buddy_y2, y2)
-                    buddy_x2 = np.append(buddy_x2, x2)
-
-            # Buddy Box!
-            # Identify mins and maxes of Buddy Box continuous points range
-            # so that box of correct size can be constructed
-            bbox_zstart = int(np.min(buddy_z2))
-            bbox_ystart = int(np.min(buddy_y2))
-            bbox_xstart = int(np.min(buddy_x2))
-            bbox_zend = int(np.max(buddy_z2) + 1)
-            bbox_yend = int(np.max(buddy_y2) + 1)
-            bbox_xend = int(np.max(buddy_x2) + 1)
-
-            bbox_zsize = bbox_zend - bbox_zstart
-            bbox_ysize = bbox_yend - bbox_ystart
-            bbox_xsize = bbox_xend - bbox_xstart
-
-            # Creation of actual Buddy Box space for transposition
-            # of data in domain and re-seeding with Buddy feature markers
-            buddy_rgn = np.zeros((bbox_zsize, bbox_ysize, bbox_xsize))
-
-            # need to loop thru ALL z,y,x inds in buddy box
-            # not just the ones that have nonzero seg mask values
-
-            # "_a1" points are re-transformations from the continuous buddy box points
-            # back to original grid/domain space to ensure that the correct data are
-            # copied to the proper Buddy Box locations
-            for z in range(bbox_zstart, bbox_zend):
-                for y in range(bbox_ystart, bbox_yend):
-                    for x in range(bbox_xstart, bbox_xend):
-                        z_a1 = z
-                        if y > hdim1_max:
-                            y_a1 = y - (hdim1_max + 1)
-                        else:
-                            y_a1 = y
-
-                        if x > hdim2_max:
-                            x_a1 = x - (hdim2_max + 1)
-                        else:
-                            x_a1 = x
-                        if is_3D_seg:
-                            buddy_rgn[
-                                z - bbox_zstart, y - bbox_ystart, x - bbox_xstart
-                            ] = field_in.data[z_a1, y_a1, x_a1]
-                        else:
-                            buddy_rgn[
-                                z - bbox_zstart, y - bbox_ystart, x - bbox_xstart
-                            ] = field_in.data[y_a1, x_a1]
-
-            # Update buddy_features feature positions to correspond to buddy box space
-            # rather than domain space or continuous/contiguous point space
-            if "vdim" not in buddy_features:
-                buddy_features["vdim"] = np.zeros(len(buddy_features), dtype=int)
-            for buddy_looper in range(0, len(buddy_features)):
-                buddy_features.vdim.values[buddy_looper] = (
-                    buddy_features.vdim.values[buddy_looper] - bbox_zstart
-                )
-
-                buddy_features.hdim_1.values[buddy_looper] = (
-                    buddy_features.hdim_1.values[buddy_looper] - bbox_ystart
-                )
-                buddy_features.hdim_2.values[buddy_looper] = (
-                    buddy_features.hdim_2.values[buddy_looper] - bbox_xstart
-                )
-
-            # Create dask array from input data:
-            buddy_data = buddy_rgn
-
-            # All of the below is the same overarching segmentation procedure as in the original
-            # segmentation approach until the line which states
-            # "#transform segmentation_mask_4 data back to original mask after PBC first-pass ("segmentation_mask_3")"
-            # It's just performed on the buddy box and its data rather than our full domain
-
-            # mask data outside region above/below threshold and invert data if tracking maxima:
-            if target == "maximum":
-                unmasked_buddies = buddy_data > threshold
-                buddy_segmentation = -1 * buddy_data
-            elif target == "minimum":
-                unmasked_buddies = buddy_data < threshold
-                buddy_segmentation = buddy_data
-            else:
-                raise ValueError("unknown type of target")
-
-            # set markers at the positions of the features:
-            buddy_markers = np.zeros(unmasked_buddies.shape).astype(np.int32)
-            # Buddy boxes are always without PBCs
-            buddy_markers = add_markers(
-                buddy_features,
-                buddy_markers,
-                seed_3D_flag,
-                seed_3D_size,
-                level,
-                PBC_flag="none",
-            )
-
-            # set markers in cells not fulfilling threshold condition to zero:
-            buddy_markers[~unmasked_buddies] = 0
-
-            marker_vals = np.unique(buddy_markers)
-
-            # Turn into np arrays (not necessary for markers) as dask arrays don't yet seem to work for watershedding algorithm
-            buddy_segmentation = np.array(buddy_segmentation)
-            unmasked_buddies = np.array(unmasked_buddies)
-
-            # perform segmentation:
-            if method == "watershed":
-                segmentation_mask_4 = watershed(
-                    np.array(buddy_segmentation),
-                    buddy_markers.astype(np.int32),
-                    mask=unmasked_buddies,
-                )
-
-            else:
-                raise ValueError("unknown method, must be watershed")
-
-            # remove everything from the individual masks that is more than max_distance_pixel away from the markers
-
-            # mask all segmentation_mask points below threshold as -1
-            # to differentiate from those unmasked points NOT filled by watershedding
-            segmentation_mask_4[~unmasked_buddies] = -1
-
-            # transform segmentation_mask_4 data back to mask created after PBC first-pass ("segmentation_mask_3")
-
-            # loop through buddy box inds and analogous seg mask inds
-            for z_val in range(bbox_zstart, bbox_zend):
-                z_seg = z_val - bbox_zstart
-                z_val_o = z_val
-                for y_val in range(bbox_ystart, bbox_yend):
-                    y_seg = y_val - bbox_ystart
-                    # y_val_o = y_val
-                    if y_val > hdim1_max:
-                        y_val_o = y_val - (hdim1_max + 1)
-                    else:
-                        y_val_o = y_val
-                    for x_val in range(bbox_xstart, bbox_xend):
-                        x_seg = x_val - bbox_xstart
-                        # x_val_o = x_val
-                        if x_val > hdim2_max:
-                            x_val_o = x_val - (hdim2_max + 1)
-                        else:
-                            x_val_o = x_val
-
-                        # fix to
-                        # overwrite IF:
-                        # 1) feature of interest
-                        # 2) changing to/from feature of interest or adjacent segmented feature
-
-                        # We don't want to overwrite other features that may be in the
-                        # buddy box if not contacting the intersected seg field
-
-                        if np.any(
-                            segmentation_mask_3[z_val_o, y_val_o, x_val_o] == buddies
-                        ) and np.any(
-                            segmentation_mask_4.data[z_seg, y_seg, x_seg] == buddies
-                        ):
-                            # only do updating procedure if old and new values both in buddy set
-                            # and values are different
-                            if (
-                                segmentation_mask_3[z_val_o, y_val_o, x_val_o]
-                                != segmentation_mask_4.data[z_seg, y_seg, x_seg]
-                            ):
-                                segmentation_mask_3[
-                                    z_val_o, y_val_o, x_val_o
-                                ] = segmentation_mask_4.data[z_seg, y_seg, x_seg]
-        if not is_3D_seg:
-            segmentation_mask_3 = segmentation_mask_3[0]
-
-        segmentation_mask = segmentation_mask_3
-
     if transposed_data:
         if vertical_coord_axis == 1:
             segmentation_mask = np.transpose(segmentation_mask, axes=(1, 0, 2))
@@ -1054,68 +988,104 @@ def segmentation_timestep(
     return segmentation_out, features_out
 
 
-def check_add_unseeded_across_bdrys(
-    dim_to_run: str,
-    segmentation_mask: np.array,
-    unseeded_labels: np.array,
-    border_min: int,
-    border_max: int,
-    markers_arr: np.array,
-    inplace: bool = True,
-) -> np.array:
-    """Add new markers to unseeded but eligible regions when they are bordering
-    an appropriate boundary.
+def _segmentation_timestep_indexed(
+    timestep: tuple[int, iris.cube.Cube, pd.DataFrame], **kwargs
+) -> tuple[int, iris.cube.Cube, pd.DataFrame]:
+    """Run segmentation_timestep on an (index, field, features) tuple of a single
+    timestep and return the index together with its output, so that it can be
+    mapped over the timesteps by a pool of worker processes.
+    """
+    i, field_i, features_i = timestep
+    segmentation_out_i, features_out_i = segmentation_timestep(
+        field_i, features_i, **kwargs
+    )
+    return i, segmentation_out_i, features_out_i
 
-    Parameters
-    ----------
-    dim_to_run:  {'hdim_1', 'hdim_2'}
-        what dimension to run
-    segmentation_mask: np.array
-        the incomming segmentation mask
-    unseeded_labels: np.array
-        The list of labels that are unseeded
-    border_min: int
-        minimum real point in the dimension we are running on
-    border_max: int
-        maximum real point in the dimension we are running on (inclusive)
-    markers_arr: np.array
-        The array of markers to re-run segmentation with
-    inplace: bool
-        whether or not to modify markers_arr in place
 
-    Returns
-    -------
-    markers_arr with new markers added
+def _set_timestep(
+    array: Union[np.ndarray, tb_utils.SparseMask],
+    time_axis: Union[int, None],
+    i: int,
+    values: np.ndarray,
+) -> None:
+    """Write the values of a single timestep into an array along its time axis,
+    or into the whole array if it has no time axis.
+    """
+    if isinstance(array, tb_utils.SparseMask):
+        array.set_timestep(i, values)
+        return
+    index = [slice(None)] * array.ndim
+    if time_axis is not None:
+        index[time_axis] = i
+    array[tuple(index)] = values
+
+
+def _mask_store_format(output_file: str) -> Union[str, None]:
+    """Get the format of the store to write the segmentation mask to from the
+    extension of the output file, or None for a .npy file.
+    """
+    extension = os.path.splitext(os.fspath(output_file).rstrip("/\\"))[1]
+    return {".nc": "netcdf", ".zarr": "zarr"}.get(extension.lower())
+
 
+def _create_mask_store(output_file: str, field: iris.cube.Cube):
+    """Create a NetCDF file or Zarr store with the coordinates and metadata of
+    the segmentation mask of a field, chunked by timestep, without writing the
+    mask itself, and open it for writing the mask of each timestep.
     """
+    import dask.array
 
-    # if we are okay modifying the marker array inplace, do that
-    if inplace:
-        markers_out = markers_arr
+    mask_template = field.copy(
+        data=dask.array.zeros(field.shape, dtype=np.int32, chunks=field.shape)
+    )
+    mask_template.rename("segmentation_mask")
+    mask_template.units = 1
+    mask_dataarray = decorators.convert_cube_to_dataarray(mask_template)
+    mask_dataarray.name = "segmentation_mask"
+    chunks = {dim: 1 if dim == "time" else -1 for dim in mask_dataarray.dims}
+    mask_dataset = mask_dataarray.chunk(chunks).to_dataset()
+    chunk_sizes = tuple(mask_dataset["segmentation_mask"].data.chunksize)
+
+    # only the coordinates are written here, the lazy mask is never computed
+    if _mask_store_format(output_file) == "zarr":
+        import zarr
+
+        mask_dataset.to_zarr(
+            output_file,
+            mode="w",
+            compute=False,
+            encoding={"segmentation_mask": {"chunks": chunk_sizes}},
+        )
+        return zarr.open_group(os.fspath(output_file), mode="r+")
+    else:
+        import netCDF4
+
+        mask_dataset.to_netcdf(
+            output_file,
+            compute=False,
+            encoding={"segmentation_mask": {"chunksizes": chunk_sizes, "zlib": True}},
+        )
+        return netCDF4.Dataset(output_file, mode="a")
+
+
+def _write_store_features(output_file: str, features: pd.DataFrame) -> None:
+    """Write a feature dataframe to the 'features' group of the NetCDF file or
+    Zarr store of a segmentation mask.
+    """
+    features_dataset = features.reset_index(drop=True).to_xarray()
+    if _mask_store_format(output_file) == "zarr":
+        features_dataset.to_zarr(output_file, mode="a", group="features")
     else:
-        # If we can't modify the marker array inplace, make a deep copy.
-        markers_out = copy.deepcopy(markers_arr)
-
-    # identify border points and the loop points depending on what we want to run
-    if dim_to_run == "hdim_1":
-        border_axnum = 1
-    elif dim_to_run == "hdim_2":
-        border_axnum = 2
-    # loop through vertical levels
-    for border_ind, border_opposite in [
-        (border_min, border_max),
-        (border_max, border_min),
-    ]:
-        label_border_pts = np.take(unseeded_labels, border_ind, axis=border_axnum)
-        seg_opp_pts = np.take(segmentation_mask, border_opposite, axis=border_axnum)
-        if dim_to_run == "hdim_1":
-            cond_to_check = np.logical_and(label_border_pts != 0, seg_opp_pts > 0)
-            markers_out[:, border_ind, :][cond_to_check] = seg_opp_pts[cond_to_check]
-
-        elif dim_to_run == "hdim_2":
-            cond_to_check = np.logical_and(label_border_pts != 0, seg_opp_pts > 0)
-            markers_out[:, :, border_ind][cond_to_check] = seg_opp_pts[cond_to_check]
-    return markers_out
+        features_dataset.to_netcdf(output_file, mode="a", group="features")
+
+
+def _open_mask_store(output_file: str) -> xr.Dataset:
+    """Open the NetCDF file or Zarr store of a segmentation mask lazily, with
+    one chunk per timestep.
+    """
+    if _mask_store_format(output_file) == "zarr":
+        return xr.open_zarr(output_file)
+    return xr.open_dataset(output_file, chunks={})
 
 
 @decorators.xarray_to_iris()
@@ -1135,7 +1105,13 @@ def segmentation(
     segment_number_below_threshold: int = 0,
     segment_number_unassigned: int = 0,
     statistic: Union[dict[str, Union[Callable, tuple[Callable, dict]]], None] = None,
-) -> tuple[iris.cube.Cube, pd.DataFrame]:
+    checkpoint_dir: Union[str, None] = None,
+    n_workers: int = 1,
+    output_file: Union[str, None] = None,
+    seeded_regions_only: bool = False,
+    n_region_threads: int = 1,
+    sparse_output: bool = False,
+) -> tuple[Union[iris.cube.Cube, tb_utils.SparseMask], pd.DataFrame]:
     """Use watershedding to determine region above a threshold
     value around initial seeding position for all time steps of
     the input data. Works both in 2D (based on single seeding
@@ -1174,7 +1150,8 @@ def segmentation(
 
     max_distance : float, optional
         Maximum distance from a marker allowed to be classified as
-        belonging to that cell in meters. Default is None.
+        belonging to that cell in meters, measured across periodic
+        boundaries if `PBC_flag` is set. Default is None.
 
     vertical_coord : {'auto', 'z', 'model_level_number', 'altitude',
                       'geopotential_height'}, optional
@@ -1207,11 +1184,44 @@ def segmentation(
     statistic : dict, optional
         Default is None. Optional parameter to calculate bulk statistics within feature detection.
         Dictionary with callable function(s) to apply over the region of each detected feature and the name of the statistics to appear in the feature output dataframe. The functions should be the values and the names of the metric the keys (e.g. {'mean': np.mean})
+    checkpoint_dir: str, optional
+        If given, the segmentation mask and features of each timestep are written to a file
+        in this directory as soon as they have been segmented. If the segmentation is
+        interrupted and run again with the same directory, the timesteps that have already
+        been written are read from the directory rather than segmented again. The directory
+        must only be reused for the same input data and parameters. Default is None.
+    n_workers: int, optional
+        Number of worker processes to segment the timesteps with in parallel. If
+        n_workers > 1, any functions given in `statistic` must be picklable (e.g. no
+        lambda functions). Default is 1, i.e. the timesteps are segmented serially.
+    output_file: str, optional
+        If given, the segmentation mask is written to a file at this path instead of
+        being held in memory. If the path ends with '.nc' or '.zarr', the mask of each
+        timestep is written to a NetCDF file or Zarr store (chunked by timestep) as soon
+        as it has been segmented, the feature dataframe is written to its 'features'
+        group at the end, and the data of the returned cube are read lazily from it.
+        Writing Zarr stores requires the zarr package. Otherwise, the mask is written to a
+        memory-mapped .npy file, and the data of the returned cube is that memory map.
+        Default is None.
+    seeded_regions_only: bool, optional
+        If True, only the connected regions beyond the threshold that contain a feature
+        are watershedded, each within its bounding box, so that the time taken depends
+        on the size of the features rather than of the domain. The output is the same.
+        Default is False.
+    n_region_threads: int, optional
+        Number of threads to watershed the regions of each timestep with if
+        `seeded_regions_only` is True. Default is 1.
+    sparse_output: bool, optional
+        If True, the segmentation mask is returned as a tobac.utils.SparseMask, which
+        stores the mask of each timestep run-length encoded without the points below
+        the threshold, instead of a dense cube. The mask of each timestep is encoded as
+        soon as it has been segmented, so that the dense mask of all timesteps is never
+        held in memory. Cannot be combined with `output_file`. Default is False.
 
 
     Returns
     -------
-    segmentation_out : iris.cube.Cube
+    segmentation_out : iris.cube.Cube or tobac.utils.SparseMask
         Mask, 0 outside and integer numbers according to track
         inside the area/volume of the feature.
 
@@ -1226,7 +1236,6 @@ def segmentation(
         in coords.
     """
     import pandas as pd
-    from iris.cube import CubeList
 
     logging.info("Start watershedding 3D")
 
@@ -1240,43 +1249,119 @@ def segmentation(
             "input to segmentation step must include a dimension named 'time'"
         )
 
-    # CubeList and list to store individual segmentation masks and feature DataFrames with information about segmentation
-    segmentation_out_list = CubeList()
-    features_out_list = []
-
-    # loop over individual input timesteps for segmentation:
-    # OR do segmentation on single timestep
-    field_time = field.slices_over("time")
-
-    for i, field_i in enumerate(field_time):
-        time_i = field_i.coord("time").units.num2date(field_i.coord("time").points[0])
-        features_i = features.loc[features["time"] == np.datetime64(time_i)]
-        segmentation_out_i, features_out_i = segmentation_timestep(
-            field_i,
-            features_i,
-            dxy,
-            threshold=threshold,
-            target=target,
-            level=level,
-            method=method,
-            max_distance=max_distance,
-            vertical_coord=vertical_coord,
-            PBC_flag=PBC_flag,
-            seed_3D_flag=seed_3D_flag,
-            seed_3D_size=seed_3D_size,
-            segment_number_unassigned=segment_number_unassigned,
-            segment_number_below_threshold=segment_number_below_threshold,
-            statistic=statistic,
+    if sparse_output and output_file is not None:
+        raise ValueError("output_file cannot be used with sparse_output")
+
+    # Preallocate the mask for all timesteps, so that the mask of each timestep can
+    # be written into it as soon as it has been segmented, without merging the
+    # individual timesteps afterwards:
+    if sparse_output:
+        segmentation_mask = tb_utils.SparseMask.empty_like(
+            field, fill_value=segment_number_below_threshold
         )
-        segmentation_out_list.append(segmentation_out_i)
-        features_out_list.append(features_out_i)
+        segmentation_mask.template.rename("segmentation_mask")
+        segmentation_mask.template.units = 1
+    elif output_file is not None and _mask_store_format(output_file) is not None:
+        mask_store = _create_mask_store(output_file, field)
+        segmentation_mask = mask_store["segmentation_mask"]
+    elif output_file is not None:
+        segmentation_mask = np.lib.format.open_memmap(
+            output_file, mode="w+", dtype=np.int32, shape=field.shape
+        )
+    else:
+        segmentation_mask = np.empty(field.shape, dtype=np.int32)
+    # the time coordinate may be a scalar coordinate of a single timestep
+    time_dims = field.coord_dims("time")
+    time_axis = time_dims[0] if time_dims else None
+    features_out_list = {}
+
+    time_coord = field.coord("time")
+    times = time_coord.units.num2date(time_coord.points)
+    if checkpoint_dir is not None:
+        # these timesteps have already been segmented in a previous run
+        checkpointed = {
+            i
+            for i in range(len(times))
+            if os.path.exists(
+                internal_utils.checkpoint_path(checkpoint_dir, "segmentation", i)
+            )
+        }
+    else:
+        checkpointed = set()
+
+    def _timesteps_to_segment():
+        for i, field_i in enumerate(field.slices_over("time")):
+            if i in checkpointed:
+                continue
+            features_i = features.loc[features["time"] == np.datetime64(times[i])]
+            yield i, field_i, features_i
+
+    # loop over individual input timesteps for segmentation, in parallel if
+    # n_workers > 1:
+    segment_timestep = functools.partial(
+        _segmentation_timestep_indexed,
+        dxy=dxy,
+        threshold=threshold,
+        target=target,
+        level=level,
+        method=method,
+        max_distance=max_distance,
+        vertical_coord=vertical_coord,
+        PBC_flag=PBC_flag,
+        seed_3D_flag=seed_3D_flag,
+        seed_3D_size=seed_3D_size,
+        segment_number_unassigned=segment_number_unassigned,
+        segment_number_below_threshold=segment_number_below_threshold,
+        statistic=statistic,
+        seeded_regions_only=seeded_regions_only,
+        n_region_threads=n_region_threads,
+    )
+    for i, segmentation_out_i, features_out_i in internal_utils.ordered_parallel_map(
+        segment_timestep, _timesteps_to_segment(), n_workers=n_workers
+    ):
+        if checkpoint_dir is not None:
+            internal_utils.write_checkpoint(
+                (segmentation_out_i, features_out_i), checkpoint_dir, "segmentation", i
+            )
+        _set_timestep(segmentation_mask, time_axis, i, segmentation_out_i.core_data())
+        features_out_list[i] = features_out_i
         logging.debug(
-            "Finished segmentation for " + time_i.strftime("%Y-%m-%d_%H:%M:%S")
+            "Finished segmentation for " + times[i].strftime("%Y-%m-%d_%H:%M:%S")
+        )
+
+    for i in sorted(checkpointed):
+        segmentation_out_i, features_out_i = internal_utils.read_checkpoint(
+            checkpoint_dir, "segmentation", i
         )
+        _set_timestep(segmentation_mask, time_axis, i, segmentation_out_i.core_data())
+        features_out_list[i] = features_out_i
 
-    # Merge output from individual timesteps:
-    segmentation_out = segmentation_out_list.merge_cube()
+    if output_file is not None and _mask_store_format(output_file) == "netcdf":
+        mask_store.close()
+    elif output_file is not None and _mask_store_format(output_file) is None:
+        segmentation_mask.flush()
+
+    features_out_list = [features_out_list[i] for i in sorted(features_out_list)]
     features_out = pd.concat(features_out_list)
+    # keep the schema of compact input features
+    if tb_utils.general.is_compact_dataframe(features):
+        features_out = tb_utils.compact_dataframe(features_out)
+
+    if sparse_output:
+        segmentation_out = segmentation_mask
+    elif output_file is not None and _mask_store_format(output_file) is not None:
+        _write_store_features(output_file, features_out)
+        # read the mask back lazily from the store
+        segmentation_out = field.copy(
+            data=_open_mask_store(output_file)["segmentation_mask"].data
+        )
+        segmentation_out.rename("segmentation_mask")
+        segmentation_out.units = 1
+    else:
+        # Create cube of the same dimensions and coordinates as input data to store mask:
+        segmentation_out = field.copy(data=segmentation_mask)
+        segmentation_out.rename("segmentation_mask")
+        segmentation_out.units = 1
 
     logging.debug("Finished segmentation")
     return segmentation_out, features_out
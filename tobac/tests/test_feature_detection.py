@@ -4,6 +4,7 @@ import tobac.feature_detection as feat_detect
 import pytest
 import numpy as np
 import xarray as xr
+import pandas as pd
 from pandas.testing import assert_frame_equal
 
 
@@ -450,6 +451,30 @@ def test_filter_min_distance(
         assert expect_feature_2 == (np.sum(out_feats["feature"] == 2) == 1)
 
 
+@pytest.mark.parametrize(
+    "target, expected_features", [("maximum", [1, 5]), ("minimum", [4, 5])]
+)
+def test_filter_min_distance_tie_break(target, expected_features):
+    """Tests the order in which tobac.feature_detection.filter_min_distance
+    resolves conflicts between several neighbouring features: threshold value,
+    then number of points, then index
+    """
+    features = pd.DataFrame(
+        {
+            "frame": 0,
+            "feature": [1, 2, 3, 4, 5],
+            "hdim_1": [10, 11, 10, 11, 50],
+            "hdim_2": [10, 10, 11, 11, 50],
+            "num": [5, 5, 3, 10, 1],
+            "threshold_value": [2, 2, 2, 1, 2],
+        }
+    )
+    out_feats = feat_detect.filter_min_distance(
+        features, dxy=1000, min_distance=5000, target=target
+    )
+    assert out_feats["feature"].to_list() == expected_features
+
+
 @pytest.mark.parametrize(
     "test_dset_size, vertical_axis_num, "
     "vertical_coord_name,"
@@ -1000,3 +1025,706 @@ def test_banded_feature():
     assert len(fd_output) == 1
     assert fd_output.iloc[0]["hdim_1"] == pytest.approx(24.5)
     assert fd_output.iloc[0]["hdim_2"] == pytest.approx(24.5)
+
+
+@pytest.mark.parametrize("min_distance", [0, 10000])
+def test_feature_detection_multithreshold_n_workers(min_distance):
+    """
+    Tests that running feature detection over multiple worker processes
+    gives identical output to the serial run
+    """
+    test_data_iris = tbtest.make_sample_data_2D_3blobs(data_type="iris")
+
+    fd_kwargs = dict(
+        dxy=1000,
+        threshold=[3, 5, 8],
+        n_min_threshold=2,
+        min_distance=min_distance,
+        feature_number_start=5,
+        statistic={"max": np.max},
+    )
+    fd_serial = feat_detect.feature_detection_multithreshold(
+        test_data_iris, **fd_kwargs
+    )
+    fd_parallel = feat_detect.feature_detection_multithreshold(
+        test_data_iris, n_workers=2, **fd_kwargs
+    )
+
+    assert len(fd_serial) > 0
+    assert_frame_equal(fd_serial, fd_parallel)
+
+
+@pytest.mark.parametrize("n_prefetch", [0, 1, 3])
+def test_feature_detection_multithreshold_lazy(n_prefetch):
+    """
+    Tests that feature detection on lazy (dask-backed) input gives identical
+    output to eager input for the iris and xarray entry points, without
+    loading the input
+    """
+    import dask.array
+
+    test_data_xr = tbtest.make_sample_data_2D_3blobs(data_type="xarray")
+    test_data_iris = tbtest.make_sample_data_2D_3blobs(data_type="iris")
+    fd_kwargs = dict(dxy=1000, threshold=[3, 5, 8], n_prefetch=n_prefetch)
+    fd_eager = feat_detect.feature_detection_multithreshold(test_data_iris, **fd_kwargs)
+
+    lazy_data = dask.array.from_array(
+        test_data_iris.data, chunks=(1,) + test_data_iris.shape[1:]
+    )
+    test_data_xr_lazy = test_data_xr.copy(data=lazy_data)
+    test_data_iris_lazy = test_data_iris.copy(data=lazy_data)
+    fd_lazy_xr = feat_detect.feature_detection_multithreshold(
+        test_data_xr_lazy, **fd_kwargs
+    )
+    fd_lazy_iris = feat_detect.feature_detection_multithreshold(
+        test_data_iris_lazy, **fd_kwargs
+    )
+
+    fd_eager_xr = feat_detect.feature_detection_multithreshold(
+        test_data_xr, **fd_kwargs
+    )
+
+    assert len(fd_eager) > 0
+    assert_frame_equal(fd_eager, fd_lazy_iris)
+    assert_frame_equal(fd_eager_xr, fd_lazy_xr)
+    assert test_data_iris_lazy.has_lazy_data()
+    assert isinstance(test_data_xr_lazy.data, dask.array.Array)
+
+
+@pytest.mark.parametrize("wavelength_filtering", [None, (4000, 20000)])
+def test_feature_detection_multithreshold_preserve_dtype(wavelength_filtering):
+    """
+    Tests that feature detection with ```preserve_dtype``` on float32 input
+    gives the same features as the default, with the smoothing buffer reused
+    across timesteps
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(4)
+    test_arr = gaussian_filter(rng.normal(size=(3, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = tbtest.make_dataset_from_arr(
+        test_arr.astype(np.float32),
+        data_type="iris",
+        time_dim_num=0,
+        y_dim_num=1,
+        x_dim_num=2,
+    )
+    fd_kwargs = dict(
+        dxy=1000,
+        threshold=[0.5, 1, 2],
+        wavelength_filtering=wavelength_filtering,
+        statistic={"max": np.max},
+    )
+    fd_default = feat_detect.feature_detection_multithreshold(
+        test_data_iris, **fd_kwargs
+    )
+    fd_preserve = feat_detect.feature_detection_multithreshold(
+        test_data_iris, preserve_dtype=True, **fd_kwargs
+    )
+
+    assert len(fd_default) > 0
+    if wavelength_filtering is None:
+        assert_frame_equal(fd_default, fd_preserve)
+    else:
+        # the spectral filtering is computed in single precision
+        assert_frame_equal(
+            fd_default.drop(columns="max"),
+            fd_preserve.drop(columns="max"),
+            atol=1e-3,
+        )
+
+
+@pytest.mark.parametrize("data_type", ["iris", "xarray"])
+def test_feature_detection_multithreshold_stream(data_type):
+    """
+    Tests that streaming feature detection yields the features of each field
+    before reading the next one, with the same output as feature detection
+    on all timesteps at once
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(5)
+    test_arr = gaussian_filter(rng.normal(size=(4, 40, 48)), (0, 3, 3)) * 12
+    test_data = tbtest.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    if data_type == "xarray":
+        test_data = xr.DataArray.from_iris(test_data)
+    fd_kwargs = dict(
+        dxy=1000, threshold=[0.5, 1, 2], min_distance=3000, feature_number_start=3
+    )
+    fd_batch = feat_detect.feature_detection_multithreshold(test_data, **fd_kwargs)
+
+    # single timesteps with a scalar time coordinate, and several timesteps
+    if data_type == "iris":
+        fields = list(test_data.slices_over("time"))[:2] + [test_data[2:]]
+    else:
+        fields = [test_data[0], test_data[1], test_data[2:]]
+    n_read = 0
+
+    def read_fields():
+        nonlocal n_read
+        for field in fields:
+            n_read += 1
+            yield field
+
+    fd_stream = []
+    for features in feat_detect.feature_detection_multithreshold_stream(
+        read_fields(), **fd_kwargs
+    ):
+        assert n_read == len(fd_stream) + 1
+        fd_stream.append(features)
+
+    assert len(fd_stream) == 3
+    assert_frame_equal(fd_batch, pd.concat(fd_stream, ignore_index=True))
+
+    # fields without features yield None
+    fd_empty = feat_detect.feature_detection_multithreshold_stream(
+        [fields[0]], dxy=1000, threshold=[100]
+    )
+    assert list(fd_empty) == [None]
+
+
+def test_feature_detection_multithreshold_stream_checkpoint(tmp_path):
+    """
+    Tests that streaming feature detection rejects ```checkpoint_dir```, as
+    the checkpoint of the first field would be read for all later fields
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(7)
+    test_arr = gaussian_filter(rng.normal(size=(2, 40, 48)), (0, 3, 3)) * 12
+    test_data = tbtest.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fields = list(test_data.slices_over("time"))
+    assert not np.array_equal(fields[0].data, fields[1].data)
+
+    with pytest.raises(ValueError, match="checkpoint_dir"):
+        list(
+            feat_detect.feature_detection_multithreshold_stream(
+                fields, dxy=1000, threshold=[0.5, 1], checkpoint_dir=str(tmp_path)
+            )
+        )
+    assert not any(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_feature_detection_multithreshold_checkpoint(tmp_path, n_workers):
+    """
+    Tests that feature detection with ```checkpoint_dir``` gives the same
+    output as without, and that timesteps already in the checkpoint directory
+    are not processed again when the feature detection is run again
+    """
+    from scipy.ndimage import gaussian_filter
+    from tobac.utils import internal as internal_utils
+
+    rng = np.random.default_rng(6)
+    test_arr = gaussian_filter(rng.normal(size=(3, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = tbtest.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fd_kwargs = dict(dxy=1000, threshold=[0.5, 1, 2], n_workers=n_workers)
+    fd_output = feat_detect.feature_detection_multithreshold(
+        test_data_iris, **fd_kwargs
+    )
+    fd_checkpoint = feat_detect.feature_detection_multithreshold(
+        test_data_iris, checkpoint_dir=tmp_path, **fd_kwargs
+    )
+    assert_frame_equal(fd_output, fd_checkpoint)
+    assert len(list(tmp_path.iterdir())) == 3
+
+    # mark the checkpoint of the second timestep, and remove that of the third
+    features_1 = internal_utils.read_checkpoint(tmp_path, "features", 1)
+    features_1["num"] = -1
+    internal_utils.write_checkpoint(features_1, tmp_path, "features", 1)
+    (tmp_path / "features_000002.pkl").unlink()
+
+    fd_resumed = feat_detect.feature_detection_multithreshold(
+        test_data_iris, checkpoint_dir=tmp_path, **fd_kwargs
+    )
+    assert np.all(fd_resumed.loc[fd_resumed["frame"] == 1, "num"] == -1)
+    assert_frame_equal(fd_output.drop(columns="num"), fd_resumed.drop(columns="num"))
+    assert (tmp_path / "features_000002.pkl").exists()
+
+
+def test_feature_detection_multithreshold_compact_dtypes():
+    """
+    Tests that feature detection with ```compact_dtypes``` gives the same
+    features with the compact schema, and that segmentation, linking and bulk
+    statistics keep the schema
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(7)
+    test_arr = gaussian_filter(rng.normal(size=(4, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = tbtest.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fd_kwargs = dict(dxy=1000, threshold=[0.5, 1, 2])
+    outputs = []
+    for compact_dtypes in [False, True]:
+        features = feat_detect.feature_detection_multithreshold(
+            test_data_iris, compact_dtypes=compact_dtypes, **fd_kwargs
+        )
+        mask, features = tobac.segmentation.segmentation(
+            features, test_data_iris, 1000, threshold=0.5, statistic={"max": np.max}
+        )
+        tracks = tobac.linking_trackpy(
+            features, test_data_iris, dt=60, dxy=1000, v_max=10
+        )
+        tracks = tobac.utils.get_statistics_from_mask(
+            tracks, mask, test_data_iris, statistic={"mean": np.mean}
+        )
+        outputs.append(tracks)
+    tracks, tracks_compact = outputs
+
+    assert len(tracks) > 0
+    for column in ["frame", "idx", "num", "feature", "ncells", "cell"]:
+        assert tracks_compact[column].dtype == np.int32
+    for column in ["hdim_1", "hdim_2"]:
+        assert tracks_compact[column].dtype == np.float32
+    assert tracks_compact["time"].dtype == "datetime64[ns]"
+    assert tracks_compact["timestr"].dtype == "category"
+    assert tracks_compact["max"].dtype == np.float64
+    assert tracks_compact["mean"].dtype == np.float64
+    assert_frame_equal(tobac.utils.compact_dataframe(tracks), tracks_compact)
+
+
+@pytest.mark.parametrize(
+    "PBC_flag, tile_size, position_threshold, vertical_axis",
+    [
+        ("none", 7, "center", None),
+        ("both", (11, 16), "extreme", None),
+        ("hdim_1", 5, "weighted_diff", 0),
+        ("both", (6, 9), "weighted_abs", 2),
+        # the last tile along hdim_2 is a single column wide
+        ("none", (10, 11), "center", 0),
+        ("hdim_2", 11, "weighted_diff", 2),
+    ],
+)
+def test_feature_detection_multithreshold_tiled(
+    PBC_flag, tile_size, position_threshold, vertical_axis
+):
+    """
+    Tests that tiled feature detection gives identical output to untiled
+    feature detection, including features across the seams between tiles and
+    the min_distance filtering
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(2)
+    if vertical_axis is None:
+        test_arr = gaussian_filter(rng.normal(size=(2, 40, 48)), (0, 3, 3)) * 12
+        test_data_iris = tbtest.make_dataset_from_arr(
+            test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+        )
+    else:
+        test_arr = gaussian_filter(rng.normal(size=(2, 8, 30, 34)), (0, 1.5, 3, 3))
+        test_arr = np.moveaxis(test_arr * 14, 1, vertical_axis + 1)
+        hdim_nums = [num for num in (1, 2, 3) if num != vertical_axis + 1]
+        test_data_iris = tbtest.make_dataset_from_arr(
+            test_arr,
+            data_type="iris",
+            time_dim_num=0,
+            z_dim_num=vertical_axis + 1,
+            y_dim_num=hdim_nums[0],
+            x_dim_num=hdim_nums[1],
+        )
+    fd_kwargs = dict(
+        dxy=1000,
+        threshold=[0.5, 1, 2],
+        PBC_flag=PBC_flag,
+        position_threshold=position_threshold,
+        n_erosion_threshold=1,
+        n_min_threshold=2,
+        min_distance=4000,
+        statistic={"mean": np.mean, "max": np.max},
+    )
+    if vertical_axis is not None:
+        fd_kwargs.update(vertical_coord="altitude", dz=100)
+    fd_untiled = feat_detect.feature_detection_multithreshold(
+        test_data_iris, **fd_kwargs
+    )
+    fd_tiled = feat_detect.feature_detection_multithreshold(
+        test_data_iris, tile_size=tile_size, **fd_kwargs
+    )
+
+    assert len(fd_untiled) > 0
+    assert_frame_equal(fd_untiled, fd_tiled, check_exact=True)
+
+    with pytest.raises(ValueError):
+        feat_detect.feature_detection_multithreshold(
+            test_data_iris,
+            tile_size=tile_size,
+            wavelength_filtering=(4000, 20000),
+            **fd_kwargs,
+        )
+
+
+@pytest.mark.parametrize(
+    "strict_thresholding, target", [(False, "maximum"), (True, "minimum")]
+)
+def test_feature_detection_multithreshold_statistics(strict_thresholding, target):
+    """
+    Tests that the statistics calculated during feature detection are those of
+    the region of each feature at the threshold it was detected at
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(4)
+    test_arr = gaussian_filter(rng.normal(size=(2, 40, 48)), (0, 3, 3)) * 12
+    threshold = [0.5, 1, 2]
+    if target == "minimum":
+        test_arr = -test_arr
+        threshold = [-t for t in threshold]
+    test_data_iris = tbtest.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+
+    fd_output = feat_detect.feature_detection_multithreshold(
+        test_data_iris,
+        dxy=1000,
+        threshold=threshold,
+        target=target,
+        strict_thresholding=strict_thresholding,
+        statistic={"ncells": np.count_nonzero},
+    )
+
+    assert len(fd_output) > 0
+    assert len(np.unique(fd_output["threshold_value"])) > 1
+    # the number of points of each feature region is given by num
+    np.testing.assert_array_equal(
+        fd_output["ncells"].to_numpy(dtype=int), fd_output["num"].to_numpy()
+    )
+
+
+@pytest.mark.parametrize(
+    "shape, z_dim_num, y_dim_num, x_dim_num",
+    [((2, 6, 30, 36), 1, 2, 3), ((2, 30, 36, 6), 3, 1, 2)],
+)
+def test_feature_detection_multithreshold_statistics_3D(
+    shape, z_dim_num, y_dim_num, x_dim_num
+):
+    """
+    Tests that the statistics calculated during 3D feature detection are those
+    of the (unsmoothed) region of each feature, whichever the position of the
+    vertical dimension
+    """
+    from scipy.ndimage import gaussian_filter
+    from skimage.measure import label
+
+    rng = np.random.default_rng(5)
+    test_arr = gaussian_filter(rng.normal(size=shape), 2) * 20
+    test_data_iris = tbtest.make_dataset_from_arr(
+        test_arr,
+        data_type="iris",
+        time_dim_num=0,
+        z_dim_num=z_dim_num,
+        y_dim_num=y_dim_num,
+        x_dim_num=x_dim_num,
+    )
+
+    fd_output = feat_detect.feature_detection_multithreshold(
+        test_data_iris,
+        dxy=1000,
+        threshold=[1.0],
+        sigma_threshold=0,
+        statistic={"max": np.max},
+    )
+
+    assert len(fd_output) > 0
+    for frame, test_arr_t in enumerate(test_arr):
+        labels = label(test_arr_t >= 1.0)
+        expected_max = [
+            test_arr_t[labels == region].max() for region in range(1, labels.max() + 1)
+        ]
+        np.testing.assert_allclose(
+            sorted(fd_output.loc[fd_output["frame"] == frame, "max"]),
+            sorted(expected_max),
+        )
+
+
+@pytest.mark.parametrize(
+    "target, PBC_flag, strict_thresholding, n_erosion_threshold",
+    [
+        ("maximum", "none", False, 0),
+        ("maximum", "both", True, 0),
+        ("minimum", "hdim_1", False, 0),
+        ("minimum", "hdim_2", True, 2),
+        ("maximum", "none", False, 2),
+    ],
+)
+def test_feature_detection_threshold_hierarchy(
+    target, PBC_flag, strict_thresholding, n_erosion_threshold
+):
+    """
+    Tests that ```threshold_hierarchy``` in
+    ```tobac.feature_detection.feature_detection_multithreshold_timestep```
+    gives the same features as labelling each threshold separately
+    """
+    from scipy.ndimage import gaussian_filter
+    from skimage.measure import label
+
+    rng = np.random.default_rng(1)
+    test_arr = gaussian_filter(rng.normal(size=(60, 70)), 3) * 20
+    thresholds = [0.5, 1, 1.5, 2.5]
+    if target == "minimum":
+        test_arr = -test_arr
+        thresholds = [-threshold for threshold in thresholds]
+
+    # labels of the hierarchy are the same as labelling each threshold
+    if PBC_flag == "none" and n_erosion_threshold == 0:
+        zones, zone_labels = feat_detect.label_threshold_hierarchy(
+            test_arr, thresholds, target=target
+        )
+        for threshold_i, zone_labels_i in zip(thresholds, zone_labels):
+            if target == "maximum":
+                mask = test_arr >= threshold_i
+            else:
+                mask = test_arr <= threshold_i
+            np.testing.assert_array_equal(zone_labels_i[zones], label(mask))
+
+    test_data_iris = tbtest.make_dataset_from_arr(test_arr, data_type="iris")
+    fd_kwargs = dict(
+        threshold=thresholds,
+        n_min_threshold=3,
+        dxy=1000,
+        target=target,
+        PBC_flag=PBC_flag,
+        strict_thresholding=strict_thresholding,
+        n_erosion_threshold=n_erosion_threshold,
+    )
+    fd_threshold = feat_detect.feature_detection_multithreshold_timestep(
+        test_data_iris, 0, **fd_kwargs
+    )
+    fd_hierarchy = feat_detect.feature_detection_multithreshold_timestep(
+        test_data_iris, 0, threshold_hierarchy=True, **fd_kwargs
+    )
+
+    assert len(fd_threshold) > 0
+    assert_frame_equal(fd_threshold, fd_hierarchy)
+
+
+@pytest.mark.parametrize(
+    "PBC_flag, expected_num",
+    [
+        ("none", [6, 4, 31]),
+        ("hdim_1", [6 + 31, 4]),
+        ("hdim_2", [6, 4 + 31]),
+        ("both", [41]),
+    ],
+)
+def test_feature_detection_threshold_pbc_chain(PBC_flag, expected_num):
+    """
+    Tests that regions connected across periodic boundaries through other
+    regions are merged into a single feature
+    """
+    test_arr = np.zeros((20, 20))
+    # touches the hdim_1 wall at the top
+    test_arr[0:3, 2:4] = 2
+    # touches the hdim_2 wall at the left
+    test_arr[10:12, 0:2] = 2
+    # touches the hdim_1 wall at the bottom and the hdim_2 wall at the right
+    test_arr[17:20, 2:4] = 2
+    test_arr[19, 2:20] = 2
+    test_arr[10:20, 19] = 2
+
+    fd_output, regions = feat_detect.feature_detection_threshold(
+        test_arr, 0, threshold=1, PBC_flag=PBC_flag
+    )
+
+    assert sorted(fd_output["num"]) == sorted(expected_num)
+    assert sum(len(region) for region in regions.values()) == 41
+
+
+@pytest.mark.parametrize(
+    "position_threshold", ["center", "extreme", "weighted_diff", "weighted_abs"]
+)
+@pytest.mark.parametrize("PBC_flag", ["none", "hdim_1", "hdim_2", "both"])
+@pytest.mark.parametrize("is_3D", [False, True])
+def test_feature_positions(position_threshold, PBC_flag, is_3D):
+    """
+    Tests that ```tobac.feature_detection.feature_positions``` gives the same
+    positions as ```tobac.feature_detection.feature_position``` for each region
+    """
+    from scipy.ndimage import gaussian_filter
+    from skimage.measure import label, regionprops
+
+    rng = np.random.default_rng(2)
+    shape = (6, 40, 50) if is_3D else (40, 50)
+    test_arr = gaussian_filter(rng.normal(size=shape), 2) * 20
+    # include a region where the weights of weighted_diff are all zero
+    test_arr[(0,) * is_3D + (slice(19, 23), slice(19, 23))] = 0
+    test_arr[(0,) * is_3D + (slice(20, 22), slice(20, 22))] = 1
+    labels = label(test_arr >= 1)
+
+    positions = feat_detect.feature_positions(
+        labels,
+        test_arr,
+        threshold_i=1,
+        position_threshold=position_threshold,
+        target="maximum",
+        PBC_flag=PBC_flag,
+        hdim1_max=shape[-2] - 1,
+        hdim2_max=shape[-1] - 1,
+    )
+
+    props = regionprops(labels)
+    assert len(positions) == len(props)
+    for position, prop in zip(positions, props):
+        region_small = prop.image
+        expected = feat_detect.feature_position(
+            *prop.coords.T[-2:],
+            vdim_indices=prop.coords.T[0] if is_3D else None,
+            region_small=region_small,
+            region_bbox=prop.bbox,
+            track_data=test_arr,
+            threshold_i=1,
+            position_threshold=position_threshold,
+            target="maximum",
+            PBC_flag=PBC_flag,
+            hdim1_max=shape[-2] - 1,
+            hdim2_max=shape[-1] - 1,
+        )
+        np.testing.assert_allclose(position, expected)
+
+
+@pytest.mark.parametrize("strict_thresholding", [False, True])
+@pytest.mark.parametrize("vertical_axis", [None, 0, 2])
+def test_remove_parents_labels(strict_thresholding, vertical_axis):
+    """
+    Tests that ```tobac.feature_detection.remove_parents``` gives the same
+    result for regions given as labelled arrays and as dictionaries
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(3)
+    shape = (40, 50) if vertical_axis is None else (6, 40, 50)
+    test_arr = gaussian_filter(rng.normal(size=shape), 2) * 20
+    if vertical_axis is not None:
+        test_arr = np.moveaxis(test_arr, 0, vertical_axis)
+        # ravelled order of the region dictionaries for 3D data
+        dims = [i for i in range(3) if i != vertical_axis] + [vertical_axis]
+    else:
+        dims = [0, 1]
+
+    features = None
+    regions = {}
+    labels = np.zeros(test_arr.shape, dtype=int)
+    idx_start = 0
+    for threshold in [0.5, 1, 2]:
+        features_i, regions_i = feat_detect.feature_detection_threshold(
+            test_arr,
+            0,
+            threshold=threshold,
+            n_min_threshold=2,
+            idx_start=idx_start,
+            vertical_axis=vertical_axis or 0,
+        )
+        features_i_labels, labels_i = feat_detect.feature_detection_threshold(
+            test_arr,
+            0,
+            threshold=threshold,
+            n_min_threshold=2,
+            idx_start=idx_start,
+            vertical_axis=vertical_axis or 0,
+            return_labels=True,
+        )
+        assert_frame_equal(features_i, features_i_labels)
+        assert labels_i.shape == test_arr.shape
+        np.testing.assert_array_equal(
+            np.transpose(labels_i, dims).ravel()[
+                np.concatenate(list(regions_i.values()))
+            ],
+            np.repeat(list(regions_i.keys()), [len(v) for v in regions_i.values()]),
+        )
+        assert np.count_nonzero(labels_i) == sum(len(v) for v in regions_i.values())
+        idx_start = features_i["idx"].max()
+
+        if features is None:
+            features, regions, labels = features_i, regions_i, labels_i
+            continue
+        features = pd.concat([features, features_i], ignore_index=True)
+        features_dict, regions = feat_detect.remove_parents(
+            features, regions_i, regions, strict_thresholding=strict_thresholding
+        )
+        features_labels, labels = feat_detect.remove_parents(
+            features, labels_i, labels, strict_thresholding=strict_thresholding
+        )
+        assert_frame_equal(features_dict, features_labels)
+        features = features_dict
+
+        expected_labels = np.zeros(np.transpose(test_arr, dims).shape, dtype=int)
+        for idx, region in regions.items():
+            expected_labels.ravel()[region] = idx
+        np.testing.assert_array_equal(np.transpose(labels, dims), expected_labels)
+
+
+@pytest.mark.parametrize(
+    "vertical_axis_num, detect_subset",
+    [
+        (None, {1: (10, 30)}),
+        (None, {1: (10, 30), 2: (None, -10)}),
+        (1, {1: (2, 8), 2: (10, 30)}),
+        (3, {2: (10, 30), 3: (2, None)}),
+    ],
+)
+def test_feature_detection_multithreshold_detect_subset(
+    vertical_axis_num, detect_subset
+):
+    """
+    Tests that ```tobac.feature_detection.feature_detection_multithreshold```
+    with detect_subset only finds the features within the subset, at the same
+    positions in the full field as without detect_subset
+    """
+    is_3D = vertical_axis_num is not None
+    test_data = np.zeros((2, 10, 40, 50) if is_3D else (2, 40, 50))
+    # one feature inside and one outside of all subsets
+    for h1_loc, h2_loc in [(20, 20), (36, 45)]:
+        for t in range(2):
+            test_data[t] = tbtest.make_feature_blob(
+                test_data[t],
+                h1_loc + t,
+                h2_loc,
+                v_loc=5 if is_3D else None,
+                h1_size=5,
+                h2_size=6,
+                v_size=3,
+                amplitude=2,
+            )
+    if vertical_axis_num == 3:
+        test_data = np.moveaxis(test_data, 1, 3)
+    test_data_iris = tbtest.make_dataset_from_arr(
+        test_data,
+        data_type="iris",
+        time_dim_num=0,
+        z_dim_num=vertical_axis_num,
+        y_dim_num=2 if vertical_axis_num == 1 else 1,
+        x_dim_num=3 if vertical_axis_num == 1 else 2,
+    )
+
+    common_opts = dict(dxy=1000, threshold=[1.5], position_threshold="weighted_abs")
+    if is_3D:
+        common_opts["vertical_axis"] = vertical_axis_num
+    features = feat_detect.feature_detection_multithreshold(
+        test_data_iris, **common_opts
+    )
+    features_subset = feat_detect.feature_detection_multithreshold(
+        test_data_iris, detect_subset=detect_subset, **common_opts
+    )
+
+    assert len(features) == 4
+    assert len(features_subset) == 2
+    expected = features[features["hdim_1"] < 30].reset_index(drop=True)
+    expected["feature"] = [1, 2]
+    assert_frame_equal(features_subset, expected)
+
+    with pytest.raises(NotImplementedError):
+        feat_detect.feature_detection_multithreshold(
+            test_data_iris, detect_subset={0: (0, 1)}, **common_opts
+        )
+    with pytest.raises(ValueError):
+        feat_detect.feature_detection_multithreshold(
+            test_data_iris, detect_subset=detect_subset, PBC_flag="both", **common_opts
+        )
@@ -320,3 +320,89 @@ def test_weighted_circmean() -> None:
     assert pbc_utils.weighted_circmean(
         values, weights, high=high, low=low
     ) == pytest.approx(circmean(duplicated_values, high=high, low=low))
+
+
+@pytest.mark.parametrize(
+    "PBC_flag, expected_lookup",
+    [
+        ("none", {}),
+        ("hdim_1", {3: 1, 4: 2, 8: 2}),
+        ("hdim_2", {6: 5, 7: 4}),
+        ("both", {3: 1, 4: 2, 6: 5, 7: 2, 8: 2}),
+    ],
+)
+def test_merge_labels_pbc(PBC_flag, expected_lookup):
+    """Tests ```tobac.utils.periodic_boundaries.merge_labels_pbc```
+    for walls, corners and chains of labels across several boundaries
+    """
+    labels = np.zeros((6, 8), dtype=int)
+    labels[0, 1:3] = 1
+    labels[0, 5] = 2
+    labels[0, 7] = 8
+    labels[5, 1] = 3
+    labels[5, 5:7] = 4
+    labels[5, 7] = 4
+    labels[3, 0] = 5
+    labels[3, 7] = 6
+    labels[5, 0] = 7
+
+    expected = labels.copy()
+    for old_label, new_label in expected_lookup.items():
+        expected[labels == old_label] = new_label
+
+    merged = pbc_utils.merge_labels_pbc(labels, PBC_flag)
+    np.testing.assert_array_equal(merged, expected)
+
+    # 3D labels are merged on the horizontal walls of each level
+    merged_3D = pbc_utils.merge_labels_pbc(
+        np.stack([labels, np.zeros_like(labels), labels]), PBC_flag
+    )
+    np.testing.assert_array_equal(
+        merged_3D, np.stack([expected, np.zeros_like(expected), expected])
+    )
+
+
+@pytest.mark.parametrize("ndim", [2, 3])
+@pytest.mark.parametrize("PBC_flag", ["none", "hdim_1", "hdim_2", "both"])
+def test_periodic_kdtree(ndim, PBC_flag):
+    """Tests that ```tobac.utils.periodic_boundaries.PeriodicKDTree``` finds
+    the same neighbours with the same distances as a BallTree with
+    ```calc_distance_coords_pbc``` as distance function
+    """
+    from sklearn.neighbors import BallTree
+    from tobac.tracking import build_distance_function
+
+    rng = np.random.default_rng(0)
+    # integer coordinates to include neighbours at exactly the search radius
+    points = rng.integers(5, 25, size=(60, ndim)).astype(float)
+    query_points = np.concatenate([points, rng.random((20, ndim)) * 20 + 5])
+    dist_func = build_distance_function(5, 25, 5, 25, PBC_flag)
+    expected_tree = BallTree(points, metric="pyfunc", func=dist_func)
+    tree = pbc_utils.PeriodicKDTree(points, 5, 25, 5, 25, PBC_flag)
+
+    for r in [0, 3, 5.5]:
+        expected = expected_tree.query_radius(query_points, r)
+        neighbours = tree.query_ball_point(query_points, r)
+        assert len(neighbours) == len(expected)
+        for neighbours_i, expected_i in zip(neighbours, expected):
+            np.testing.assert_array_equal(neighbours_i, np.sort(expected_i))
+
+    expected_dists, _ = expected_tree.query(query_points, k=5)
+    expected_dists[expected_dists > 4] = np.inf
+    dists, inds = tree.query(query_points, k=5, distance_upper_bound=4)
+    np.testing.assert_array_equal(dists, expected_dists)
+    np.testing.assert_array_equal(
+        dists[np.isfinite(dists)],
+        pbc_utils.calc_distances_coords_pbc(
+            np.broadcast_to(query_points[:, None], inds.shape + (ndim,))[
+                np.isfinite(dists)
+            ],
+            points[inds[np.isfinite(dists)]],
+            5,
+            25,
+            5,
+            25,
+            PBC_flag,
+        ),
+    )
+    assert np.all(inds[np.isinf(dists)] == len(points))
@@ -910,6 +910,35 @@ def test_add_markers_pbcs(
     assert np.all(marker_arr == marker_arr_reshifted)
 
 
+def test_add_markers_box_overlap():
+    """Tests that ```tobac.segmentation.add_markers``` seeds points in
+    overlapping seed boxes with the closest feature, or with the later feature
+    if they are equally close, across periodic boundaries
+    """
+    import pandas as pd
+
+    test_features = pd.DataFrame(
+        {
+            "feature": [1, 2, 3],
+            "frame": 0,
+            "hdim_1": [1.0, 1.0, 1.0],
+            "hdim_2": [1.0, 4.0, 8.0],
+        }
+    )
+    marker_arr = seg.add_markers(
+        test_features,
+        np.zeros((10, 12), dtype=np.int32),
+        seed_3D_flag="box",
+        seed_3D_size=5,
+        PBC_flag="both",
+    )
+
+    expected_row = np.array([1, 1, 1, 2, 2, 2, 3, 3, 3, 3, 3, 1])
+    for row in [9, 0, 1, 2, 3]:
+        np.testing.assert_array_equal(marker_arr[row], expected_row)
+    assert np.all(marker_arr[4:9] == 0)
+
+
 @pytest.mark.parametrize(
     "PBC_flag",
     [
@@ -1075,25 +1104,61 @@ def test_max_distance():
 
     test_data_iris = testing.make_dataset_from_arr(test_arr, data_type="iris")
 
-    with pytest.raises(NotImplementedError):
-        seg_output, seg_feats = segmentation.segmentation_timestep(
-            test_data_iris,
-            fd_output,
-            1,
-            threshold=1,
-            PBC_flag="hdim_2",
-            max_distance=1,
-        )
-    """    
+    seg_output, seg_feats = segmentation.segmentation_timestep(
+        test_data_iris,
+        fd_output,
+        1,
+        threshold=1,
+        PBC_flag="hdim_2",
+        max_distance=1,
+    )
+
     correct_seg_arr = np.full((50, 50), 0, dtype=np.int32)
     feat_num: int = 1
-    correct_seg_arr[0:3, 0] = feat_num
-    correct_seg_arr[0, 0:3] = feat_num
-    correct_seg_arr[:, 20:45] = -1
+    correct_seg_arr[0:2, 0] = feat_num
+    correct_seg_arr[0, 0:2] = feat_num
+    # neighbour across the periodic boundary
+    correct_seg_arr[0, 49] = feat_num
 
     seg_out_arr = seg_output.core_data()
     assert np.all(correct_seg_arr == seg_out_arr)
+
+
+@pytest.mark.parametrize("PBC_flag", ["none", "hdim_1", "hdim_2", "both"])
+def test_constrain_max_distance(PBC_flag):
     """
+    Tests that constrain_max_distance removes the same points as the distance
+    to the nearest marker in the whole (periodically tiled) domain
+    """
+    from scipy.ndimage import distance_transform_edt
+
+    rng = np.random.default_rng(0)
+    shape = (4, 20, 25)
+    markers = np.zeros(shape, dtype=np.int32)
+    markers[1, [2, 10, 18], [24, 12, 1]] = [3, 7, 5]
+    segmentation_mask = rng.choice(
+        np.array([-1, 0, 3, 5, 7], dtype=np.int32), size=shape
+    )
+    segmentation_mask[markers > 0] = markers[markers > 0]
+
+    reps = [1, 1, 1]
+    if PBC_flag in ["hdim_1", "both"]:
+        reps[1] = 3
+    if PBC_flag in ["hdim_2", "both"]:
+        reps[2] = 3
+    distance = distance_transform_edt(np.tile(markers == 0, reps))[
+        tuple(
+            slice(axis_len * (rep // 2), axis_len * (rep // 2 + 1))
+            for axis_len, rep in zip(shape, reps)
+        )
+    ]
+    for max_distance_pixel in [0, 2.5, 6, 30]:
+        correct_seg_arr = segmentation_mask.copy()
+        correct_seg_arr[(correct_seg_arr > 0) & (distance > max_distance_pixel)] = 0
+        seg_out_arr = segmentation.constrain_max_distance(
+            segmentation_mask.copy(), markers, max_distance_pixel, PBC_flag
+        )
+        assert np.all(correct_seg_arr == seg_out_arr)
 
 
 @pytest.mark.parametrize(
@@ -1143,3 +1208,271 @@ def test_seg_alt_unseed_num(below_thresh, above_thresh, error):
 
         seg_out_arr = seg_output.core_data()
         assert np.all(correct_seg_arr == seg_out_arr)
+
+
+def test_segmentation_checkpoint(tmp_path):
+    """
+    Tests that segmentation with ```checkpoint_dir``` gives the same output as
+    without, and that timesteps already in the checkpoint directory are not
+    segmented again when the segmentation is run again
+    """
+    from scipy.ndimage import gaussian_filter
+    from tobac.utils import internal as internal_utils
+
+    rng = np.random.default_rng(6)
+    test_arr = gaussian_filter(rng.normal(size=(3, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = testing.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fd_output = feature_detection.feature_detection_multithreshold(
+        test_data_iris, dxy=1000, threshold=[0.5, 1, 2]
+    )
+
+    seg_mask, seg_feats = segmentation.segmentation(
+        fd_output, test_data_iris, 1000, threshold=0.5
+    )
+    seg_mask_cp, seg_feats_cp = segmentation.segmentation(
+        fd_output, test_data_iris, 1000, threshold=0.5, checkpoint_dir=tmp_path
+    )
+    assert seg_mask_cp == seg_mask
+    assert seg_feats_cp.equals(seg_feats)
+    assert len(list(tmp_path.iterdir())) == 3
+
+    # mark the checkpoint of the second timestep, and remove that of the third
+    mask_1, feats_1 = internal_utils.read_checkpoint(tmp_path, "segmentation", 1)
+    mask_1.data[:] = -7
+    internal_utils.write_checkpoint((mask_1, feats_1), tmp_path, "segmentation", 1)
+    (tmp_path / "segmentation_000002.pkl").unlink()
+
+    seg_mask_resumed, seg_feats_resumed = segmentation.segmentation(
+        fd_output, test_data_iris, 1000, threshold=0.5, checkpoint_dir=tmp_path
+    )
+    assert np.all(seg_mask_resumed.data[1] == -7)
+    np.testing.assert_array_equal(seg_mask_resumed.data[2], seg_mask.data[2])
+    assert seg_feats_resumed.equals(seg_feats)
+    assert (tmp_path / "segmentation_000002.pkl").exists()
+
+
+def test_segmentation_parallel(tmp_path):
+    """
+    Tests that segmentation with ```n_workers``` > 1 and with ```output_file```
+    gives the same output as serial segmentation in memory
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(7)
+    test_arr = gaussian_filter(rng.normal(size=(4, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = testing.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fd_output = feature_detection.feature_detection_multithreshold(
+        test_data_iris, dxy=1000, threshold=[0.5, 1, 2]
+    )
+
+    seg_mask, seg_feats = segmentation.segmentation(
+        fd_output, test_data_iris, 1000, threshold=0.5
+    )
+    assert seg_mask.dtype == np.int32
+    assert seg_mask.shape == test_data_iris.shape
+
+    seg_mask_par, seg_feats_par = segmentation.segmentation(
+        fd_output,
+        test_data_iris,
+        1000,
+        threshold=0.5,
+        n_workers=2,
+        output_file=tmp_path / "mask.npy",
+    )
+    assert seg_mask_par == seg_mask
+    assert seg_feats_par.equals(seg_feats)
+    np.testing.assert_array_equal(np.load(tmp_path / "mask.npy"), seg_mask.data)
+
+
+@pytest.mark.parametrize("store_format", ["nc", "zarr"])
+def test_segmentation_output_store(tmp_path, store_format):
+    """
+    Tests that segmentation with ```output_file``` writing to a NetCDF file or
+    Zarr store gives the same output as segmentation in memory, and that the
+    mask and features can be read back from the store
+    """
+    import xarray as xr
+    from scipy.ndimage import gaussian_filter
+
+    if store_format == "zarr":
+        pytest.importorskip("zarr")
+
+    rng = np.random.default_rng(7)
+    test_arr = gaussian_filter(rng.normal(size=(4, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = testing.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fd_output = feature_detection.feature_detection_multithreshold(
+        test_data_iris, dxy=1000, threshold=[0.5, 1, 2]
+    )
+
+    seg_mask, seg_feats = segmentation.segmentation(
+        fd_output, test_data_iris, 1000, threshold=0.5
+    )
+    output_file = tmp_path / f"mask.{store_format}"
+    seg_mask_store, seg_feats_store = segmentation.segmentation(
+        fd_output,
+        test_data_iris,
+        1000,
+        threshold=0.5,
+        n_workers=2,
+        output_file=output_file,
+    )
+    assert seg_mask_store.has_lazy_data()
+    assert seg_mask_store == seg_mask
+    assert seg_feats_store.equals(seg_feats)
+
+    if store_format == "zarr":
+        mask_dataset = xr.open_zarr(output_file)
+        features_dataset = xr.open_zarr(output_file, group="features")
+    else:
+        mask_dataset = xr.open_dataset(output_file)
+        features_dataset = xr.open_dataset(output_file, group="features")
+    assert mask_dataset["segmentation_mask"].dtype == np.int32
+    np.testing.assert_array_equal(mask_dataset["segmentation_mask"], seg_mask.data)
+    np.testing.assert_array_equal(
+        features_dataset["feature"].values, seg_feats["feature"].values
+    )
+    np.testing.assert_array_equal(
+        features_dataset["ncells"].values, seg_feats["ncells"].values
+    )
+
+
+@pytest.mark.parametrize("segment_number_below_threshold", [0, -1])
+def test_segmentation_sparse_output(segment_number_below_threshold):
+    """
+    Tests that segmentation with ```sparse_output``` gives a SparseMask that
+    decodes to the dense segmentation mask
+    """
+    from scipy.ndimage import gaussian_filter
+    from tobac.utils import SparseMask
+
+    rng = np.random.default_rng(7)
+    test_arr = gaussian_filter(rng.normal(size=(4, 40, 48)), (0, 3, 3)) * 12
+    test_data_iris = testing.make_dataset_from_arr(
+        test_arr, data_type="iris", time_dim_num=0, y_dim_num=1, x_dim_num=2
+    )
+    fd_output = feature_detection.feature_detection_multithreshold(
+        test_data_iris, dxy=1000, threshold=[0.5, 1, 2]
+    )
+
+    seg_mask, seg_feats = segmentation.segmentation(
+        fd_output,
+        test_data_iris,
+        1000,
+        threshold=0.5,
+        segment_number_below_threshold=segment_number_below_threshold,
+    )
+    seg_mask_sparse, seg_feats_sparse = segmentation.segmentation(
+        fd_output,
+        test_data_iris,
+        1000,
+        threshold=0.5,
+        segment_number_below_threshold=segment_number_below_threshold,
+        sparse_output=True,
+    )
+    assert isinstance(seg_mask_sparse, SparseMask)
+    assert seg_mask_sparse.fill_value == segment_number_below_threshold
+    assert seg_mask_sparse.to_iris() == seg_mask
+    assert seg_feats_sparse.equals(seg_feats)
+
+    with pytest.raises(ValueError):
+        segmentation.segmentation(
+            fd_output,
+            test_data_iris,
+            1000,
+            threshold=0.5,
+            sparse_output=True,
+            output_file="mask.npy",
+        )
+
+
+@pytest.mark.parametrize(
+    "PBC_flag, threshold",
+    [
+        ("hdim_1", 0.5),
+        ("hdim_2", 0.5),
+        ("both", 0.5),
+        ("both", -0.5),
+        # regions wrap around the whole domain along hdim_2
+        ("hdim_2", -1.5),
+        ("both", -1.5),
+    ],
+)
+def test_watershed_pbc(PBC_flag, threshold):
+    """Tests that ```tobac.segmentation.watershed_pbc``` gives the same
+    segmentation as watershedding the field tiled across its periodic
+    boundaries, both when the domain can be rolled onto planes without
+    segmented points and when it has to be extended by a halo, including
+    regions that wrap around the whole domain
+    """
+    from scipy.ndimage import gaussian_filter
+    from skimage.segmentation import watershed
+
+    rng = np.random.default_rng(21)
+    test_data = (
+        gaussian_filter(rng.normal(size=(3, 30, 36)), (1, 3, 3), mode="wrap") * 12
+    )
+    mask = test_data > threshold
+    markers = np.zeros(test_data.shape, dtype=np.int32)
+    marker_points = rng.integers(0, test_data.shape, size=(20, 3))
+    markers[tuple(marker_points.T)] = np.arange(1, 21)
+    markers[~mask] = 0
+
+    seg_mask = seg.watershed_pbc(-test_data, markers, mask, PBC_flag=PBC_flag)
+
+    reps = (
+        1,
+        3 if PBC_flag in ["hdim_1", "both"] else 1,
+        3 if PBC_flag in ["hdim_2", "both"] else 1,
+    )
+    seg_mask_tiled = watershed(
+        np.tile(-test_data, reps), np.tile(markers, reps), mask=np.tile(mask, reps)
+    )
+    center = tuple(
+        slice((rep // 2) * size, (rep // 2 + 1) * size)
+        for rep, size in zip(reps, test_data.shape)
+    )
+    np.testing.assert_array_equal(seg_mask, seg_mask_tiled[center])
+
+
+@pytest.mark.parametrize(
+    "PBC_flag, n_region_threads",
+    [("none", 1), ("none", 3), ("hdim_2", 1), ("both", 2)],
+)
+def test_segmentation_seeded_regions_only(PBC_flag, n_region_threads):
+    """Tests that segmentation with ```seeded_regions_only``` gives the same
+    output as watershedding the whole domain, with regions beyond the threshold
+    that contain no features
+    """
+    from scipy.ndimage import gaussian_filter
+
+    rng = np.random.default_rng(22)
+    test_arr = gaussian_filter(rng.normal(size=(40, 48)), 3, mode="wrap") * 12
+    test_data_iris = testing.make_dataset_from_arr(test_arr, data_type="iris")
+    fd_output = feature_detection.feature_detection_multithreshold_timestep(
+        test_data_iris, 0, dxy=1000, threshold=[2, 3], PBC_flag=PBC_flag
+    )
+    fd_output["feature"] = np.arange(1, len(fd_output) + 1)
+    # only segment every other feature, so that some regions are not seeded
+    fd_output = fd_output.iloc[::2]
+
+    seg_opts = dict(threshold=0.5, PBC_flag=PBC_flag, segment_number_below_threshold=-1)
+    seg_mask, seg_feats = segmentation.segmentation_timestep(
+        test_data_iris, fd_output, 1000, **seg_opts
+    )
+    seg_mask_regions, seg_feats_regions = segmentation.segmentation_timestep(
+        test_data_iris,
+        fd_output,
+        1000,
+        seeded_regions_only=True,
+        n_region_threads=n_region_threads,
+        **seg_opts,
+    )
+    assert np.any(seg_mask.data == 0)
+    np.testing.assert_array_equal(seg_mask_regions.data, seg_mask.data)
+    assert seg_feats_regions.equals(seg_feats)
@@ -426,6 +426,46 @@ def test_keep_trackpy_parameters(max_trackpy, max_tobac, adaptive_step, adaptive
     assert expected_value_adaptive == tp.linking.Linker.MAX_SUB_NET_SIZE_ADAPTIVE
 
 
+def test_keep_trackpy_parameters_on_error():
+    """
+    Tests that tobac restores the parameters and neighbour search of trackpy
+    when linking raises an error
+    """
+    tp.linking.Linker.MAX_SUB_NET_SIZE = 5
+    hash_btree = tp.linking.linking.HashBTree
+
+    test_features = pd.DataFrame(
+        {
+            "feature": [1, 2],
+            "hdim_1": [5, 95],
+            "hdim_2": [50, 50],
+            "frame": [0, 1],
+            "time": [
+                datetime.datetime(2000, 1, 1),
+                datetime.datetime(2000, 1, 1, 0, 5),
+            ],
+        }
+    )
+    with pytest.raises(ValueError):
+        tobac.linking_trackpy(
+            test_features,
+            None,
+            1,
+            1,
+            d_max=10,
+            method_linking="unknown",
+            subnetwork_size=10,
+            PBC_flag="both",
+            min_h1=0,
+            max_h1=100,
+            min_h2=0,
+            max_h2=100,
+        )
+
+    assert tp.linking.linking.HashBTree is hash_btree
+    assert tp.linking.Linker.MAX_SUB_NET_SIZE == 5
+
+
 def test_trackpy_predict():
     """Function to test if linking_trackpy() with method='predict' correctly links two
     features at constant speeds crossing each other.
@@ -9,6 +9,7 @@ import tobac.utils as tb_utils
 import tobac.utils.internal as internal_utils
 import tobac.testing as tb_test
 
+import pandas as pd
 import pandas.testing as pd_test
 import numpy as np
 from scipy import fft
@@ -261,6 +262,82 @@ def test_add_coordinates_3D(
         )
 
 
+def test_add_coordinates_3D_time_varying_coord():
+    """
+    Tests ```utils.add_coordinates_3D``` with a (time, y, x) auxiliary
+    coordinate, which is interpolated at its first time, and that repeated
+    calls give identical results.
+    """
+    times = [datetime.datetime(2022, 1, 1, 0, 5 * i) for i in range(3)]
+    y_points = np.arange(20, dtype=float)
+    x_points = np.arange(30, dtype=float)
+    lat = np.broadcast_to(0.5 * y_points[np.newaxis, :, np.newaxis], (3, 20, 30)).copy()
+    data_xr = xr.DataArray(
+        np.zeros((3, 5, 20, 30)),
+        coords={
+            "time": times,
+            "z": np.arange(5, dtype=float),
+            "y": y_points,
+            "x": x_points,
+            "lat": (("time", "y", "x"), lat),
+        },
+        dims=["time", "z", "y", "x"],
+    )
+    features = pd.DataFrame(
+        {
+            "frame": [0, 2],
+            "vdim": [1.0, 3.5],
+            "hdim_1": [4.5, 10.25],
+            "hdim_2": [3.0, 17.5],
+            "feature": [1, 2],
+        }
+    )
+
+    first = tb_utils.add_coordinates_3D(
+        features.copy(), data_xr.to_iris(), vertical_coord="z"
+    )
+    np.testing.assert_allclose(first["lat"], [2.25, 5.125])
+    np.testing.assert_allclose(first["z"], [1.0, 3.5])
+
+    second = tb_utils.add_coordinates_3D(
+        features.copy(), data_xr.to_iris(), vertical_coord="z"
+    )
+    pd_test.assert_frame_equal(first, second)
+
+
+def test_add_coordinates_modified_coord():
+    """
+    Tests that ```utils.add_coordinates``` and ```utils.add_coordinates_3D```
+    use the current points of a coordinate after they have been changed
+    """
+    data_xr = xr.DataArray(
+        np.zeros((1, 5, 10, 12)),
+        coords={
+            "time": [datetime.datetime(2022, 1, 1)],
+            "z": np.arange(5, dtype=float),
+            "projection_y_coordinate": np.arange(10) * 1000.0,
+            "projection_x_coordinate": np.arange(12) * 1000.0,
+        },
+        dims=["time", "z", "projection_y_coordinate", "projection_x_coordinate"],
+    )
+    cube_3D = data_xr.to_iris()
+    cube_2D = data_xr.isel(z=0, drop=True).to_iris()
+    features = pd.DataFrame(
+        {"frame": [0], "vdim": [1.0], "hdim_1": [4.0], "hdim_2": [6.0], "feature": [1]}
+    )
+
+    for add_coordinates, cube in [
+        (tb_utils.add_coordinates, cube_2D),
+        (tb_utils.add_coordinates_3D, cube_3D),
+    ]:
+        before = add_coordinates(features.copy(), cube)
+        assert before["projection_y_coordinate"].iloc[0] == 4000
+        y_coord = cube.coord("projection_y_coordinate")
+        y_coord.points = y_coord.points + 1000
+        after = add_coordinates(features.copy(), cube)
+        assert after["projection_y_coordinate"].iloc[0] == 5000
+
+
 @pytest.mark.parametrize(
     "vertical_coord_names, vertical_coord_pass_in, expect_raise",
     [
@@ -357,6 +434,44 @@ def test_spectral_filtering():
         >= 1
     )
 
+    # filtering in single precision keeps the dtype of the input
+    filtered_data_32 = tb_utils.general.spectral_filtering(
+        dxy,
+        wave_data.astype(np.float32),
+        lambda_min,
+        lambda_max,
+        preserve_dtype=True,
+    )
+    assert filtered_data_32.dtype == np.float32
+    np.testing.assert_allclose(
+        filtered_data_32, filtered_data, atol=1e-6 * np.abs(wave_data).max()
+    )
+
+    # a stack of fields is filtered along the last two axes, identically to
+    # filtering each field separately
+    wave_stack = np.stack([wave_data, -2 * wave_data, wave_data[::-1]])
+    filtered_stack = tb_utils.general.spectral_filtering(
+        dxy, wave_stack, lambda_min, lambda_max
+    )
+    assert filtered_stack.shape == wave_stack.shape
+    for field, filtered_field in zip(wave_stack, filtered_stack):
+        np.testing.assert_allclose(
+            filtered_field,
+            tb_utils.general.spectral_filtering(dxy, field, lambda_min, lambda_max),
+        )
+
+    # the transfer function is reused for the same grid and wavelengths, but
+    # the returned arrays are writable copies of the cached ones
+    cache_hits = tb_utils.general._spectral_transfer_function.cache_info().hits
+    transfer_function[1][:] = 0
+    cached_transfer_function, _ = tb_utils.general.spectral_filtering(
+        dxy, wave_data, lambda_min, lambda_max, return_transfer_function=True
+    )
+    assert tb_utils.general._spectral_transfer_function.cache_info().hits > cache_hits
+    assert cached_transfer_function[1].flags.writeable
+    assert np.all(cached_transfer_function[1][1:, 1:] > 0)
+    np.testing.assert_array_equal(cached_transfer_function[0], wavelengths)
+
 
 def test_combine_tobac_feats():
     """tests tobac.utils.combine_tobac_feats
@@ -455,6 +570,73 @@ def test_combine_tobac_feats():
     assert np.all(list(combined_feat["old_feat_column"].values) == [3, 1])
 
 
+def test_compact_dataframe():
+    """tests tobac.utils.compact_dataframe"""
+    import cftime
+
+    features = pd.DataFrame(
+        {
+            "frame": [0, 0, 1],
+            "idx": [1, 2, 1],
+            "hdim_1": [1.5, 20.25, 7.0],
+            "hdim_2": [3.0, 4.0, 5.125],
+            "num": [10, 20, 30],
+            "threshold_value": [1.0, 1.0, 2.0],
+            "feature": [1, 2, 2**40],
+            "time": [
+                cftime.DatetimeGregorian(2022, 1, 1, 0, 0),
+                cftime.DatetimeGregorian(2022, 1, 1, 0, 0),
+                cftime.DatetimeGregorian(2022, 1, 1, 0, 5),
+            ],
+            "timestr": ["2022-01-01 00:00:00"] * 2 + ["2022-01-01 00:05:00"],
+            "max": np.array([1.5, 2.5, 3.5], dtype=object),
+        }
+    )
+    compact = tb_utils.compact_dataframe(features)
+
+    assert compact["frame"].dtype == np.int32
+    assert compact["idx"].dtype == np.int32
+    assert compact["num"].dtype == np.int32
+    # values that do not fit into int32 are kept
+    assert compact["feature"].dtype == np.int64
+    assert compact["hdim_1"].dtype == np.float32
+    assert compact["threshold_value"].dtype == np.float64
+    assert compact["time"].dtype == "datetime64[ns]"
+    assert compact["timestr"].dtype == "category"
+    assert compact["max"].dtype == np.float64
+    assert tb_utils.general.is_compact_dataframe(compact)
+    assert not tb_utils.general.is_compact_dataframe(features)
+    # the schema is also recognised without the attrs, but not from the
+    # frame column alone (e.g. where the default integer is 32 bit)
+    compact.attrs.clear()
+    assert tb_utils.general.is_compact_dataframe(compact)
+    int32_frame = features.astype({"frame": np.int32})
+    assert not tb_utils.general.is_compact_dataframe(int32_frame)
+    assert not tb_utils.general.is_compact_dataframe(
+        int32_frame.drop(columns=["time", "timestr"])
+    )
+    # the values are unchanged
+    pd_test.assert_frame_equal(
+        compact.astype({"time": object, "timestr": object}).drop(columns="time"),
+        features.drop(columns="time"),
+        check_dtype=False,
+    )
+    np.testing.assert_array_equal(
+        compact["time"],
+        pd.to_datetime(["2022-01-01 00:00", "2022-01-01 00:00", "2022-01-01 00:05"]),
+    )
+
+    # times that cannot be represented as datetime64 are stored as categorical
+    features["time"] = [
+        cftime.Datetime360Day(2022, 2, 30),
+        cftime.Datetime360Day(2022, 2, 30),
+        cftime.Datetime360Day(2022, 3, 1),
+    ]
+    compact = tb_utils.compact_dataframe(features)
+    assert compact["time"].dtype == "category"
+    assert list(compact["time"]) == list(features["time"])
+
+
 def test_transform_feature_points():
     """Tests tobac.utils.general.transform_feature_points"""
 
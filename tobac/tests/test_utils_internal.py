@@ -90,3 +90,85 @@ def test_detect_latlon_coord_name(
     )
     assert out_lat_name == expected_result[0]
     assert out_lon_name == expected_result[1]
+
+
+@pytest.mark.parametrize("shape", [(30, 40), (5, 30, 40)])
+def test_label_index(shape):
+    """Tests tobac.utils.internal.LabelIndex against skimage.measure.regionprops
+    for 2D and 3D labels"""
+    from skimage.measure import label, regionprops
+
+    rng = np.random.default_rng(0)
+    labels = label(rng.random(shape) > 0.7)
+    # add gaps in the label numbers and negative labels
+    labels[labels == 3] = 0
+    labels[0, 0] = -1
+
+    label_index = internal_utils.LabelIndex(labels)
+    props = regionprops(labels)
+
+    np.testing.assert_array_equal(label_index.labels, [p.label for p in props])
+    np.testing.assert_array_equal(label_index.counts, [p.area for p in props])
+    assert len(label_index) == len(props)
+    assert 3 not in label_index
+    assert -1 not in label_index
+    assert 0 not in label_index
+    for i, prop in enumerate(props):
+        assert prop.label in label_index
+        assert label_index.get_count(prop.label) == prop.area
+        np.testing.assert_array_equal(
+            np.stack(label_index.get_coords(prop.label), axis=-1), prop.coords
+        )
+        np.testing.assert_array_equal(
+            label_index.get_points(prop.label),
+            np.ravel_multi_index(prop.coords.T, shape),
+        )
+        assert label_index.get_bbox(prop.label) == prop.bbox
+        np.testing.assert_array_equal(label_index.bboxes[i], prop.bbox)
+    np.testing.assert_array_equal(
+        labels.ravel()[label_index.points], label_index.point_labels
+    )
+
+
+def test_label_index_empty():
+    """Tests tobac.utils.internal.LabelIndex with no labels"""
+    label_index = internal_utils.LabelIndex(np.zeros((10, 10), dtype=int))
+    assert len(label_index) == 0
+    assert label_index.counts.size == 0
+    assert label_index.bboxes.shape == (0, 4)
+    assert 1 not in label_index
+
+
+@pytest.mark.parametrize("n_prefetch", [0, 1, 3])
+def test_ordered_prefetch(n_prefetch):
+    """Tests that ```tobac.utils.internal.ordered_prefetch``` returns the
+    results in order and takes at most n_prefetch elements ahead of the
+    results that have been yielded
+    """
+    taken = []
+
+    def items():
+        for i in range(10):
+            taken.append(i)
+            yield i
+
+    results = internal_utils.ordered_prefetch(lambda x: 2 * x, items(), n_prefetch)
+    for i, result in enumerate(results):
+        assert result == 2 * i
+        assert len(taken) <= i + 1 + n_prefetch
+    assert len(taken) == 10
+
+
+def test_reusable_buffer():
+    """Tests that ```tobac.utils.internal.reusable_buffer``` returns the same
+    array for the same name, shape and dtype, and a new array otherwise
+    """
+    buffer = internal_utils.reusable_buffer("test", (4, 5), np.float32)
+    assert buffer.shape == (4, 5)
+    assert buffer.dtype == np.float32
+    assert internal_utils.reusable_buffer("test", (4, 5), np.float32) is buffer
+    assert internal_utils.reusable_buffer("other", (4, 5), np.float32) is not buffer
+    new_buffer = internal_utils.reusable_buffer("test", (4, 6), np.float32)
+    assert new_buffer is not buffer
+    assert new_buffer.shape == (4, 6)
+    assert internal_utils.reusable_buffer("test", (4, 6), np.float64) is not new_buffer
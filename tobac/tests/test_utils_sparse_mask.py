@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+import tobac.testing as tb_test
+import tobac.utils as tb_utils
+from tobac.utils.internal import LabelIndex
+
+
+@pytest.mark.parametrize(
+    "shape, time_axis, fill_value",
+    [((5, 12, 13), 0, 0), ((6, 3, 7, 8), 1, -1), ((12, 13), None, 0), ((4, 0), 0, 0)],
+)
+def test_sparse_mask_roundtrip(shape, time_axis, fill_value):
+    """Tests that a SparseMask decodes to the dense mask it was encoded from,
+    and that the label index of each timestep matches that of the dense mask
+    """
+    rng = np.random.default_rng(0)
+    mask = rng.choice(np.array([-1, 0, 0, 0, 2, 5, 7], dtype=np.int32), size=shape)
+
+    sparse_mask = tb_utils.SparseMask.from_dense(
+        mask, fill_value=fill_value, time_axis=time_axis
+    )
+    dense_mask = sparse_mask.to_dense()
+    assert dense_mask.dtype == np.int32
+    np.testing.assert_array_equal(dense_mask, mask)
+    np.testing.assert_array_equal(np.asarray(sparse_mask), mask)
+
+    for i in range(len(sparse_mask)):
+        mask_i = mask if time_axis is None else np.take(mask, i, axis=time_axis)
+        np.testing.assert_array_equal(sparse_mask.get_timestep(i), mask_i)
+        label_index = sparse_mask.get_label_index(i)
+        expected_index = LabelIndex(mask_i)
+        np.testing.assert_array_equal(label_index.points, expected_index.points)
+        np.testing.assert_array_equal(label_index.offsets, expected_index.offsets)
+
+
+def test_sparse_mask_cube():
+    """Tests the conversion of a SparseMask from and to iris cubes and xarray
+    DataArrays, and its use in place of a dense mask in the mask and bulk
+    statistics functions
+    """
+    mask = np.zeros((3, 20, 30), dtype=np.int32)
+    mask[0, 2:6, 3:9] = 1
+    mask[1, 4:9, 10:15] = 2
+    mask[2, 4:9, 12:16] = 3
+    mask[2, 15:, 25:] = -1
+    mask_iris = tb_test.make_dataset_from_arr(mask, data_type="iris", time_dim_num=0)
+    field_iris = tb_test.make_dataset_from_arr(
+        np.arange(mask.size, dtype=float).reshape(mask.shape),
+        data_type="iris",
+        time_dim_num=0,
+    )
+    times = [
+        np.datetime64(time)
+        for time in mask_iris.coord("time").units.num2date(
+            mask_iris.coord("time").points
+        )
+    ]
+    features = pd.DataFrame({"feature": [1, 2, 3], "time": times})
+
+    sparse_mask = tb_utils.SparseMask.from_dense(mask_iris)
+    assert sparse_mask.time_axis == 0
+    assert sparse_mask.nbytes < mask.nbytes
+    assert sparse_mask.to_iris() == mask_iris
+    xr.testing.assert_equal(sparse_mask.to_xarray(), xr.DataArray.from_iris(mask_iris))
+    sparse_mask_xr = tb_utils.SparseMask.from_dense(xr.DataArray.from_iris(mask_iris))
+    np.testing.assert_array_equal(sparse_mask_xr.to_dense(), mask)
+
+    assert tb_utils.mask_features(sparse_mask, [2, 3]) == tb_utils.mask_features(
+        mask_iris, [2, 3]
+    )
+    assert tb_utils.mask_cube_features(
+        field_iris, sparse_mask, 2
+    ) == tb_utils.mask_cube_features(field_iris, mask_iris, 2)
+
+    statistic = {"mean": np.mean, "ncells": np.size}
+    pd.testing.assert_frame_equal(
+        tb_utils.get_statistics_from_mask(
+            features, sparse_mask, field_iris, statistic=statistic
+        ),
+        tb_utils.get_statistics_from_mask(
+            features, mask_iris, field_iris, statistic=statistic
+        ),
+    )
@@ -19,6 +19,7 @@ References
    12(11), 4551-4570.
 """
 
+import functools
 import logging
 from operator import is_
 import numpy as np
@@ -327,95 +328,101 @@ def linking_trackpy(
     if PBC_flag in ["hdim_1", "hdim_2", "both"]:
         # Per the trackpy docs, to specify a custom distance function
         # which we need for PBCs, neighbor_strategy must be 'BTree'.
-        # I think this shouldn't change results, but it will degrade performance.
         neighbor_strategy = "BTree"
         dist_func = build_distance_function(min_h1, max_h1, min_h2, max_h2, PBC_flag)
+        # Use a periodic KD-tree for the neighbour searches rather than a
+        # BallTree calling dist_func for every distance, save the previous hash
+        hash_cache = tp.linking.linking.HashBTree
+        tp.linking.linking.HashBTree = PeriodicHashBTree
 
     else:
         neighbor_strategy = "KDTree"
         dist_func = None
 
-    if method_linking == "random":
-        #     link features into trajectories:
-        trajectories_unfiltered = tp.link(
-            features_linking,
-            search_range=search_range,
-            memory=memory,
-            t_column="frame",
-            pos_columns=pos_columns_tp,
-            adaptive_step=adaptive_step,
-            adaptive_stop=adaptive_stop,
-            neighbor_strategy=neighbor_strategy,
-            link_strategy="auto",
-            dist_func=dist_func,
-        )
-    elif method_linking == "predict":
-        if is_3D and pkgvsn.parse(tp.__version__) < pkgvsn.parse("0.6.0"):
-            raise ValueError(
-                "3D Predictive Tracking Only Supported with trackpy versions newer than 0.6.0."
+    try:
+        if method_linking == "random":
+            #     link features into trajectories:
+            trajectories_unfiltered = tp.link(
+                features_linking,
+                search_range=search_range,
+                memory=memory,
+                t_column="frame",
+                pos_columns=pos_columns_tp,
+                adaptive_step=adaptive_step,
+                adaptive_stop=adaptive_stop,
+                neighbor_strategy=neighbor_strategy,
+                link_strategy="auto",
+                dist_func=dist_func,
+            )
+        elif method_linking == "predict":
+            if is_3D and pkgvsn.parse(tp.__version__) < pkgvsn.parse("0.6.0"):
+                raise ValueError(
+                    "3D Predictive Tracking Only Supported with trackpy versions newer than 0.6.0."
+                )
+
+            # avoid setting pos_columns by renaming to default values to avoid trackpy bug
+            features_linking.rename(
+                columns={
+                    "y": "__temp_y_coord",
+                    "x": "__temp_x_coord",
+                    "z": "__temp_z_coord",
+                },
+                inplace=True,
             )
 
-        # avoid setting pos_columns by renaming to default values to avoid trackpy bug
-        features_linking.rename(
-            columns={
-                "y": "__temp_y_coord",
-                "x": "__temp_x_coord",
-                "z": "__temp_z_coord",
-            },
-            inplace=True,
-        )
-
-        features_linking.rename(
-            columns={"hdim_1": "y", "hdim_2": "x", "vdim_adj": "z"}, inplace=True
-        )
-
-        # generate list of features as input for df_link_iter to avoid bug in df_link
-        features_linking_list = [
-            frame for i, frame in features_linking.groupby("frame", sort=True)
-        ]
-
-        pred = tp.predict.NearestVelocityPredict(span=1)
-        trajectories_unfiltered = pred.link_df_iter(
-            features_linking_list,
-            search_range=search_range,
-            memory=memory,
-            # pos_columns=["hdim_1", "hdim_2"], # not working atm
-            t_column="frame",
-            neighbor_strategy=neighbor_strategy,
-            link_strategy="auto",
-            adaptive_step=adaptive_step,
-            adaptive_stop=adaptive_stop,
-            dist_func=dist_func,
-            #                                 copy_features=False, diagnostics=False,
-            #                                 hash_size=None, box_size=None, verify_integrity=True,
-            #                                 retain_index=False
-        )
-        # recreate a single dataframe from the list
+            features_linking.rename(
+                columns={"hdim_1": "y", "hdim_2": "x", "vdim_adj": "z"}, inplace=True
+            )
 
-        trajectories_unfiltered = pd.concat(trajectories_unfiltered)
+            # generate list of features as input for df_link_iter to avoid bug in df_link
+            features_linking_list = [
+                frame for i, frame in features_linking.groupby("frame", sort=True)
+            ]
+
+            pred = tp.predict.NearestVelocityPredict(span=1)
+            trajectories_unfiltered = pred.link_df_iter(
+                features_linking_list,
+                search_range=search_range,
+                memory=memory,
+                # pos_columns=["hdim_1", "hdim_2"], # not working atm
+                t_column="frame",
+                neighbor_strategy=neighbor_strategy,
+                link_strategy="auto",
+                adaptive_step=adaptive_step,
+                adaptive_stop=adaptive_stop,
+                dist_func=dist_func,
+                #                                 copy_features=False, diagnostics=False,
+                #                                 hash_size=None, box_size=None, verify_integrity=True,
+                #                                 retain_index=False
+            )
+            # recreate a single dataframe from the list
 
-        # change to column names back
-        trajectories_unfiltered.rename(
-            columns={"y": "hdim_1", "x": "hdim_2", "z": "vdim_adj"}, inplace=True
-        )
-        trajectories_unfiltered.rename(
-            columns={
-                "__temp_y_coord": "y",
-                "__temp_x_coord": "x",
-                "__temp_z_coord": "z",
-            },
-            inplace=True,
-        )
+            trajectories_unfiltered = pd.concat(trajectories_unfiltered)
 
-    else:
-        raise ValueError("method_linking unknown")
+            # change to column names back
+            trajectories_unfiltered.rename(
+                columns={"y": "hdim_1", "x": "hdim_2", "z": "vdim_adj"}, inplace=True
+            )
+            trajectories_unfiltered.rename(
+                columns={
+                    "__temp_y_coord": "y",
+                    "__temp_x_coord": "x",
+                    "__temp_z_coord": "z",
+                },
+                inplace=True,
+            )
 
-    # Reset trackpy parameters to previously set values
-    if subnetwork_size is not None:
-        if adaptive_step is None and adaptive_stop is None:
-            tp.linking.Linker.MAX_SUB_NET_SIZE = size_cache
         else:
-            tp.linking.Linker.MAX_SUB_NET_SIZE_ADAPTIVE = size_cache
+            raise ValueError("method_linking unknown")
+    finally:
+        # Reset trackpy parameters to previously set values
+        if subnetwork_size is not None:
+            if adaptive_step is None and adaptive_stop is None:
+                tp.linking.Linker.MAX_SUB_NET_SIZE = size_cache
+            else:
+                tp.linking.Linker.MAX_SUB_NET_SIZE_ADAPTIVE = size_cache
+        if PBC_flag in ["hdim_1", "hdim_2", "both"]:
+            tp.linking.linking.HashBTree = hash_cache
 
     # Filter trajectories to exclude short trajectories that are likely to be spurious
     #    trajectories_filtered = filter_stubs(trajectories_unfiltered,threshold=stubs)
@@ -482,6 +489,9 @@ def linking_trackpy(
     )
     # Add metadata
     trajectories_final.attrs["cell_number_unassigned"] = cell_number_unassigned
+    # keep the schema of compact input features
+    if tb_utils.general.is_compact_dataframe(features):
+        trajectories_final = tb_utils.compact_dataframe(trajectories_final)
 
     # add coordinate to raw features identified:
     logging.debug("start adding coordinates to detected features")
@@ -649,3 +659,69 @@ def build_distance_function(min_h1, max_h1, min_h2, max_h2, PBC_flag):
         max_h2=max_h2 if max_h2 is not None else 0,
         PBC_flag=PBC_flag,
     )
+
+
+class PeriodicHashBTree(tp.linking.subnet.HashBTree):
+    """trackpy neighbour hash that uses a ```PeriodicKDTree``` for distance
+    functions from ```build_distance_function```, instead of a BallTree that
+    calls the distance function for every distance. The neighbours and their
+    distances are identical. Other distance functions use the BallTree of
+    trackpy's ```HashBTree```.
+    """
+
+    def rebuild(self):
+        """Rebuilds tree from ``points`` attribute."""
+        if not _is_pbc_distance_function(self.dist_func):
+            return super().rebuild()
+        self._clean = False
+        if len(self.points) == 0:
+            self._btree = None
+        else:
+            coords_mapped = self.to_eucl(self.coords_predict)
+            self._btree = pbc_utils.PeriodicKDTree(
+                coords_mapped, **self.dist_func.keywords
+            )
+        self._clean = True
+
+    def query(self, pos, max_neighbors, search_range, rescale=True):
+        """Find `max_neighbors` nearest neighbors of `pos` in the hash, with a
+        maximum distance of `search_range`. `rescale` determines whether `pos`
+        will be rescaled to internal hash coordinates."""
+        if not _is_pbc_distance_function(self.dist_func):
+            return super().query(pos, max_neighbors, search_range, rescale=rescale)
+        if self.btree is None:
+            return
+        if rescale:
+            pos = self.to_eucl(pos)
+        if max_neighbors > len(self):
+            max_neighbors = len(self)
+        dists, inds = self.btree.query(
+            pos, k=max_neighbors, distance_upper_bound=search_range
+        )
+        inds[np.isinf(dists)] = len(pos) + 1
+        return dists, inds
+
+    def query_points(self, pos, search_range, rescale=True):
+        """Find the nearest neighbors of `pos` in the hash, with a maximum
+        distance of `search_range`. `rescale` determines whether `pos` will
+        be rescaled to internal hash coordinates."""
+        if not _is_pbc_distance_function(self.dist_func):
+            return super().query_points(pos, search_range, rescale=rescale)
+        if self.btree is None:
+            return
+        if rescale:
+            pos = self.to_eucl(pos)
+        dists, found = self.btree.query(pos, distance_upper_bound=search_range)
+        found = set(found[np.isfinite(dists)])
+        if len(found) == 0:
+            return
+        else:
+            return self.coords[list(found)]
+
+
+def _is_pbc_distance_function(dist_func) -> bool:
+    """Check if a distance function was built by ```build_distance_function```"""
+    return (
+        isinstance(dist_func, functools.partial)
+        and dist_func.func is pbc_utils.calc_distance_coords_pbc
+    )
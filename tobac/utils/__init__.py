@@ -8,6 +8,7 @@ from .general import (
     transform_feature_points,
     standardize_track_dataset,
     spectral_filtering,
+    compact_dataframe,
 )
 
 from .mask import (
@@ -22,6 +23,8 @@ from .mask import (
     mask_cube_features,
 )
 
+from .sparse_mask import SparseMask
+
 from .internal import get_label_props_in_dict, get_indices_of_labels_from_reg_prop_dict
 
 from .bulk_statistics import get_statistics, get_statistics_from_mask
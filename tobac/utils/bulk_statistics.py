@@ -20,11 +20,14 @@ import pandas as pd
 import xarray as xr
 
 from tobac.utils import decorators
+from tobac.utils.general import compact_dataframe, is_compact_dataframe
+from tobac.utils.internal.label_index import LabelIndex
+from tobac.utils.sparse_mask import SparseMask
 
 
 def get_statistics(
     features: pd.DataFrame,
-    labels: np.ndarray[int],
+    labels: Union[np.ndarray[int], LabelIndex],
     *fields: tuple[np.ndarray],
     statistic: dict[str, Union[Callable, tuple[Callable, dict]]] = {
         "ncells": np.count_nonzero
@@ -50,9 +53,10 @@ def get_statistics(
         detection or segmentation), which can be for the specific timestep or
         for the whole dataset
 
-    labels : np.ndarray[int]
+    labels : np.ndarray[int] | tobac.utils.internal.LabelIndex
         Mask with labels of each regions to apply function to (e.g. output of
-        segmentation for a specific timestep)
+        segmentation for a specific timestep), or the index of the points of
+        each label in the mask (e.g. from tobac.utils.SparseMask.get_label_index)
 
     *fields : tuple[np.ndarray]
         Fields to give as arguments to each function call. If the shape does not
@@ -88,6 +92,19 @@ def get_statistics(
         in a new column.
     """
 
+    if isinstance(labels, LabelIndex):
+        label_index = labels
+        if any(
+            np.broadcast_shapes(label_index.shape, field.shape) != label_index.shape
+            for field in fields
+        ):
+            # the labels themselves need to be broadcast
+            labels = np.zeros(label_index.shape, dtype=np.int32)
+            labels.ravel()[label_index.points] = label_index.point_labels
+            label_index = None
+    else:
+        label_index = None
+
     # if mask and input data dimensions do not match we can broadcast using numpy broadcasting rules
     if collapse_axis is not None:
         # Test if iterable and if not make a list
@@ -113,38 +130,49 @@ def get_statistics(
 
     else:
         broadcast_flag = any([labels.shape != field.shape for field in fields])
-        if broadcast_flag:
+        if broadcast_flag and label_index is not None:
+            fields = [np.broadcast_to(field, labels.shape) for field in fields]
+        elif broadcast_flag:
             # Broadcast input labels and fields to ensure they work according to numpy broadcasting rules
             broadcast_fields = np.broadcast_arrays(labels, *fields)
             labels = broadcast_fields[0]
             fields = broadcast_fields[1:]
 
     # mask must contain positive values to calculate statistics
-    if np.any(labels > 0):
+    if len(label_index) > 0 if label_index is not None else np.any(labels > 0):
         if index is None:
             index = features.feature.to_numpy()
         else:
             # get the statistics only for specified feature objects
-            if np.max(index) > np.max(labels):
+            max_label = (
+                label_index.labels.max() if label_index is not None else np.max(labels)
+            )
+            if np.max(index) > max_label:
                 raise ValueError("Index contains values that are not in labels!")
 
         # Find which labels exist in features for output:
         index_in_features = np.isin(index, features[id_column])
 
-        # set negative markers to 0 as they are unsegmented
-        bins = np.cumsum(np.bincount(np.maximum(labels.ravel(), 0)))
-        argsorted = np.argsort(labels.ravel())
+        if label_index is not None:
+            label_points = label_index.get_points
+            has_points = lambda i: i in label_index
+        else:
+            # set negative markers to 0 as they are unsegmented
+            bins = np.cumsum(np.bincount(np.maximum(labels.ravel(), 0)))
+            argsorted = np.argsort(labels.ravel())
+            # Create lambdas to get (ravelled) label locations using argsorted and bins
+            label_points = lambda i: argsorted[bins[i - 1] : bins[i]]
+            has_points = lambda i: i < bins.size and bins[i] > bins[i - 1]
 
-        # Create lambdas to get (ravelled) label locations using argsorted and bins
         if collapse_axis is None:
-            label_locs = lambda i: argsorted[bins[i - 1] : bins[i]]
+            label_locs = label_points
         else:
             # Collapse ravelled locations to the remaining axes
             label_locs = lambda i: np.unique(
                 np.ravel_multi_index(
-                    np.array(
-                        np.unravel_index(argsorted[bins[i - 1] : bins[i]], labels.shape)
-                    )[uncollapsed_axes],
+                    np.array(np.unravel_index(label_points(i), labels.shape))[
+                        uncollapsed_axes
+                    ],
                     collapsed_shape,
                 )
             )
@@ -172,7 +200,7 @@ def get_statistics(
                 [
                     (
                         func(*(field.ravel()[label_locs(i)] for field in fields))
-                        if i < bins.size and bins[i] > bins[i - 1]
+                        if has_points(i)
                         else default
                     )
                     for i in index
@@ -208,13 +236,17 @@ def get_statistics(
                             features.columns.get_loc(stats_name),
                         ] = df.apply(lambda r: tuple(r), axis=1)
 
+        # keep the schema of compact input features
+        if is_compact_dataframe(features):
+            features = compact_dataframe(features)
+
     return features
 
 
 @decorators.iris_to_xarray()
 def get_statistics_from_mask(
     features: pd.DataFrame,
-    segmentation_mask: xr.DataArray,
+    segmentation_mask: Union[xr.DataArray, SparseMask],
     *fields: xr.DataArray,
     statistic: dict[str, tuple[Callable]] = {"Mean": np.mean},
     index: Union[None, list[int]] = None,
@@ -233,8 +265,9 @@ def get_statistics_from_mask(
         mask but all labels in the mask need to be present in the feature
         dataframe.
 
-    segmentation_mask : xr.DataArray
-        Segmentation mask output
+    segmentation_mask : xr.DataArray | tobac.utils.SparseMask
+        Segmentation mask output. The statistics of a SparseMask are computed
+        without decoding it into a dense mask.
 
     *fields : xr.DataArray[np.ndarray]
         Field(s) with input data. If field does not have a time dimension it
@@ -271,6 +304,12 @@ def get_statistics_from_mask(
             "Feature labels are not unique which may cause unexpected results for the computation of bulk statistics."
         )
 
+    if isinstance(segmentation_mask, SparseMask):
+        sparse_mask = segmentation_mask
+        segmentation_mask = sparse_mask.template_as_xarray()
+    else:
+        sparse_mask = None
+
     if collapse_dim is not None:
         if isinstance(collapse_dim, str):
             collapse_dim = [collapse_dim]
@@ -288,9 +327,14 @@ def get_statistics_from_mask(
     # get bulk statistics for each timestep
     step_statistics = []
 
-    for tt in pd.to_datetime(segmentation_mask.time):
+    for i, tt in enumerate(pd.to_datetime(segmentation_mask.time)):
         # select specific timestep
-        segmentation_mask_t = segmentation_mask.sel(time=tt).data
+        if sparse_mask is not None:
+            segmentation_mask_t = sparse_mask.get_label_index(i)
+            mask_labels_t = segmentation_mask_t.labels
+        else:
+            segmentation_mask_t = segmentation_mask.sel(time=tt).data
+            mask_labels_t = np.unique(segmentation_mask_t)
         fields_t = (
             field.sel(time=tt).values if "time" in field.coords else field.values
             for field in fields
@@ -298,10 +342,7 @@ def get_statistics_from_mask(
         features_t = features.loc[features.time == tt].copy()
 
         # make sure that the labels in the segmentation mask exist in feature dataframe
-        if (
-            np.intersect1d(np.unique(segmentation_mask_t), features_t.feature).size
-            > np.unique(segmentation_mask_t).size
-        ):
+        if np.intersect1d(mask_labels_t, features_t.feature).size > mask_labels_t.size:
             raise ValueError(
                 "The labels of the segmentation mask and the feature dataframe do not seem to match. Please make sure you provide the correct input feature dataframe to calculate the bulk statistics. "
             )
@@ -321,5 +362,8 @@ def get_statistics_from_mask(
             )
 
     features = pd.concat(step_statistics)
+    # keep the schema of compact input features
+    if is_compact_dataframe(features):
+        features = compact_dataframe(features)
 
     return features
@@ -3,6 +3,7 @@
 """
 
 import copy
+import functools
 import logging
 import pandas as pd
 
@@ -37,8 +38,6 @@ def add_coordinates(t, variable_cube):
 
     """
 
-    from scipy.interpolate import interp1d, interpn
-
     logging.debug("start adding coordinates from cube")
 
     # pull time as datetime object and timestr from input data and add it to DataFrame:
@@ -72,91 +71,38 @@ def add_coordinates(t, variable_cube):
     elif ndim_time == 2:
         hdim_1 = 0
         hdim_2 = 1
+    dim_columns = {hdim_1: "hdim_1", hdim_2: "hdim_2"}
 
-    # create vectors to use to interpolate from pixels to coordinates
-    dimvec_1 = np.arange(variable_cube.shape[hdim_1])
-    dimvec_2 = np.arange(variable_cube.shape[hdim_2])
-
-    # loop over coordinates in input data:
+    # find the feature columns to interpolate each coordinate along, in the
+    # order of the dimensions of the coordinate:
+    coord_grids = dict()
     for coord in coord_names:
-        logging.debug("adding coord: " + coord)
-        # interpolate 2D coordinates:
-        if variable_cube.coord(coord).ndim == 1:
-            if variable_cube.coord_dims(coord) == (hdim_1,):
-                f = interp1d(
-                    dimvec_1,
-                    variable_cube.coord(coord).points,
-                    fill_value="extrapolate",
-                )
-                coordinate_points = f(t["hdim_1"])
-
-            if variable_cube.coord_dims(coord) == (hdim_2,):
-                f = interp1d(
-                    dimvec_2,
-                    variable_cube.coord(coord).points,
-                    fill_value="extrapolate",
-                )
-                coordinate_points = f(t["hdim_2"])
-
-        # interpolate 2D coordinates:
-        elif variable_cube.coord(coord).ndim == 2:
-            if variable_cube.coord_dims(coord) == (hdim_1, hdim_2):
-                points = (dimvec_1, dimvec_2)
-                values = variable_cube.coord(coord).points
-                xi = np.column_stack((t["hdim_1"], t["hdim_2"]))
-                coordinate_points = interpn(points, values, xi)
-
-            if variable_cube.coord_dims(coord) == (hdim_2, hdim_1):
-                points = (dimvec_2, dimvec_1)
-                values = variable_cube.coord(coord).points
-                xi = np.column_stack((t["hdim_2"], t["hdim_1"]))
-                coordinate_points = interpn(points, values, xi)
+        coord_dims = variable_cube.coord_dims(coord)
+        # interpolate 1D and 2D coordinates:
+        if (
+            variable_cube.coord(coord).ndim in (1, 2)
+            and len(coord_dims) == variable_cube.coord(coord).ndim
+            and all(dim in dim_columns for dim in coord_dims)
+        ):
+            coord_grids[coord] = (
+                tuple(dim_columns[dim] for dim in coord_dims),
+                _coordinate_grid_values(variable_cube.coord(coord), None),
+            )
 
         # interpolate 3D coordinates:
         # mainly workaround for wrf latitude and longitude (to be fixed in future)
+        elif variable_cube.coord(coord).ndim == 3 and sorted(coord_dims) == [0, 1, 2]:
+            coord_grids[coord] = (
+                tuple(dim_columns[dim] for dim in coord_dims if dim != ndim_time),
+                _coordinate_grid_values(
+                    variable_cube.coord(coord), coord_dims.index(ndim_time)
+                ),
+            )
 
-        elif variable_cube.coord(coord).ndim == 3:
-            if variable_cube.coord_dims(coord) == (ndim_time, hdim_1, hdim_2):
-                points = (dimvec_1, dimvec_2)
-                values = variable_cube[0, :, :].coord(coord).points
-                xi = np.column_stack((t["hdim_1"], t["hdim_2"]))
-                coordinate_points = interpn(points, values, xi)
-
-            if variable_cube.coord_dims(coord) == (ndim_time, hdim_2, hdim_1):
-                points = (dimvec_2, dimvec_1)
-                values = variable_cube[0, :, :].coord(coord).points
-                xi = np.column_stack((t["hdim_2"], t["hdim_1"]))
-                coordinate_points = interpn(points, values, xi)
-
-            if variable_cube.coord_dims(coord) == (hdim_1, ndim_time, hdim_2):
-                points = (dimvec_1, dimvec_2)
-                values = variable_cube[:, 0, :].coord(coord).points
-                xi = np.column_stack((t["hdim_1"], t["hdim_2"]))
-                coordinate_points = interpn(points, values, xi)
-
-            if variable_cube.coord_dims(coord) == (hdim_1, hdim_2, ndim_time):
-                points = (dimvec_1, dimvec_2)
-                values = variable_cube[:, :, 0].coord(coord).points
-                xi = np.column_stack((t["hdim_1"], t["hdim_2"]))
-                coordinate_points = interpn(points, values, xi)
-
-            if variable_cube.coord_dims(coord) == (hdim_2, ndim_time, hdim_1):
-                points = (dimvec_2, dimvec_1)
-                values = variable_cube[:, 0, :].coord(coord).points
-                xi = np.column_stack((t["hdim_2"], t["hdim_1"]))
-                coordinate_points = interpn(points, values, xi)
-
-            if variable_cube.coord_dims(coord) == (hdim_2, hdim_1, ndim_time):
-                points = (dimvec_2, dimvec_1)
-                values = variable_cube[:, :, 0].coord(coord).points
-                xi = np.column_stack((t["hdim_2"], t["hdim_1"]))
-                coordinate_points = interpn(points, values, xi)
-
-        # write resulting array or list into DataFrame:
-        t[coord] = coordinate_points
+        else:
+            coord_grids[coord] = None
 
-        logging.debug("added coord: " + coord)
-    return t
+    return _interpolate_coordinates(t, coord_grids)
 
 
 def add_coordinates_3D(
@@ -197,8 +143,6 @@ def add_coordinates_3D(
     pandas DataFrame
                    trajectories with added coordinates
     """
-    from scipy.interpolate import interp2d, interp1d, interpn
-
     logging.debug("start adding coordinates from cube")
 
     # pull time as datetime object and timestr from input data and add it to DataFrame:
@@ -260,62 +204,127 @@ def add_coordinates_3D(
         ndim_hdim_2: (dimvec_3, "hdim_2"),
     }
 
-    # loop over coordinates in input data:
+    # find the feature columns to interpolate each coordinate along, in the
+    # order of the dimensions of the coordinate:
+    coord_grids = dict()
     for coord in coord_names:
-        logging.debug("adding coord: " + coord)
-        # interpolate 1D coordinates:
         var_coord = variable_cube.coord(coord)
+        coord_dims = variable_cube.coord_dims(coord)
+        # interpolate 1D coordinates:
         if var_coord.ndim == 1:
-            curr_dim = coord_to_ax[variable_cube.coord_dims(coord)[0]]
-            f = interp1d(curr_dim[0], var_coord.points, fill_value="extrapolate")
-            coordinate_points = f(t[curr_dim[1]])
+            coord_grids[coord] = (
+                (coord_to_ax[coord_dims[0]][1],),
+                _coordinate_grid_values(var_coord, None),
+            )
 
         # interpolate 2D coordinates
         elif var_coord.ndim == 2:
-            first_dim = coord_to_ax[variable_cube.coord_dims(coord)[1]]
-            second_dim = coord_to_ax[variable_cube.coord_dims(coord)[0]]
-            points = (second_dim[0], first_dim[0])
-            values = var_coord.points
-            xi = np.column_stack((t[second_dim[1]], t[first_dim[1]]))
-            coordinate_points = interpn(points, values, xi)
+            coord_grids[coord] = (
+                tuple(coord_to_ax[dim][1] for dim in coord_dims),
+                _coordinate_grid_values(var_coord, None),
+            )
 
         # Deal with the special case where the coordinate is 3D but
         # one of the dimensions is time and we assume the coordinates
         # don't vary in time.
         elif (
             var_coord.ndim == 3
-            and ndim_time in variable_cube.coord_dims(coord)
+            and ndim_time in coord_dims
             and assume_coords_fixed_in_time
         ):
-            time_pos = variable_cube.coord_dims(coord).index(ndim_time)
-            hdim1_pos = 0 if time_pos != 0 else 1
-            hdim2_pos = 1 if time_pos == 2 else 2
-            first_dim = coord_to_ax[variable_cube.coord_dims(coord)[hdim2_pos]]
-            second_dim = coord_to_ax[variable_cube.coord_dims(coord)[hdim1_pos]]
-            points = (second_dim[0], first_dim[0])
-            values = var_coord.points
-            xi = np.column_stack((t[second_dim[1]], t[first_dim[1]]))
-            coordinate_points = interpn(points, values, xi)
+            coord_grids[coord] = (
+                tuple(coord_to_ax[dim][1] for dim in coord_dims if dim != ndim_time),
+                _coordinate_grid_values(var_coord, coord_dims.index(ndim_time)),
+            )
 
         # interpolate 3D coordinates:
         elif var_coord.ndim == 3:
-            first_dim = coord_to_ax[variable_cube.coord_dims(coord)[0]]
-            second_dim = coord_to_ax[variable_cube.coord_dims(coord)[1]]
-            third_dim = coord_to_ax[variable_cube.coord_dims(coord)[2]]
-            coordinate_points = interpn(
-                [first_dim[0], second_dim[0], third_dim[0]],
-                var_coord.points,
-                [
-                    [a, b, c]
-                    for a, b, c in zip(
-                        t[first_dim[1]], t[second_dim[1]], t[third_dim[1]]
-                    )
-                ],
+            coord_grids[coord] = (
+                tuple(coord_to_ax[dim][1] for dim in coord_dims),
+                _coordinate_grid_values(var_coord, None),
             )
-            # coordinate_points=[f(a,b) for a,b in zip(t[first_dim[1]],t[second_dim[1]])]
 
-        # write resulting array or list into DataFrame:
-        t[coord] = coordinate_points
+        else:
+            coord_grids[coord] = None
+
+    return _interpolate_coordinates(t, coord_grids)
+
+
+def _coordinate_grid_values(coord, time_axis):
+    """Get the points of a coordinate to interpolate from.
+
+    Parameters
+    ----------
+    coord: iris.coords.Coord
+        Coordinate.
+    time_axis: int or None
+        The axis of the time dimension of the coordinate, along which the
+        first point is used, or None.
+
+    Returns
+    -------
+    numpy.array
+        Points of the coordinate.
+    """
+    values = coord.points
+    if time_axis is not None:
+        values = np.take(values, 0, time_axis)
+    return values
+
+
+def _interpolate_coordinates(t, coord_grids):
+    """Interpolate the coordinates of a cube to the positions of features.
+    The coordinates that are defined along the same feature columns are
+    interpolated together.
+
+    Parameters
+    ----------
+    t : pandas.DataFrame
+        Trajectories/features.
+
+    coord_grids : dict
+        For each coordinate name, a tuple of the feature columns (e.g.
+        ('hdim_1', 'hdim_2')) corresponding to the dimensions of the
+        coordinate, and the points of the coordinate along these dimensions,
+        read once per call of add_coordinates. Linear interpolation is used
+        along all columns, with extrapolation for 1D coordinates. If None,
+        the coordinate is given the values of the previous coordinate.
+        The positions of the features along the columns are only gathered
+        once for all coordinates along the same columns.
+
+    Returns
+    -------
+    t : pandas.DataFrame
+        Trajectories with added coordinates.
+    """
+    from scipy.interpolate import interp1d, interpn
+
+    # group the coordinates by the feature columns
+    coord_groups = dict()
+    for coord, coord_grid in coord_grids.items():
+        if coord_grid is not None:
+            coord_groups.setdefault(coord_grid[0], []).append(coord)
+
+    coordinate_points = dict()
+    for columns, group_coords in coord_groups.items():
+        xi = np.column_stack([t[column] for column in columns])
+        for coord in group_coords:
+            logging.debug("adding coord: " + coord)
+            values = coord_grids[coord][1]
+            points = [np.arange(size) for size in values.shape]
+            if len(columns) == 1:
+                f = interp1d(points[0], values, fill_value="extrapolate")
+                coordinate_points[coord] = f(xi[:, 0])
+            else:
+                coordinate_points[coord] = interpn(points, values, xi)
+
+    # write resulting arrays into DataFrame, in the order of the coordinates:
+    previous_points = None
+    for coord in coord_grids:
+        if coord in coordinate_points:
+            previous_points = coordinate_points[coord]
+        if previous_points is not None:
+            t[coord] = previous_points
 
         logging.debug("added coord: " + coord)
     return t
@@ -460,8 +469,73 @@ def get_spacings(
     return dxy, dt
 
 
+@functools.lru_cache(maxsize=8)
+def _spectral_transfer_function(shape, dxy, lambda_min, lambda_max):
+    """Compute the wavelengths and the 2D transfer function of the Butterworth
+    bandpass filter used in spectral_filtering. Results are cached, as these
+    are identical for every timestep of a dataset.
+
+    Parameters
+    ----------
+    shape: tuple of int
+        Shape of the 2D (horizontal) field.
+    dxy: float
+        Grid spacing in m.
+    lambda_min: float
+        Minimum wavelength in m.
+    lambda_max: float
+        Maximum wavelength in m.
+
+    Returns
+    -------
+    lambda_mn: numpy.array
+        2D field of the wavelengths in the spectral space of the domain.
+    transfer_function: numpy.array
+        2D transfer function of the bandpass filter.
+    """
+    from scipy import signal
+
+    # get number of grid cells in x and y direction
+    Ni, Nj = shape
+    # wavenumber space
+    m, n = np.meshgrid(np.arange(Ni), np.arange(Nj), indexing="ij")
+
+    # if domain is squared:
+    if Ni == Nj:
+        wavenumber = np.sqrt(m**2 + n**2)
+        lambda_mn = (2 * Ni * (dxy)) / wavenumber
+    else:
+        # if domain is a rectangle:
+        # alpha is the normalized wavenumber in wavenumber space
+        alpha = np.sqrt(m**2 / Ni**2 + n**2 / Nj**2)
+        # compute wavelengths for target grid in m
+        lambda_mn = 2 * dxy / alpha
+
+    ############### create a 2D bandpass filter (butterworth) #######################
+    b, a = signal.iirfilter(
+        2,
+        [1 / lambda_max, 1 / lambda_min],
+        btype="band",
+        ftype="butter",
+        fs=1 / dxy,
+        output="ba",
+    )
+    w, h = signal.freqz(b, a, 1 / lambda_mn.flatten(), fs=1 / dxy)
+    transfer_function = np.reshape(abs(h), lambda_mn.shape)
+
+    # the cached arrays are shared between calls and must not be modified
+    lambda_mn.flags.writeable = False
+    transfer_function.flags.writeable = False
+    return lambda_mn, transfer_function
+
+
 def spectral_filtering(
-    dxy, field_in, lambda_min, lambda_max, return_transfer_function=False
+    dxy,
+    field_in,
+    lambda_min,
+    lambda_max,
+    return_transfer_function=False,
+    preserve_dtype=False,
 ):
     """This function creates and applies a 2D transfer function that
     can be used as a bandpass filter to remove certain wavelengths
@@ -473,7 +547,9 @@ def spectral_filtering(
         Grid spacing in m.
 
     field_in: numpy.array
-        2D field with input data.
+        2D field with input data. Arrays with more than two dimensions
+        (e.g. a stack of timesteps) are filtered along the last two axes,
+        with all leading axes transformed in a single call.
 
     lambda_min: float
         Minimum wavelength in m.
@@ -485,10 +561,15 @@ def spectral_filtering(
         default: False. If set to True, then the 2D transfer function and
         the corresponding wavelengths are returned.
 
+    preserve_dtype: boolean, optional
+        default: False. If set to True, the filtering of floating point data
+        is computed in the precision of the input (e.g. float32) and the
+        filtered field has the same dtype as the input, rather than float64.
+
     Returns:
     --------
     filtered_field: numpy.array
-        Spectrally filtered 2D field of data (with same shape as input data).
+        Spectrally filtered field of data (with same shape as input data).
 
     transfer_function: tuple
         Two 2D fields, where the first one corresponds to the wavelengths
@@ -497,7 +578,6 @@ def spectral_filtering(
         return_transfer_function is True.
     """
 
-    from scipy import signal
     from scipy import fft
 
     # check if valid value for dxy is given
@@ -506,44 +586,29 @@ def spectral_filtering(
             "Invalid value for dxy. Please provide the grid spacing in meter."
         )
 
-    # get number of grid cells in x and y direction
-    Ni = field_in.shape[-2]
-    Nj = field_in.shape[-1]
-    # wavenumber space
-    m, n = np.meshgrid(np.arange(Ni), np.arange(Nj), indexing="ij")
-
-    # if domain is squared:
-    if Ni == Nj:
-        wavenumber = np.sqrt(m**2 + n**2)
-        lambda_mn = (2 * Ni * (dxy)) / wavenumber
-    else:
-        # if domain is a rectangle:
-        # alpha is the normalized wavenumber in wavenumber space
-        alpha = np.sqrt(m**2 / Ni**2 + n**2 / Nj**2)
-        # compute wavelengths for target grid in m
-        lambda_mn = 2 * dxy / alpha
-
-    ############### create a 2D bandpass filter (butterworth) #######################
-    b, a = signal.iirfilter(
-        2,
-        [1 / lambda_max, 1 / lambda_min],
-        btype="band",
-        ftype="butter",
-        fs=1 / dxy,
-        output="ba",
+    # the transfer function only depends on the horizontal grid and the
+    # wavelengths, so it is reused across timesteps
+    lambda_mn, transfer_function = _spectral_transfer_function(
+        tuple(field_in.shape[-2:]), dxy, lambda_min, lambda_max
     )
-    w, h = signal.freqz(b, a, 1 / lambda_mn.flatten(), fs=1 / dxy)
-    transfer_function = np.reshape(abs(h), lambda_mn.shape)
 
-    # 2-dimensional discrete cosine transformation to convert data to spectral space
-    spectral = fft.dctn(field_in.data)
-    # multiplication of spectral coefficients with transfer function
-    filtered = spectral * transfer_function
-    # inverse discrete cosine transformation to go back from spectral to original space
-    filtered_field = fft.idctn(filtered)
+    # 2-dimensional discrete cosine transformation to convert data to spectral space,
+    # leading axes (e.g. time) are filtered independently in the same call
+    spectral = fft.dctn(field_in.data, axes=(-2, -1))
+    if preserve_dtype and np.issubdtype(spectral.dtype, np.floating):
+        # multiply the spectral coefficients with the transfer function and
+        # transform back in place, in the precision of the input
+        np.multiply(spectral, transfer_function, out=spectral, casting="same_kind")
+        filtered_field = fft.idctn(spectral, axes=(-2, -1), overwrite_x=True)
+    else:
+        # multiplication of spectral coefficients with transfer function
+        filtered = spectral * transfer_function
+        # inverse discrete cosine transformation to go back from spectral to original space
+        filtered_field = fft.idctn(filtered, axes=(-2, -1))
 
     if return_transfer_function is True:
-        return (lambda_mn, transfer_function), filtered_field
+        # return copies, so that the cached arrays are not shared with callers
+        return (lambda_mn.copy(), transfer_function.copy()), filtered_field
     else:
         return filtered_field
 
@@ -660,6 +725,103 @@ def combine_feature_dataframes(
     return combined_sorted
 
 
+# columns of feature and track dataframes that are stored as int32 and float32
+# in the compact schema
+COMPACT_INT_COLUMNS = ["frame", "idx", "num", "feature", "cell", "ncells"]
+COMPACT_FLOAT_COLUMNS = ["vdim", "hdim_1", "hdim_2"]
+
+
+def compact_dataframe(features):
+    """Convert a feature or track dataframe to a compact schema that needs
+    much less memory for large numbers of features:
+
+    * the integer id and count columns (frame, idx, num, feature, cell and
+      ncells) are stored as int32, if all values fit into int32,
+    * the positions in grid points (vdim, hdim_1 and hdim_2) are stored as
+      float32,
+    * the time column is stored as datetime64, or as categorical if the times
+      cannot be represented as datetime64 (e.g. for a 360 day calendar),
+    * the timestr column is stored as categorical,
+    * other columns of Python objects that only contain numbers (e.g. bulk
+      statistics) are stored as numeric columns.
+
+    Segmentation, linking with linking_trackpy and the bulk statistics
+    functions keep a compact dataframe compact. The schema is recorded in
+    the "tobac_compact" entry of the attrs of the dataframe.
+
+    Parameters
+    ----------
+    features: pd.DataFrame
+        Feature or track dataframe.
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the compact schema.
+    """
+    features = features.copy()
+    int32_info = np.iinfo(np.int32)
+    for column in COMPACT_INT_COLUMNS:
+        if column in features and pd.api.types.is_integer_dtype(features[column]):
+            values = features[column]
+            if len(values) == 0 or (
+                values.min() >= int32_info.min and values.max() <= int32_info.max
+            ):
+                features[column] = values.astype(np.int32)
+    for column in COMPACT_FLOAT_COLUMNS:
+        if column in features and pd.api.types.is_float_dtype(features[column]):
+            features[column] = features[column].astype(np.float32)
+
+    if "time" in features and features["time"].dtype == object:
+        # the number of unique times is small, so they are converted separately
+        codes, unique_times = pd.factorize(features["time"])
+        try:
+            unique_times = pd.to_datetime([np.datetime64(t) for t in unique_times])
+            features["time"] = np.asarray(unique_times)[codes]
+        except (TypeError, ValueError):
+            features["time"] = pd.Categorical.from_codes(codes, unique_times)
+    if "timestr" in features:
+        features["timestr"] = features["timestr"].astype("category")
+
+    for column in features.columns:
+        if features[column].dtype == object:
+            features[column] = features[column].infer_objects()
+    features.attrs["tobac_compact"] = True
+    return features
+
+
+def is_compact_dataframe(features):
+    """Check whether a feature or track dataframe uses the compact schema of
+    compact_dataframe.
+
+    Parameters
+    ----------
+    features: pd.DataFrame
+        Feature or track dataframe.
+
+    Returns
+    -------
+    bool
+        True if the dataframe was created by compact_dataframe, or, for
+        dataframes that have lost their attrs (e.g. when concatenated), if
+        the frame column is stored as int32, the time column as datetime64
+        or categorical and the timestr column as categorical.
+    """
+    if features.attrs.get("tobac_compact", False):
+        return True
+    return (
+        "frame" in features
+        and "time" in features
+        and "timestr" in features
+        and features["frame"].dtype == np.int32
+        and (
+            pd.api.types.is_datetime64_dtype(features["time"])
+            or isinstance(features["time"].dtype, pd.CategoricalDtype)
+        )
+        and isinstance(features["timestr"].dtype, pd.CategoricalDtype)
+    )
+
+
 @internal_utils.irispandas_to_xarray()
 def transform_feature_points(
     features,
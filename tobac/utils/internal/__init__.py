@@ -1 +1,2 @@
 from .basic import *
+from .label_index import LabelIndex
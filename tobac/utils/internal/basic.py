@@ -2,6 +2,11 @@
 """
 
 from __future__ import annotations
+import collections
+import concurrent.futures
+import os
+import pickle
+import threading
 import numpy as np
 import skimage.measure
 import xarray as xr
@@ -12,7 +17,7 @@ import pandas as pd
 import warnings
 from . import iris_utils
 from . import xarray_utils as xr_utils
-from typing import Union, Callable
+from typing import Union, Callable, Iterable, Iterator
 
 # list of common vertical coordinates to search for in various functions
 COMMON_VERT_COORDS: list[str] = [
@@ -33,6 +38,204 @@ def _warn_auto_coordinate():
     )
 
 
+def ordered_parallel_map(
+    func: Callable,
+    iterable: Iterable,
+    n_workers: Union[int, None] = 1,
+    max_pending: Union[int, None] = None,
+) -> Iterator:
+    """Apply a function to every element of an iterable using a pool of
+    worker processes, yielding the results in the order of the input.
+
+    Only a bounded number of elements is taken from ``iterable`` ahead of the
+    results that have already been yielded, so that large inputs (e.g. the
+    timesteps of a long dataset) are never all held in memory at once.
+
+    Parameters
+    ----------
+    func: callable
+        Function to apply. It must take a single argument and, if
+        ``n_workers`` > 1, it must be picklable (i.e. defined at module level
+        or a ``functools.partial`` of such a function).
+    iterable: iterable
+        Input elements to apply ``func`` to.
+    n_workers: int or None, optional (default: 1)
+        Number of worker processes. If None or <= 1, ``func`` is applied
+        serially in the calling process.
+    max_pending: int or None, optional (default: None)
+        Maximum number of elements that are submitted to the pool but not yet
+        yielded. If None, this is twice the number of workers.
+
+    Yields
+    ------
+    object
+        The output of ``func`` for each element of ``iterable``, in order.
+    """
+    if n_workers is None or n_workers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * n_workers
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = collections.deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def ordered_prefetch(
+    func: Callable,
+    iterable: Iterable,
+    n_prefetch: Union[int, None] = 1,
+) -> Iterator:
+    """Apply a function to every element of an iterable in a background
+    thread, ahead of the consumer of the results, yielding the results in the
+    order of the input. This is used to load the next timesteps of lazy
+    (e.g. dask-backed) data while the current timestep is processed.
+
+    Parameters
+    ----------
+    func: callable
+        Function to apply. It must take a single argument.
+    iterable: iterable
+        Input elements to apply ``func`` to.
+    n_prefetch: int or None, optional (default: 1)
+        Maximum number of elements that ``func`` is applied to ahead of the
+        result that has last been yielded. If None or < 1, ``func`` is applied
+        to each element only when its result is requested.
+
+    Yields
+    ------
+    object
+        The output of ``func`` for each element of ``iterable``, in order.
+    """
+    if n_prefetch is None or n_prefetch < 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pending = collections.deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) > n_prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+_reusable_buffers = threading.local()
+
+
+def reusable_buffer(name: str, shape: tuple[int], dtype: np.dtype) -> np.ndarray:
+    """Get an uninitialised array that is reused by all calls with the same
+    name, shape and dtype from the same thread (and so from the same worker
+    process), to avoid repeatedly allocating large temporary arrays, e.g. for
+    each timestep. Only the most recent array of each name is kept.
+
+    The contents of the array are overwritten by the next user, so it must
+    not be referenced after the caller has finished with it.
+
+    Parameters
+    ----------
+    name: str
+        Name of the buffer.
+    shape: tuple of int
+        Shape of the buffer.
+    dtype: numpy.dtype
+        Data type of the buffer.
+
+    Returns
+    -------
+    numpy.ndarray
+        The buffer.
+    """
+    buffers = _reusable_buffers.__dict__
+    buffer = buffers.get(name)
+    if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+        # release the previous buffer before allocating a new one
+        buffers.pop(name, None)
+        buffer = np.empty(shape, dtype=dtype)
+        buffers[name] = buffer
+    return buffer
+
+
+def checkpoint_path(checkpoint_dir: str, name: str, index: int) -> str:
+    """Get the path of the checkpoint file of a single step (e.g. a timestep)
+    of a long computation.
+
+    Parameters
+    ----------
+    checkpoint_dir: str
+        Directory that the checkpoint files are stored in.
+    name: str
+        Name of the computation, to tell apart the checkpoint files of
+        different computations in the same directory.
+    index: int
+        Number of the step.
+
+    Returns
+    -------
+    str
+        Path of the checkpoint file.
+    """
+    return os.path.join(checkpoint_dir, f"{name}_{index:06d}.pkl")
+
+
+def write_checkpoint(result: object, checkpoint_dir: str, name: str, index: int):
+    """Write the result of a single step (e.g. a timestep) of a long
+    computation to its checkpoint file, so that the step can be skipped if
+    the computation is restarted. The file is only created once the result
+    has been written completely, so that an interrupted write does not leave
+    a partial checkpoint behind.
+
+    Parameters
+    ----------
+    result: object
+        Result of the step. Must be picklable.
+    checkpoint_dir: str
+        Directory that the checkpoint files are stored in. It is created if
+        it does not exist.
+    name: str
+        Name of the computation.
+    index: int
+        Number of the step.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = checkpoint_path(checkpoint_dir, name, index)
+    with open(path + ".tmp", "wb") as checkpoint_file:
+        pickle.dump(result, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def read_checkpoint(checkpoint_dir: str, name: str, index: int) -> object:
+    """Read the result of a single step of a long computation from its
+    checkpoint file, written by write_checkpoint.
+
+    Parameters
+    ----------
+    checkpoint_dir: str
+        Directory that the checkpoint files are stored in.
+    name: str
+        Name of the computation.
+    index: int
+        Number of the step.
+
+    Returns
+    -------
+    object
+        Result of the step.
+    """
+    with open(checkpoint_path(checkpoint_dir, name, index), "rb") as checkpoint_file:
+        return pickle.load(checkpoint_file)
+
+
 def get_label_props_in_dict(labels: np.array) -> dict:
     """Function to get the label properties into a dictionary format.
 
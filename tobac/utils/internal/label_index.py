@@ -0,0 +1,134 @@
+"""Compact index of the points of each label in a labelled array
+"""
+
+from __future__ import annotations
+import functools
+
+import numpy as np
+
+
+class LabelIndex:
+    """Index of the points of each label in a labelled array, stored as a
+    single sorted array of (ravelled) point indices and the offsets of each
+    label into it (i.e. in compressed sparse row format). The counts,
+    coordinates and bounding boxes of the labels are derived from this when
+    first needed.
+
+    Points of each label are in the same (raster) order as the coordinates of
+    `skimage.measure.regionprops`. Labels <= 0 are treated as background.
+
+    Parameters
+    ----------
+    labels : np.ndarray
+        Array of integer labels.
+
+    Attributes
+    ----------
+    shape : tuple of int
+        Shape of the labelled array
+    points : np.ndarray
+        Ravelled indices of all labelled points, sorted by label
+    offsets : np.ndarray
+        Offset of the points of each label number in `points`, so that the
+        points of label i are ``points[offsets[i]:offsets[i+1]]``
+    labels : np.ndarray
+        Labels with at least one point, in ascending order
+    """
+
+    def __init__(self, labels: np.ndarray):
+        labels = np.asarray(labels)
+        flat_labels = labels.ravel()
+        points = np.flatnonzero(flat_labels > 0)
+        self._build(labels.shape, points, flat_labels[points])
+
+    @classmethod
+    def from_points(
+        cls, shape: tuple[int], points: np.ndarray, point_labels: np.ndarray
+    ) -> LabelIndex:
+        """Create the index from the labelled points of an array, without the
+        array itself.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            Shape of the labelled array
+        points : np.ndarray
+            Ravelled indices of the points with labels > 0, in ascending order
+        point_labels : np.ndarray
+            Label of each point in `points`
+
+        Returns
+        -------
+        LabelIndex
+            Index of the points of each label
+        """
+        index = cls.__new__(cls)
+        index._build(tuple(shape), np.asarray(points), np.asarray(point_labels))
+        return index
+
+    def _build(
+        self, shape: tuple[int], points: np.ndarray, point_labels: np.ndarray
+    ) -> None:
+        self.shape = shape
+        # a stable sort keeps the points of each label in raster order
+        self.points = points[np.argsort(point_labels, kind="stable")]
+        label_counts = np.bincount(point_labels, minlength=1)
+        self.offsets = np.concatenate([[0], np.cumsum(label_counts)])
+        self.labels = np.flatnonzero(label_counts)
+
+    def __len__(self) -> int:
+        return self.labels.size
+
+    def __contains__(self, label: int) -> bool:
+        return 0 < label < self.offsets.size - 1 and (
+            self.offsets[label + 1] > self.offsets[label]
+        )
+
+    @functools.cached_property
+    def counts(self) -> np.ndarray:
+        """Number of points of each label in `labels`"""
+        return np.diff(self.offsets)[self.labels]
+
+    @functools.cached_property
+    def point_labels(self) -> np.ndarray:
+        """Label of each point in `points`"""
+        return np.repeat(np.arange(self.offsets.size - 1), np.diff(self.offsets))
+
+    @functools.cached_property
+    def coords(self) -> tuple[np.ndarray]:
+        """Coordinates along each dimension of each point in `points`"""
+        return np.unravel_index(self.points, self.shape)
+
+    @functools.cached_property
+    def bboxes(self) -> np.ndarray:
+        """Bounding box of each label in `labels`, in the same format as the
+        bbox of `skimage.measure.regionprops`, i.e. the minimum coordinate
+        along each dimension followed by the maximum coordinate + 1"""
+        if len(self) == 0:
+            return np.zeros((0, 2 * len(self.shape)), dtype=int)
+        starts = self.offsets[self.labels]
+        return np.stack(
+            [np.minimum.reduceat(coord, starts) for coord in self.coords]
+            + [np.maximum.reduceat(coord, starts) + 1 for coord in self.coords],
+            axis=-1,
+        )
+
+    def get_count(self, label: int) -> int:
+        """Number of points with the given label"""
+        return int(self.offsets[label + 1] - self.offsets[label])
+
+    def get_points(self, label: int) -> np.ndarray:
+        """Ravelled indices of the points with the given label"""
+        return self.points[self.offsets[label] : self.offsets[label + 1]]
+
+    def get_coords(self, label: int) -> tuple[np.ndarray]:
+        """Coordinates along each dimension of the points with the given label"""
+        return tuple(
+            coord[self.offsets[label] : self.offsets[label + 1]]
+            for coord in self.coords
+        )
+
+    def get_bbox(self, label: int) -> tuple[int]:
+        """Bounding box of the given label, in the same format as the bbox of
+        `skimage.measure.regionprops`"""
+        return tuple(int(i) for i in self.bboxes[np.searchsorted(self.labels, label)])
@@ -1,7 +1,26 @@
 """Provide essential methods for masking
 
+The masks can be given as iris cubes or as tobac.utils.SparseMask.
 """
 
+from .sparse_mask import SparseMask
+
+
+def _copy_mask_cube(mask):
+    """Get a copy of a mask as a cube, decoding it if it is a SparseMask."""
+    from copy import deepcopy
+
+    if isinstance(mask, SparseMask):
+        return mask.to_iris()
+    return deepcopy(mask)
+
+
+def _mask_data(mask):
+    """Get the data of a mask, decoding it if it is a SparseMask."""
+    if isinstance(mask, SparseMask):
+        return mask.to_dense()
+    return mask.core_data()
+
 
 def column_mask_from2D(mask_2D, cube, z_coord="model_level_number"):
     """Turn 2D watershedding mask into a 3D mask of selected columns.
@@ -11,7 +30,7 @@ def column_mask_from2D(mask_2D, cube, z_coord="model_level_number"):
     cube : iris.cube.Cube
         Data cube.
 
-    mask_2D : iris.cube.Cube
+    mask_2D : iris.cube.Cube or tobac.utils.SparseMask
         2D cube containing mask (int id for tacked volumes 0
         everywhere else).
 
@@ -34,7 +53,7 @@ def column_mask_from2D(mask_2D, cube, z_coord="model_level_number"):
         slc = [slice(None)] * len(mask_3D.shape)
         slc[dim] = slice(i, i + 1)
         mask_out = mask_3D[slc]
-        mask_3D.data[slc] = mask_2D.core_data()
+        mask_3D.data[slc] = _mask_data(mask_2D)
     return mask_3D
 
 
@@ -46,7 +65,7 @@ def mask_cube_cell(variable_cube, mask, cell, track):
     variable_cube : iris.cube.Cube
         Unmasked data cube.
 
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tracked volumes, 0 everywhere
         else).
 
@@ -78,7 +97,7 @@ def mask_cube_all(variable_cube, mask):
     variable_cube : iris.cube.Cube
         Unmasked data cube.
 
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes 0 everywhere
         else).
 
@@ -93,7 +112,7 @@ def mask_cube_all(variable_cube, mask):
 
     variable_cube_out = deepcopy(variable_cube)
     variable_cube_out.data = ma.masked_where(
-        mask.core_data() == 0, variable_cube_out.core_data()
+        _mask_data(mask) == 0, variable_cube_out.core_data()
     )
     return variable_cube_out
 
@@ -106,7 +125,7 @@ def mask_cube_untracked(variable_cube, mask):
     variable_cube : iris.cube.Cube
         Unmasked data cube.
 
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes 0 everywhere
         else).
 
@@ -121,7 +140,7 @@ def mask_cube_untracked(variable_cube, mask):
 
     variable_cube_out = deepcopy(variable_cube)
     variable_cube_out.data = ma.masked_where(
-        mask.core_data() > 0, variable_cube_out.core_data()
+        _mask_data(mask) > 0, variable_cube_out.core_data()
     )
     return variable_cube_out
 
@@ -134,7 +153,7 @@ def mask_cube(cube_in, mask):
     cube_in : iris.cube.Cube
         Unmasked data cube.
 
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Mask to use for masking, >0 where cube is supposed to be masked.
 
     Returns
@@ -147,7 +166,7 @@ def mask_cube(cube_in, mask):
     from copy import deepcopy
 
     cube_out = deepcopy(cube_in)
-    cube_out.data = ma.masked_where(mask.core_data() != 0, cube_in.core_data())
+    cube_out.data = ma.masked_where(_mask_data(mask) != 0, cube_in.core_data())
     return cube_out
 
 
@@ -156,7 +175,7 @@ def mask_cell(mask, cell, track, masked=False):
 
     Parameters
     ----------
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tracked volumes 0 everywhere
         else).
 
@@ -187,7 +206,7 @@ def mask_cell_surface(mask, cell, track, masked=False, z_coord="model_level_numb
 
     Parameters
     ----------
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes, 0 everywhere
         else).
 
@@ -228,7 +247,7 @@ def mask_cube_features(variable_cube, mask, feature_ids):
     variable_cube : iris.cube.Cube
         Unmasked data cube.
 
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes, 0 everywhere
         else).
 
@@ -246,7 +265,7 @@ def mask_cube_features(variable_cube, mask, feature_ids):
 
     variable_cube_out = deepcopy(variable_cube)
     variable_cube_out.data = ma.masked_where(
-        ~isin(mask.core_data(), feature_ids), variable_cube_out.core_data()
+        ~isin(_mask_data(mask), feature_ids), variable_cube_out.core_data()
     )
     return variable_cube_out
 
@@ -256,7 +275,7 @@ def mask_features(mask, feature_ids, masked=False):
 
     Parameters
     ----------
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes 0 everywhere
         else).
 
@@ -274,9 +293,8 @@ def mask_features(mask, feature_ids, masked=False):
     """
 
     from dask.array import ma, isin
-    from copy import deepcopy
 
-    mask_i = deepcopy(mask)
+    mask_i = _copy_mask_cube(mask)
     mask_i_data = mask_i.core_data()
     mask_i_data[~isin(mask_i.core_data(), feature_ids)] = 0
     if masked:
@@ -292,7 +310,7 @@ def mask_features_surface(
 
     Parameters
     ----------
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes 0 everywhere
         else).
 
@@ -316,9 +334,8 @@ def mask_features_surface(
 
     from iris.analysis import MAX
     from dask.array import ma, isin
-    from copy import deepcopy
 
-    mask_i = deepcopy(mask)
+    mask_i = _copy_mask_cube(mask)
     #     mask_i.data=[~isin(mask_i.data,feature_ids)]=0
     mask_i_data = mask_i.core_data()
     mask_i_data[~isin(mask_i.core_data(), feature_ids)] = 0
@@ -334,7 +351,7 @@ def mask_all_surface(mask, masked=False, z_coord="model_level_number"):
 
     Parameters
     ----------
-    mask : iris.cube.Cube
+    mask : iris.cube.Cube or tobac.utils.SparseMask
         Cube containing mask (int id for tacked volumes 0 everywhere
         else).
 
@@ -355,9 +372,8 @@ def mask_all_surface(mask, masked=False, z_coord="model_level_number"):
 
     from iris.analysis import MAX
     from dask.array import ma, isin
-    from copy import deepcopy
 
-    mask_i = deepcopy(mask)
+    mask_i = _copy_mask_cube(mask)
     mask_i_surface = mask_i.collapsed(z_coord, MAX)
     mask_i_surface_data = mask_i_surface.core_data()
     mask_i_surface.data[mask_i_surface_data > 0] = 1
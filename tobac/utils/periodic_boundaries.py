@@ -1,4 +1,6 @@
 from __future__ import annotations
+import itertools
+
 import numpy as np
 from tobac.utils.decorators import njit_if_available
 
@@ -255,6 +257,234 @@ def calc_distance_coords_pbc(
     return np.sqrt(np.sum(deltas**2))
 
 
+def calc_distances_coords_pbc(
+    coords_1: np.ndarray,
+    coords_2: np.ndarray,
+    min_h1: int,
+    max_h1: int,
+    min_h2: int,
+    max_h2: int,
+    PBC_flag: str,
+) -> np.ndarray:
+    """Function to calculate the distances between many pairs of cartesian
+    coordinates at once. Gives the same distances as calling
+    ```calc_distance_coords_pbc``` for each pair of coordinates.
+
+    Parameters
+    ----------
+    coords_1: np.ndarray
+        (N, 2) array of (hdim_1, hdim_2) or (N, 3) array of
+        (vdim, hdim_1, hdim_2) coordinates.
+    coords_2: np.ndarray
+        Similar to coords_1, but for the second coordinates of each pair
+    min_h1: int
+        Minimum point in hdim_1
+    max_h1: int
+        Maximum point in hdim_1, exclusive. max_h1-min_h1 should be the size.
+    min_h2: int
+        Minimum point in hdim_2
+    max_h2: int
+        Maximum point in hdim_2, exclusive. max_h2-min_h2 should be the size.
+    PBC_flag : str('none', 'hdim_1', 'hdim_2', 'both')
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Returns
+    -------
+    np.ndarray
+        Distances between each pair of coords_1 and coords_2 in cartesian
+        space.
+    """
+    deltas = np.abs(np.asarray(coords_1) - np.asarray(coords_2))
+    max_dims = np.zeros(deltas.shape[1])
+    if PBC_flag in ["hdim_1", "both"]:
+        max_dims[-2] = max_h1 - min_h1
+    if PBC_flag in ["hdim_2", "both"]:
+        max_dims[-1] = max_h2 - min_h2
+    deltas = np.where(deltas > 0.5 * max_dims, deltas - max_dims, deltas)
+    # sum in the same order as calc_distance_coords_pbc
+    squared_distances = deltas[:, 0] ** 2
+    for i_dim in range(1, deltas.shape[1]):
+        squared_distances = squared_distances + deltas[:, i_dim] ** 2
+    return np.sqrt(squared_distances)
+
+
+class PeriodicKDTree:
+    """KD-tree for neighbour searches between points in a domain with
+    periodic boundaries along the horizontal dimensions. The wrap-around is
+    handled by the toroidal topology of ```scipy.spatial.cKDTree```, and the
+    neighbours found are then checked with the distances of
+    ```calc_distance_coords_pbc```, so that the results are identical to a
+    search with ```calc_distance_coords_pbc``` as the distance function, but
+    without calling it for every distance.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        (N, 2) array of (hdim_1, hdim_2) or (N, 3) array of
+        (vdim, hdim_1, hdim_2) coordinates.
+    min_h1: int
+        Minimum point in hdim_1
+    max_h1: int
+        Maximum point in hdim_1, exclusive. max_h1-min_h1 should be the size.
+    min_h2: int
+        Minimum point in hdim_2
+    max_h2: int
+        Maximum point in hdim_2, exclusive. max_h2-min_h2 should be the size.
+    PBC_flag : str('none', 'hdim_1', 'hdim_2', 'both')
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Attributes
+    ----------
+    data : np.ndarray
+        Coordinates of the points in the tree
+    """
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        min_h1: int = 0,
+        max_h1: int = 0,
+        min_h2: int = 0,
+        max_h2: int = 0,
+        PBC_flag: str = "none",
+    ):
+        from scipy.spatial import cKDTree
+
+        self.data = np.asarray(points, dtype=float)
+        self.pbc_kwargs = dict(
+            min_h1=min_h1,
+            max_h1=max_h1,
+            min_h2=min_h2,
+            max_h2=max_h2,
+            PBC_flag=PBC_flag,
+        )
+        ndim = self.data.shape[1]
+        self._offsets = np.zeros(ndim)
+        self._boxsize = np.zeros(ndim)
+        if PBC_flag in ["hdim_1", "both"]:
+            self._offsets[-2] = min_h1
+            self._boxsize[-2] = max_h1 - min_h1
+        if PBC_flag in ["hdim_2", "both"]:
+            self._offsets[-1] = min_h2
+            self._boxsize[-1] = max_h2 - min_h2
+        self._is_periodic = self._boxsize > 0
+        self._tree = cKDTree(
+            self._wrap(self.data),
+            boxsize=self._boxsize if np.any(self._is_periodic) else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _wrap(self, points: np.ndarray) -> np.ndarray:
+        """Wrap points into the periodic box of the KD-tree"""
+        boxsize = self._boxsize[self._is_periodic]
+        wrapped = np.array(points, dtype=float) - self._offsets
+        wrapped_periodic = np.mod(wrapped[:, self._is_periodic], boxsize)
+        # np.mod of small negative values can round to the box size
+        wrapped[:, self._is_periodic] = np.where(
+            wrapped_periodic < boxsize, wrapped_periodic, 0
+        )
+        return wrapped
+
+    def _query_pairs(
+        self, x: np.ndarray, r: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Find all pairs of query points and points in the tree within
+        distance r, returning the query point indices, tree point indices and
+        distances of the pairs"""
+        x = np.asarray(x, dtype=float)
+        # search a slightly larger radius, so that no neighbours are missed
+        # due to rounding in the wrapped coordinates
+        r_search = r * (1 + 1e-6) + 1e-6 * max(1, np.max(self._boxsize))
+        candidates = self._tree.query_ball_point(self._wrap(x), r_search)
+        n_candidates = np.array([len(c) for c in candidates], dtype=int)
+        query_i = np.repeat(np.arange(len(x)), n_candidates)
+        point_i = np.fromiter(
+            itertools.chain.from_iterable(candidates),
+            dtype=int,
+            count=np.sum(n_candidates),
+        )
+        distances = calc_distances_coords_pbc(
+            x[query_i], self.data[point_i], **self.pbc_kwargs
+        )
+        is_neighbour = distances <= r
+        return query_i[is_neighbour], point_i[is_neighbour], distances[is_neighbour]
+
+    def query_ball_point(self, x: np.ndarray, r: float) -> list[np.ndarray]:
+        """Find all points in the tree within distance r of each query point
+
+        Parameters
+        ----------
+        x : np.ndarray
+            (M, ndim) array of query points
+        r : float
+            Search radius (inclusive)
+
+        Returns
+        -------
+        list of np.ndarray
+            Indices of the points within distance r of each query point, in
+            ascending order
+        """
+        query_i, point_i, _ = self._query_pairs(x, r)
+        order = np.lexsort((point_i, query_i))
+        n_neighbours = np.bincount(query_i, minlength=len(x))
+        return np.split(point_i[order], np.cumsum(n_neighbours)[:-1])[: len(x)]
+
+    def query(
+        self, x: np.ndarray, k: int = 1, distance_upper_bound: float = np.inf
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the k nearest points in the tree to each query point, within
+        a maximum distance
+
+        Parameters
+        ----------
+        x : np.ndarray
+            (M, ndim) array of query points
+        k : int, optional
+            Number of nearest neighbours to return. Default is 1.
+        distance_upper_bound : float, optional
+            Maximum distance (inclusive) of the neighbours. Default is
+            infinity.
+
+        Returns
+        -------
+        distances : np.ndarray
+            (M, k) array of the distances to the nearest neighbours of each
+            query point in ascending order, padded with infinity if fewer than
+            k neighbours are found
+        indices : np.ndarray
+            (M, k) array of the indices of the nearest neighbours of each
+            query point, padded with len(self) if fewer than k neighbours are
+            found
+        """
+        x = np.asarray(x, dtype=float)
+        query_i, point_i, distances = self._query_pairs(x, distance_upper_bound)
+        order = np.lexsort((point_i, distances, query_i))
+        query_i, point_i, distances = query_i[order], point_i[order], distances[order]
+        # rank of each neighbour by distance to its query point
+        starts = np.concatenate(
+            [[0], np.cumsum(np.bincount(query_i, minlength=len(x)))]
+        )
+        rank = np.arange(query_i.size) - starts[query_i]
+        is_nearest = rank < k
+
+        out_distances = np.full((len(x), k), np.inf)
+        out_indices = np.full((len(x), k), len(self), dtype=int)
+        out_distances[query_i[is_nearest], rank[is_nearest]] = distances[is_nearest]
+        out_indices[query_i[is_nearest], rank[is_nearest]] = point_i[is_nearest]
+        return out_distances, out_indices
+
+
 def weighted_circmean(
     values: np.ndarray,
     weights: np.ndarray,
@@ -325,3 +555,151 @@ def transfm_pbc_point(in_dim, dim_min, dim_max):
         return in_dim + dim_max + 1
     else:
         return in_dim
+
+
+def get_pbc_label_pairs(
+    labels: np.ndarray, PBC_flag: str = "none"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Function to get the pairs of labels of points that are adjacent across
+    periodic boundaries, i.e. on opposite walls or, if periodic in both
+    directions, on opposite corners.
+
+    Parameters
+    ----------
+    labels : np.ndarray
+        Array of labels, with the horizontal dimensions (hdim_1, hdim_2) as
+        the last two dimensions. 0 is treated as background.
+    PBC_flag : str('none', 'hdim_1', 'hdim_2', 'both')
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Returns
+    -------
+    labels_a, labels_b : np.ndarray
+        The labels on either side of each pair of adjacent points, where both
+        points are labelled.
+    """
+    walls = []
+    if PBC_flag == "hdim_1" or PBC_flag == "both":
+        walls.append((labels[..., 0, :], labels[..., -1, :]))
+    if PBC_flag == "hdim_2" or PBC_flag == "both":
+        walls.append((labels[..., :, 0], labels[..., :, -1]))
+    if PBC_flag == "both":
+        walls.append((labels[..., 0, 0], labels[..., -1, -1]))
+        walls.append((labels[..., 0, -1], labels[..., -1, 0]))
+    if not walls:
+        return np.array([], dtype=labels.dtype), np.array([], dtype=labels.dtype)
+
+    labels_a = np.concatenate([wall_a.ravel() for wall_a, _ in walls])
+    labels_b = np.concatenate([wall_b.ravel() for _, wall_b in walls])
+    is_pair = (labels_a > 0) & (labels_b > 0)
+    return labels_a[is_pair], labels_b[is_pair]
+
+
+def merge_labels_pbc(labels: np.ndarray, PBC_flag: str = "none") -> np.ndarray:
+    """Function to merge labelled regions that are connected across periodic
+    boundaries. Each set of connected regions takes the lowest label of the
+    set, leaving gaps in the label numbers.
+
+    Parameters
+    ----------
+    labels : np.ndarray
+        Array of labels, with the horizontal dimensions (hdim_1, hdim_2) as
+        the last two dimensions. 0 is treated as background.
+    PBC_flag : str('none', 'hdim_1', 'hdim_2', 'both')
+        Sets whether to use periodic boundaries, and if so in which directions.
+        'none' means that we do not have periodic boundaries
+        'hdim_1' means that we are periodic along hdim1
+        'hdim_2' means that we are periodic along hdim2
+        'both' means that we are periodic along both horizontal dimensions
+
+    Returns
+    -------
+    np.ndarray
+        Array of merged labels
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    labels_a, labels_b = get_pbc_label_pairs(labels, PBC_flag)
+    is_pair = labels_a != labels_b
+    if not np.any(is_pair):
+        return labels
+
+    n_labels = np.max(labels) + 1
+    graph = coo_matrix(
+        (
+            np.ones(np.count_nonzero(is_pair), dtype=np.int8),
+            (labels_a[is_pair], labels_b[is_pair]),
+        ),
+        shape=(n_labels, n_labels),
+    )
+    _, components = connected_components(graph, directed=False)
+    # lowest label of each connected set of labels
+    lowest_labels = np.full(components.max() + 1, n_labels)
+    np.minimum.at(lowest_labels, components, np.arange(n_labels))
+    label_lookup = lowest_labels[components].astype(labels.dtype)
+    return label_lookup[labels]
+
+
+def weighted_circmean_labels(
+    values: np.ndarray,
+    weights: np.ndarray,
+    labels: np.ndarray,
+    n_labels: int,
+    high: float = 2 * np.pi,
+    low: float = 0,
+) -> np.ndarray:
+    """
+    Calculate the weighted circular mean over the values of each label at
+    once. For each label, this is equivalent to `weighted_circmean` of the
+    values with that label.
+
+    Parameters
+    ----------
+    values: array-like
+        1D array of values to calculate the means over
+    weights: array-like
+        1D array of weights corresponding to each value
+    labels: array-like
+        1D array of non-negative integer labels corresponding to each value
+    n_labels: int
+        Number of labels, i.e. the length of the output
+    high: float, optional
+        Upper bound of the range of values. Defaults to 2*pi
+    low: float, optional
+        Lower bound of the range of values. Defaults to 0
+
+    Returns
+    -------
+    rescaled_average: numpy.ndarray
+        The weighted, circular mean of the values of each label. Labels
+        without values are set to NaN.
+    """
+    scaling_factor = (high - low) / (2 * np.pi)
+    scaled_values = (np.asarray(values) - low) / scaling_factor
+    sum_weights = np.bincount(labels, weights=weights, minlength=n_labels)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sin_average = (
+            np.bincount(
+                labels, weights=weights * np.sin(scaled_values), minlength=n_labels
+            )
+            / sum_weights
+        )
+        cos_average = (
+            np.bincount(
+                labels, weights=weights * np.cos(scaled_values), minlength=n_labels
+            )
+            / sum_weights
+        )
+    angle_average = np.arctan2(sin_average, cos_average) % (2 * np.pi)
+    # Default to np.pi (half way between low and high) if the values are evenly spaced
+    angle_average[np.isclose(sin_average, 0) & np.isclose(cos_average, 0)] = np.pi
+    rescaled_average = (angle_average * scaling_factor) + low
+    # Round return value to try and supress rounding errors
+    rescaled_average = np.round(rescaled_average, 12)
+    rescaled_average[rescaled_average == high] = low
+    return rescaled_average
@@ -0,0 +1,309 @@
+"""Compact, run-length encoded representation of segmentation masks
+"""
+
+from __future__ import annotations
+from typing import Union
+
+import dask.array
+import iris.cube
+import numpy as np
+import xarray as xr
+
+from tobac.utils import decorators
+from tobac.utils.internal.label_index import LabelIndex
+
+
+class SparseMask:
+    """Segmentation mask that stores each timestep as the runs of points with
+    the same value along its ravelled (raster) order, leaving out the runs of
+    a fill value. As most points of a segmentation mask are typically below
+    the threshold, this takes a small fraction of the memory of the dense
+    mask, and converts back to it without loss.
+
+    The mask of each timestep can be converted to a dense array individually
+    (`get_timestep`), or to a `LabelIndex` of the points of each feature
+    without creating the dense array (`get_label_index`). The functions in
+    `tobac.utils.mask` and `tobac.utils.get_statistics_from_mask` accept a
+    SparseMask in place of a dense mask.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the dense mask
+    time_axis : int, optional
+        Axis of the timesteps in the dense mask. If None, the mask is a single
+        timestep. Default is None.
+    fill_value : int, optional
+        Value of the points that are not stored, typically the value of the
+        points below the threshold. Default is 0.
+    template : iris.cube.Cube or xarray.DataArray, optional
+        Cube or DataArray with the coordinates and metadata of the dense mask,
+        and lazy data that is never computed. Used to convert the mask to a
+        cube or DataArray. Default is None.
+
+    Attributes
+    ----------
+    run_starts, run_lengths, run_values : list of np.ndarray
+        Ravelled index within the timestep of the first point, number of
+        points and value of each run of each timestep that is not the fill
+        value
+    """
+
+    dtype = np.dtype(np.int32)
+
+    def __init__(
+        self,
+        shape: tuple[int],
+        time_axis: Union[int, None] = None,
+        fill_value: int = 0,
+        template: Union[iris.cube.Cube, xr.DataArray, None] = None,
+    ):
+        self.shape = tuple(int(axis_len) for axis_len in shape)
+        self.time_axis = time_axis
+        self.fill_value = int(fill_value)
+        self.template = template
+        if time_axis is None:
+            n_timesteps = 1
+            self.timestep_shape = self.shape
+        else:
+            n_timesteps = self.shape[time_axis]
+            self.timestep_shape = self.shape[:time_axis] + self.shape[time_axis + 1 :]
+        no_runs = np.zeros(0, dtype=np.intp)
+        self.run_starts = [no_runs] * n_timesteps
+        self.run_lengths = [no_runs] * n_timesteps
+        self.run_values = [no_runs.astype(self.dtype)] * n_timesteps
+
+    @classmethod
+    def empty_like(
+        cls,
+        mask: Union[iris.cube.Cube, xr.DataArray, np.ndarray],
+        fill_value: int = 0,
+        time_axis: Union[int, None] = None,
+    ) -> SparseMask:
+        """Create a mask of only the fill value with the shape, and for cubes
+        and DataArrays the coordinates, of another mask or field.
+
+        Parameters
+        ----------
+        mask : iris.cube.Cube, xarray.DataArray or np.ndarray
+            Mask or field to take the shape and coordinates of
+        fill_value : int, optional
+            Value of the points that are not stored. Default is 0.
+        time_axis : int, optional
+            Axis of the timesteps if `mask` is an array. For cubes and
+            DataArrays, this is the dimension of the time coordinate, if any.
+            Default is None.
+
+        Returns
+        -------
+        SparseMask
+            The empty mask
+        """
+        if isinstance(mask, iris.cube.Cube):
+            time_dims = mask.coord_dims("time") if mask.coords("time") else ()
+            time_axis = time_dims[0] if time_dims else None
+            template = mask.copy(data=_lazy_zeros(mask.shape))
+        elif isinstance(mask, xr.DataArray):
+            time_axis = mask.dims.index("time") if "time" in mask.dims else None
+            template = mask.copy(data=_lazy_zeros(mask.shape))
+        else:
+            template = None
+        return cls(mask.shape, time_axis, fill_value, template)
+
+    @classmethod
+    def from_dense(
+        cls,
+        mask: Union[iris.cube.Cube, xr.DataArray, np.ndarray],
+        fill_value: int = 0,
+        time_axis: Union[int, None] = None,
+    ) -> SparseMask:
+        """Encode a dense segmentation mask.
+
+        Parameters
+        ----------
+        mask : iris.cube.Cube, xarray.DataArray or np.ndarray
+            Dense segmentation mask
+        fill_value : int, optional
+            Value of the points that are not stored. Default is 0.
+        time_axis : int, optional
+            Axis of the timesteps if `mask` is an array. For cubes and
+            DataArrays, this is the dimension of the time coordinate, if any.
+            Default is None.
+
+        Returns
+        -------
+        SparseMask
+            The encoded mask
+        """
+        sparse_mask = cls.empty_like(mask, fill_value, time_axis)
+        if isinstance(mask, iris.cube.Cube):
+            data = mask.core_data()
+        elif isinstance(mask, xr.DataArray):
+            data = mask.data
+        else:
+            data = mask
+        for i in range(len(sparse_mask)):
+            index = [slice(None)] * data.ndim
+            if sparse_mask.time_axis is not None:
+                index[sparse_mask.time_axis] = i
+            sparse_mask.set_timestep(i, np.asarray(data[tuple(index)]))
+        return sparse_mask
+
+    def __len__(self) -> int:
+        """Number of timesteps"""
+        return len(self.run_starts)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes of the stored runs"""
+        return sum(
+            starts.nbytes + lengths.nbytes + values.nbytes
+            for starts, lengths, values in zip(
+                self.run_starts, self.run_lengths, self.run_values
+            )
+        )
+
+    def set_timestep(self, i: int, values: np.ndarray) -> None:
+        """Encode the dense mask of a timestep.
+
+        Parameters
+        ----------
+        i : int
+            Index of the timestep
+        values : np.ndarray
+            Dense mask of the timestep, of shape `timestep_shape`
+        """
+        values = np.asarray(values)
+        if values.shape != self.timestep_shape:
+            raise ValueError(
+                f"Mask of shape {values.shape} does not match the timestep shape"
+                f" {self.timestep_shape}"
+            )
+        flat_values = values.ravel()
+        starts = np.concatenate(
+            [[0], np.flatnonzero(flat_values[1:] != flat_values[:-1]) + 1]
+        ).astype(np.intp)
+        if flat_values.size == 0:
+            starts = starts[:0]
+        lengths = np.diff(np.append(starts, flat_values.size))
+        run_values = flat_values[starts].astype(self.dtype)
+        is_stored = run_values != self.fill_value
+        self.run_starts[i] = starts[is_stored]
+        self.run_lengths[i] = lengths[is_stored]
+        self.run_values[i] = run_values[is_stored]
+
+    def get_timestep(self, i: int) -> np.ndarray:
+        """Decode the dense mask of a timestep.
+
+        Parameters
+        ----------
+        i : int
+            Index of the timestep
+
+        Returns
+        -------
+        np.ndarray
+            Dense mask of the timestep, of shape `timestep_shape`
+        """
+        values = np.full(self.timestep_shape, self.fill_value, dtype=self.dtype)
+        values.ravel()[self._run_points(i)] = np.repeat(
+            self.run_values[i], self.run_lengths[i]
+        )
+        return values
+
+    def get_label_index(self, i: int) -> LabelIndex:
+        """Index of the points of each feature (label > 0) of a timestep,
+        created directly from the runs.
+
+        Parameters
+        ----------
+        i : int
+            Index of the timestep
+
+        Returns
+        -------
+        LabelIndex
+            Index of the points of each label in the timestep
+        """
+        is_label = self.run_values[i] > 0
+        lengths = self.run_lengths[i][is_label]
+        return LabelIndex.from_points(
+            self.timestep_shape,
+            self._run_points(i, is_label),
+            np.repeat(self.run_values[i][is_label], lengths),
+        )
+
+    def _run_points(self, i: int, which: Union[np.ndarray, None] = None):
+        """Ravelled indices of the points of the (selected) runs of a
+        timestep, in ascending order"""
+        starts = self.run_starts[i]
+        lengths = self.run_lengths[i]
+        if which is not None:
+            starts = starts[which]
+            lengths = lengths[which]
+        # offset of each point from the start of its run
+        run_offsets = np.cumsum(lengths) - lengths
+        return np.repeat(starts - run_offsets, lengths) + np.arange(
+            lengths.sum(), dtype=np.intp
+        )
+
+    def to_dense(self) -> np.ndarray:
+        """Decode the dense mask of all timesteps.
+
+        Returns
+        -------
+        np.ndarray
+            Dense mask of shape `shape`
+        """
+        if self.time_axis is None:
+            return self.get_timestep(0)
+        values = np.empty(self.shape, dtype=self.dtype)
+        for i in range(len(self)):
+            np.moveaxis(values, self.time_axis, 0)[i] = self.get_timestep(i)
+        return values
+
+    def __array__(self, dtype=None):
+        values = self.to_dense()
+        return values if dtype is None else values.astype(dtype)
+
+    def to_iris(self) -> iris.cube.Cube:
+        """Decode the mask into a cube with the coordinates of `template`.
+
+        Returns
+        -------
+        iris.cube.Cube
+            Dense segmentation mask
+        """
+        if self.template is None:
+            raise ValueError("SparseMask has no template to create a cube from")
+        template = self.template
+        if isinstance(template, xr.DataArray):
+            template = template.to_iris()
+        return template.copy(data=self.to_dense())
+
+    def to_xarray(self) -> xr.DataArray:
+        """Decode the mask into a DataArray with the coordinates of `template`.
+
+        Returns
+        -------
+        xarray.DataArray
+            Dense segmentation mask
+        """
+        if self.template is None:
+            raise ValueError("SparseMask has no template to create a DataArray from")
+        return self.template_as_xarray().copy(data=self.to_dense())
+
+    def template_as_xarray(self) -> xr.DataArray:
+        """`template` as a DataArray, with lazy data that is never computed"""
+        if isinstance(self.template, iris.cube.Cube):
+            return decorators.convert_cube_to_dataarray(self.template)
+        return self.template
+
+
+def _lazy_zeros(shape: tuple[int]) -> dask.array.Array:
+    """Lazy placeholder data for the template of a SparseMask"""
+    return dask.array.zeros(shape, dtype=SparseMask.dtype, chunks=shape)